@@ -1,47 +1,59 @@
 import os
+import json
+import hashlib
 import cv2
 import numpy as np
 import pandas as pd
 import mediapipe as mp
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from pose_features import FRAME_COLUMNS, FEATURE_SCHEMA_VERSION, landmarks_to_array, compute_features
+from frames_dataset import PARQUET_DIR, MANIFEST_FILE, PART_FILE, partition_dir, prune_partitions, write_video_partition
+
 # ---------------- CONFIG ----------------
 PROJECT_ROOT = Path(__file__).resolve().parents[1]   # .../ml
 VIDEOS_DIR   = PROJECT_ROOT / "videos"
 OUT_DIR      = PROJECT_ROOT / "datasets" / "frames"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
+# Output: frames_dataset.PARQUET_DIR, one partition per (exercise, video_id)
+
+# Also write the monolithic all_exercises_frames.csv (older tooling). Override with FRAMES_CSV=1.
+WRITE_LEGACY_CSV = os.environ.get("FRAMES_CSV", "0") == "1"
 
 EXERCISES = ["bicep_curl", "lateral_raise", "shoulder_press"]
 
 MIN_DET_CONF = 0.5
 MIN_TRK_CONF = 0.5
+MODEL_COMPLEXITY = 1
 
-# ---------------- MEDIAPIPE ----------------
-mp_pose = mp.solutions.pose
-
-def calculate_angle(a, b, c):
-    a = np.array(a, dtype=np.float32)
-    b = np.array(b, dtype=np.float32)
-    c = np.array(c, dtype=np.float32)
+VIDEO_EXTS = [".mp4", ".mov", ".mkv", ".avi"]
 
-    ba = a - b
-    bc = c - b
+# Parallel extraction: one process (and one MediaPipe Pose) per worker.
+# 1 = sequential in this process. Override with EXTRACT_WORKERS=<n>.
+WORKERS = int(os.environ.get("EXTRACT_WORKERS", max(1, (os.cpu_count() or 1) - 1)))
 
-    denom = (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
-    cos_angle = float(np.dot(ba, bc) / denom)
-    cos_angle = float(np.clip(cos_angle, -1.0, 1.0))
-    return float(np.degrees(np.arccos(cos_angle)))
-
-def lm_xyv(landmarks, idx, w, h):
-    lm = landmarks[idx]
-    return (lm.x * w, lm.y * h, float(lm.visibility))
+# ---------------- MEDIAPIPE ----------------
+mp_pose = mp.solutions.pose
 
-def safe_div(a, b, eps=1e-6):
-    return float(a / (b + eps))
+def make_pose():
+    return mp_pose.Pose(
+        static_image_mode=False,
+        model_complexity=MODEL_COMPLEXITY,
+        smooth_landmarks=True,
+        enable_segmentation=False,
+        min_detection_confidence=MIN_DET_CONF,
+        min_tracking_confidence=MIN_TRK_CONF,
+    )
 
-def extract_video(video_path: Path, exercise: str):
+def extract_video(video_path: Path, exercise: str, pose=None):
     """
     Extract per-frame pose-based features from a single video.
+    Landmarks are collected as a (T, 33, 4) array and featurized in one batched
+    pose_features.compute_features call (same code the live scripts use).
+    pose: reusable Pose (reset here so tracking doesn't carry over between videos);
+    None = a fresh one for this video.
     Returns list of dict rows.
     """
     cap = cv2.VideoCapture(str(video_path))
@@ -50,21 +62,22 @@ def extract_video(video_path: Path, exercise: str):
         return []
 
     fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-    rows = []
 
     # participant_id from filename prefix: benj_bicep.mp4 -> benj
     base = video_path.stem
     participant_id = base.split("_")[0].strip().lower()
 
-    with mp_pose.Pose(
-        static_image_mode=False,
-        model_complexity=1,
-        smooth_landmarks=True,
-        enable_segmentation=False,
-        min_detection_confidence=MIN_DET_CONF,
-        min_tracking_confidence=MIN_TRK_CONF,
-    ) as pose:
+    frame_ids = []
+    lms = []
+    w = h = 0
+
+    own_pose = pose is None
+    if own_pose:
+        pose = make_pose()
+    else:
+        pose.reset()
 
+    try:
         frame_idx = 0
         while True:
             ret, frame = cap.read()
@@ -72,116 +85,208 @@ def extract_video(video_path: Path, exercise: str):
                 break
 
             h, w = frame.shape[:2]
-            t = frame_idx / fps
 
             rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             res = pose.process(rgb)
 
-            if not res.pose_landmarks:
-                frame_idx += 1
-                continue
+            if res.pose_landmarks:
+                frame_ids.append(frame_idx)
+                lms.append(landmarks_to_array(res.pose_landmarks.landmark))
 
-            lm = res.pose_landmarks.landmark
-
-            # Key landmarks (x,y in pixels + visibility)
-            LSH = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_SHOULDER,  w, h)
-            RSH = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_SHOULDER, w, h)
-            LEL = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_ELBOW,     w, h)
-            REL = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_ELBOW,    w, h)
-            LWR = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_WRIST,     w, h)
-            RWR = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_WRIST,    w, h)
-            LHP = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_HIP,       w, h)
-            RHP = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_HIP,      w, h)
-
-            confs = [LSH[2], RSH[2], LEL[2], REL[2], LWR[2], RWR[2], LHP[2], RHP[2]]
-            conf_mean = float(np.mean(confs))
-
-            # Normalize by shoulder width (stable for front view)
-            shoulder_width = abs(LSH[0] - RSH[0])
-            if shoulder_width < 1:
-                frame_idx += 1
-                continue
+            frame_idx += 1
+    finally:
+        cap.release()
+        if own_pose:
+            pose.close()
 
-            mid_sh_x = (LSH[0] + RSH[0]) / 2.0
-            mid_hp_x = (LHP[0] + RHP[0]) / 2.0
-            trunk_offset_norm = safe_div((mid_sh_x - mid_hp_x), shoulder_width)
-
-            # Right-arm angles (we’ll store both arms so we can choose later)
-            right_elbow_angle = calculate_angle(
-                (RSH[0], RSH[1]),
-                (REL[0], REL[1]),
-                (RWR[0], RWR[1])
-            )
-            left_elbow_angle = calculate_angle(
-                (LSH[0], LSH[1]),
-                (LEL[0], LEL[1]),
-                (LWR[0], LWR[1])
-            )
-
-            # Wrist relative height to shoulder line (positive = wrist above shoulder)
-            right_wrist_rel_y = safe_div((RSH[1] - RWR[1]), shoulder_width)
-            left_wrist_rel_y  = safe_div((LSH[1] - LWR[1]), shoulder_width)
-
-            row = {
-                "exercise": exercise,
-                "video_id": base,
-                "participant_id": participant_id,
-                "frame_idx": frame_idx,
-                "time_sec": t,
-                "fps": fps,
-                "conf_mean": conf_mean,
-
-                "shoulder_width_px": float(shoulder_width),
-                "trunk_offset_norm": trunk_offset_norm,
-
-                "R_elbow_angle": float(right_elbow_angle),
-                "L_elbow_angle": float(left_elbow_angle),
-
-                "R_wrist_rel_y": float(right_wrist_rel_y),
-                "L_wrist_rel_y": float(left_wrist_rel_y),
-
-                # raw landmark x (normalized in future if needed)
-                "R_sh_x": float(RSH[0]),
-                "R_el_x": float(REL[0]),
-                "R_wr_x": float(RWR[0]),
-                "L_sh_x": float(LSH[0]),
-                "L_el_x": float(LEL[0]),
-                "L_wr_x": float(LWR[0]),
-            }
-            rows.append(row)
+    if not lms:
+        return []
 
-            frame_idx += 1
+    F = compute_features(np.stack(lms), w, h)
+
+    # Normalize by shoulder width (stable for front view); skip degenerate frames
+    keep = F["shoulder_width_px"] >= 1
+    frame_ids = np.asarray(frame_ids)[keep]
+    cols = {k: F[k][keep].tolist() for k in FRAME_COLUMNS}
+
+    rows = []
+    for i, fi in enumerate(frame_ids.tolist()):
+        row = {
+            "exercise": exercise,
+            "video_id": base,
+            "participant_id": participant_id,
+            "frame_idx": fi,
+            "time_sec": fi / fps,
+            "fps": fps,
+        }
+        for k in FRAME_COLUMNS:
+            row[k] = cols[k][i]
+        rows.append(row)
 
-    cap.release()
     return rows
 
-def main():
-    all_rows = []
+# ---------------- CACHE ----------------
+# A video is re-extracted only when its content or the extraction config changes.
+# The per-video manifest stores the cache key plus size/mtime so unchanged files
+# are not even re-hashed.
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_key(video_sha256: str) -> str:
+    cfg = {
+        "video_sha256": video_sha256,
+        "min_det_conf": MIN_DET_CONF,
+        "min_trk_conf": MIN_TRK_CONF,
+        "model_complexity": MODEL_COMPLEXITY,
+        "feature_schema": FEATURE_SCHEMA_VERSION,
+        "mediapipe": mp.__version__,
+    }
+    return hashlib.sha256(json.dumps(cfg, sort_keys=True).encode("utf-8")).hexdigest()
+
+def video_part(exercise: str, video_path: Path) -> Path:
+    return partition_dir(exercise, video_path.stem) / PART_FILE
+
+def manifest_path(exercise: str, video_path: Path) -> Path:
+    return partition_dir(exercise, video_path.stem) / MANIFEST_FILE
+
+def load_manifest(exercise: str, video_path: Path):
+    try:
+        return json.loads(manifest_path(exercise, video_path).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+def video_source(video_path: Path, manifest) -> dict:
+    """size / mtime / sha256 of the video, reusing the manifest's hash if the file is untouched."""
+    st = video_path.stat()
+    src = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    old = (manifest or {}).get("source") or {}
+    if old.get("size") == src["size"] and old.get("mtime_ns") == src["mtime_ns"] and old.get("sha256"):
+        src["sha256"] = old["sha256"]
+    else:
+        src["sha256"] = file_sha256(video_path)
+    return src
+
+def plan_jobs(jobs):
+    """Split jobs into cached outputs {job: (parquet, n_rows)} and [(video, exercise, key, source)] to extract."""
+    cached, todo = {}, []
+    for vp, ex in jobs:
+        manifest = load_manifest(ex, vp)
+        src = video_source(vp, manifest)
+        key = cache_key(src["sha256"])
+        out = video_part(ex, vp)
+        if manifest and manifest.get("key") == key and out.exists():
+            cached[(vp, ex)] = (out, int(manifest.get("rows", 0)))
+            if manifest.get("source") != src:
+                # touched but identical content: remember the new mtime so we skip hashing next time
+                manifest["source"] = src
+                manifest_path(ex, vp).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        else:
+            todo.append((vp, ex, key, src))
+    return cached, todo
+
+def prune_deleted(jobs):
+    """Drop partitions (frames + manifest) of videos no longer under VIDEOS_DIR/<exercise>/."""
+    removed = 0
+    for ex in EXERCISES:
+        if not (VIDEOS_DIR / ex).exists():
+            continue   # no videos checked out for this exercise: keep what was extracted
+        for vid in prune_partitions(ex, [vp.stem for vp, e in jobs if e == ex]):
+            print("  removed stale partition:", ex, vid)
+            removed += 1
+    return removed
 
+# ---------------- WORKERS ----------------
+_POSE = None
+
+def _init_worker():
+    global _POSE
+    _POSE = make_pose()
+
+def extract_to_file(video_path: Path, exercise: str, key: str, source: dict, pose=None):
+    """
+    Extract one video, write its (exercise, video_id) Parquet partition and then its
+    cache manifest (manifest last, so an interrupted run is simply redone).
+    Returns (out_path, n_rows).
+    """
+    rows = extract_video(video_path, exercise, pose if pose is not None else _POSE)
+    out = write_video_partition(pd.DataFrame(rows), exercise, video_path.stem)
+    manifest_path(exercise, video_path).write_text(json.dumps({
+        "key": key,
+        "rows": len(rows),
+        "video": video_path.name,
+        "source": source,
+    }, indent=2), encoding="utf-8")
+    return out, len(rows)
+
+def list_jobs():
+    jobs = []
     for ex in EXERCISES:
         ex_dir = VIDEOS_DIR / ex
         if not ex_dir.exists():
             print("Missing:", ex_dir)
             continue
 
-        vids = sorted([p for p in ex_dir.iterdir() if p.suffix.lower() in [".mp4", ".mov", ".mkv", ".avi"]])
-        print(f"\n== {ex} ({len(vids)} videos) ==")
-
-        for vp in vids:
-            print("  extracting:", vp.name)
-            rows = extract_video(vp, ex)
-            all_rows.extend(rows)
+        vids = sorted([p for p in ex_dir.iterdir() if p.suffix.lower() in VIDEO_EXTS])
+        print(f"== {ex} ({len(vids)} videos) ==")
+        jobs.extend((vp, ex) for vp in vids)
+    return jobs
+
+def run_jobs(jobs, workers: int):
+    """Extract (video, exercise, key, source) jobs; returns {(video, exercise): (partition file, n_rows)}."""
+    outputs = {}
+    if not jobs:
+        return outputs
+    if workers <= 1 or len(jobs) <= 1:
+        with make_pose() as pose:
+            for vp, ex, key, src in jobs:
+                print("  extracting:", ex, vp.name)
+                outputs[(vp, ex)] = extract_to_file(vp, ex, key, src, pose)
+        return outputs
+
+    workers = min(workers, len(jobs))
+    print(f"\nExtracting {len(jobs)} videos with {workers} workers")
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        futs = {pool.submit(extract_to_file, vp, ex, key, src): (vp, ex) for vp, ex, key, src in jobs}
+        for fut in as_completed(futs):
+            vp, ex = futs[fut]
+            try:
+                out, n = fut.result()
+            except Exception as e:
+                print(f"!! {ex}/{vp.name} failed: {e}")
+                continue
+            outputs[(vp, ex)] = (out, n)
+            print(f"  done: {ex}/{vp.name} ({n} rows)")
+    return outputs
 
-    if not all_rows:
+def main():
+    jobs = list_jobs()
+    prune_deleted(jobs)
+    outputs, todo = plan_jobs(jobs)
+    print(f"\n{len(outputs)} videos cached, {len(todo)} to extract")
+    outputs.update(run_jobs(todo, WORKERS))
+
+    n_rows = sum(outputs[j][1] for j in jobs if j in outputs)
+    if not n_rows:
         print("No rows extracted. Check paths / videos.")
         return
-
-    df = pd.DataFrame(all_rows)
-
-    out_csv = OUT_DIR / "all_exercises_frames.csv"
-    df.to_csv(out_csv, index=False)
-    print("\nSaved:", out_csv)
-    print("Rows:", len(df), "Cols:", len(df.columns))
+    print("\nSaved:", PARQUET_DIR)
+    print("Videos:", len(outputs), "Rows:", n_rows)
+
+    if WRITE_LEGACY_CSV:
+        # combine in the same (exercise, video) order as a sequential run
+        parts = [pd.read_parquet(outputs[j][0]).assign(exercise=j[1], video_id=j[0].stem)
+                 for j in jobs if j in outputs and outputs[j][1] > 0]
+        df = pd.concat(parts, ignore_index=True)
+        df = df[["exercise", "video_id"] + [c for c in df.columns if c not in ("exercise", "video_id")]]
+        out_csv = OUT_DIR / "all_exercises_frames.csv"
+        df.to_csv(out_csv, index=False)
+        print("Saved:", out_csv)
 
 if __name__ == "__main__":
     main()
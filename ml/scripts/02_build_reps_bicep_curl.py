@@ -2,97 +2,68 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from collections import deque
+
+from frames_dataset import load_frames
+from rep_engine import REP_CONFIGS, RepSegmenter
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
-IN_CSV  = PROJECT_ROOT / "datasets" / "frames" / "all_exercises_frames.csv"
 OUT_CSV = PROJECT_ROOT / "datasets" / "reps" / "bicep_curl_reps.csv"
 OUT_CSV.parent.mkdir(parents=True, exist_ok=True)
 
-TOP_THR = 75
-BOT_THR = 155
-SMOOTH_N = 7
+# frame columns this builder reads (only these are loaded from the frames dataset)
+COLUMNS = [
+    "participant_id", "frame_idx", "time_sec", "conf_mean", "shoulder_width_px", "trunk_offset_norm",
+    "R_elbow_angle", "L_elbow_angle", "R_sh_x", "L_sh_x", "R_el_x", "L_el_x",
+]
 
-# "Real thing" settings: keep quality, but don't over-filter style variance
-MIN_REP_FRAMES = 8
-MAX_REP_TIME = 8.0
+# Rep thresholds / smoothing / min frames: rep_engine.REP_CONFIGS (shared with the live counters)
+REP_CONFIG = REP_CONFIGS["bicep_curl"]
 MIN_CONF = 0.50   # was 0.65 in v2; too strict for real-world capture
 
 ARMS = ["R", "L"]
 
 def safe_div(a, b, eps=1e-6):
-    return float(a / (b + eps))
+    return a / (b + eps)
 
 def detect_reps_one_arm(df_vid, arm: str):
     angle_col = "R_elbow_angle" if arm == "R" else "L_elbow_angle"
     sh_x = "R_sh_x" if arm == "R" else "L_sh_x"
     el_x = "R_el_x" if arm == "R" else "L_el_x"
 
-    buf = deque(maxlen=SMOOTH_N)
-    state = "down"
-    rep_id = 0
-    reps = []
-
-    current = None
-
-    for _, r in df_vid.iterrows():
-        if float(r.get("conf_mean", 0.0)) < MIN_CONF:
-            continue
-
-        ang = float(r[angle_col])
-        buf.append(ang)
-        ang_s = float(np.median(buf))
+    # low-confidence frames are skipped entirely (they don't enter the smoothing window)
+    keep = ~(df_vid["conf_mean"].to_numpy(np.float64) < MIN_CONF)
+    col = lambda c: df_vid[c].to_numpy(np.float64)[keep]
 
-        shoulder_w = float(r.get("shoulder_width_px", 2.0))
-        if shoulder_w < 2:
-            shoulder_w = 2
+    times_all = col("time_sec")
+    trunk_all = col("trunk_offset_norm")
 
-        drift = abs(float(r[el_x]) - float(r[sh_x]))
-        drift_norm = safe_div(drift, shoulder_w)
+    shoulder_w = col("shoulder_width_px")
+    shoulder_w = np.where(shoulder_w < 2, 2.0, shoulder_w)
+    drift_norm = safe_div(np.abs(col(el_x) - col(sh_x)), shoulder_w)
 
-        # Start only after you actually initiate the curl (hit "up")
-        if state == "down":
-            if ang_s <= TOP_THR:
-                state = "up"
-                current = {"angles": [], "times": [], "trunk": [], "drift": []}
+    # Start only after you actually initiate the curl (hit "up"); end on return to bottom
+    ang_s, segs = RepSegmenter(REP_CONFIG).run(col(angle_col), times_all)
 
-        if state == "up" and current is not None:
-            current["angles"].append(ang_s)
-            current["times"].append(float(r["time_sec"]))
-            current["trunk"].append(float(r["trunk_offset_norm"]))
-            current["drift"].append(float(drift_norm))
-
-            # Safety reset: avoid giant stuck reps
-            if (current["times"][-1] - current["times"][0]) > MAX_REP_TIME:
-                state = "down"
-                current = None
-                buf.clear()
-                continue
-
-            # End rep on return to bottom
-            if ang_s >= BOT_THR:
-                if len(current["angles"]) >= MIN_REP_FRAMES:
-                    rep_id += 1
-                    angles = np.array(current["angles"], dtype=np.float32)
-                    times  = np.array(current["times"], dtype=np.float32)
-                    trunk  = np.array(current["trunk"], dtype=np.float32)
-                    driftv = np.array(current["drift"], dtype=np.float32)
-
-                    reps.append({
-                        "arm": arm,
-                        "rep_number": rep_id,
-                        "min_angle": float(np.min(angles)),
-                        "max_angle": float(np.max(angles)),
-                        "rom": float(np.max(angles) - np.min(angles)),
-                        "duration": float(times[-1] - times[0]),
-                        "trunk_absmax": float(np.max(np.abs(trunk))),
-                        "elbow_drift_absmax": float(np.max(driftv)),
-                        "elbow_drift_mean": float(np.mean(driftv)),
-                        "n_frames": int(len(angles)),
-                    })
-
-                state = "down"
-                current = None
+    reps = []
+    for rep_id, (first, last) in enumerate(segs, start=1):
+        span = slice(first, last + 1)
+        angles = ang_s[span].astype(np.float32)
+        times  = times_all[span].astype(np.float32)
+        trunk  = trunk_all[span].astype(np.float32)
+        driftv = drift_norm[span].astype(np.float32)
+
+        reps.append({
+            "arm": arm,
+            "rep_number": rep_id,
+            "min_angle": float(np.min(angles)),
+            "max_angle": float(np.max(angles)),
+            "rom": float(np.max(angles) - np.min(angles)),
+            "duration": float(times[-1] - times[0]),
+            "trunk_absmax": float(np.max(np.abs(trunk))),
+            "elbow_drift_absmax": float(np.max(driftv)),
+            "elbow_drift_mean": float(np.mean(driftv)),
+            "n_frames": int(len(angles)),
+        })
 
     return reps
 
@@ -114,9 +85,7 @@ def pick_best_arm(repR, repL):
     return repR if repR["elbow_drift_absmax"] <= repL["elbow_drift_absmax"] else repL
 
 def main():
-    df = pd.read_csv(IN_CSV)
-    df = df[df["exercise"] == "bicep_curl"].copy()
-    df = df.sort_values(["video_id", "frame_idx"])
+    df = load_frames("bicep_curl", COLUMNS)   # sorted by video_id, frame_idx
 
     out_rows = []
     for vid, df_vid in df.groupby("video_id"):
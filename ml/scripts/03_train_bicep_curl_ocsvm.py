@@ -6,6 +6,8 @@ from pathlib import Path
 from sklearn.preprocessing import RobustScaler
 from sklearn.svm import OneClassSVM
 
+from ocsvm_score import export_scoring
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 IN_CSV  = PROJECT_ROOT / "datasets" / "reps" / "bicep_curl_reps.csv"
 OUT_PKL = PROJECT_ROOT / "models" / "bicep_curl_ocsvm.pkl"
@@ -60,6 +62,9 @@ def main():
         "model": model,
     }
 
+    # plain-array scoring form for the live scorers (ocsvm_score.OCSVMScorer)
+    bundle["scoring"] = export_scoring(bundle)
+
     joblib.dump(bundle, OUT_PKL)
 
     print("\nModel trained successfully.")
@@ -6,6 +6,8 @@ from pathlib import Path
 from sklearn.preprocessing import RobustScaler
 from sklearn.svm import OneClassSVM
 
+from ocsvm_score import export_scoring
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 IN_CSV  = PROJECT_ROOT / "datasets" / "reps" / "lateral_raise_reps.csv"
 OUT_PKL = PROJECT_ROOT / "models" / "lateral_raise_ocsvm.pkl"
@@ -63,6 +65,9 @@ def main():
         "model": model,
     }
 
+    # plain-array scoring form for the live scorers (ocsvm_score.OCSVMScorer)
+    bundle["scoring"] = export_scoring(bundle)
+
     joblib.dump(bundle, OUT_PKL)
 
     print("\nModel trained successfully.")
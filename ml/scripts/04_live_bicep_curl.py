@@ -5,10 +5,15 @@ import mediapipe as mp
 import joblib
 import time
 import random
-import json
 from collections import deque
 from pathlib import Path
 
+from ocsvm_score import OCSVMScorer
+from pose_features import frame_features
+from pose_roi import RoiPose
+from status_mirror import write_status as mirror_status
+from rep_engine import REP_CONFIGS, RepSegmenter, RepStats, START, END, SKIP
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 MODEL_PKL = PROJECT_ROOT / "models" / "bicep_curl_ocsvm.pkl"
 OUT_DIR = PROJECT_ROOT / "outputs"
@@ -19,10 +24,8 @@ CAM_INDEX = 0
 MIN_CONF = 0.50
 
 # Rep detection thresholds
-TOP_THR = 75
-BOT_THR = 155
-SMOOTH_N = 7
-MIN_REP_TIME = 0.35
+# rep thresholds / smoothing: rep_engine.REP_CONFIGS (same reps as 02_build_reps_bicep_curl.py)
+REP_CONFIG = REP_CONFIGS["bicep_curl"]
 
 # --- Very permissive elbow drift thresholds (main posture focus) ---
 ELBOW_DRIFT_WARN = 0.35
@@ -79,29 +82,8 @@ def write_status(payload):
     Writes a small JSON your web app can read.
     Safe to overwrite every update.
     """
-    try:
-        payload = dict(payload)
-        payload["timestamp"] = time.time()
-        STATUS_JSON.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-
-
-def calculate_angle(a, b, c):
-    a = np.array(a, dtype=np.float32)
-    b = np.array(b, dtype=np.float32)
-    c = np.array(c, dtype=np.float32)
-    ba = a - b
-    bc = c - b
-    denom = (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
-    cos_angle = float(np.dot(ba, bc) / denom)
-    cos_angle = float(np.clip(cos_angle, -1.0, 1.0))
-    return float(np.degrees(np.arccos(cos_angle)))
-
-
-def lm_xyv(landmarks, idx, w, h):
-    lm = landmarks[idx]
-    return (lm.x * w, lm.y * h, float(lm.visibility))
+    # queued; written (atomically, rate-limited) by the status_mirror thread
+    mirror_status(STATUS_JSON, payload)
 
 
 def safe_div(a, b, eps=1e-6):
@@ -169,17 +151,27 @@ class CurlRepCounter:
     Tracks reps and stores per-rep arrays.
     Also stores whether ANY tip/bad happened during the rep (not just last frame).
     """
+    __slots__ = ("seg", "angles", "drift", "rep_start_t", "rep_tip_seen", "rep_bad_seen",
+                 "rep_tip_reason", "rep_bad_reason")
+
     def __init__(self):
-        self.state = "down"
-        self.rep_count = 0
-        self.last_rep_t = 0.0
-        self.buf = deque(maxlen=SMOOTH_N)
-        self.reset_rep(time.time())
+        self.seg = RepSegmenter(REP_CONFIG)
+        self.angles = RepStats()
+        self.drift = RepStats()
+        self.reset_rep(None)
+
+    @property
+    def state(self):
+        return self.seg.state
+
+    @property
+    def rep_count(self):
+        return self.seg.rep_count
 
     def reset_rep(self, t):
         self.rep_start_t = t
-        self.angles = []
-        self.drift = []  # drift for rep-arm only (the one used for counting)
+        self.angles.reset()
+        self.drift.reset()  # drift for rep-arm only (the one used for counting)
 
         self.rep_tip_seen = False
         self.rep_bad_seen = False
@@ -197,46 +189,40 @@ class CurlRepCounter:
             if not self.rep_tip_reason:
                 self.rep_tip_reason = str(tip_list[0])
 
-    def update(self, elbow_angle, elbow_drift_norm):
-        now = time.time()
-        self.buf.append(float(elbow_angle))
-        ang_s = float(np.median(self.buf))
+    def update(self, elbow_angle, elbow_drift_norm, t=None):
+        # t: frame capture time; pass it so pose latency doesn't leak into rep timing
+        now = time.time() if t is None else float(t)
+        ev = self.seg.push(elbow_angle, now)
+        ang_s = self.seg.smoothed
 
-        self.angles.append(ang_s)
-        self.drift.append(float(elbow_drift_norm))
+        if ev == START:
+            self.reset_rep(now)
+        if self.seg.state == "up" or ev in (END, SKIP):
+            self.angles.push(ang_s)
+            self.drift.push(float(elbow_drift_norm))
 
         rep_done = False
         rep_summary = None
 
-        if self.state == "down":
-            if ang_s <= TOP_THR:
-                self.state = "up"
-        else:
-            if ang_s >= BOT_THR:
-                if (now - self.last_rep_t) >= MIN_REP_TIME and len(self.angles) >= 6:
-                    self.rep_count += 1
-                    self.last_rep_t = now
-                    rep_done = True
-
-                    angles = np.array(self.angles, dtype=np.float32)
-                    drift  = np.array(self.drift, dtype=np.float32)
-
-                    rep_summary = {
-                        "rep": self.rep_count,
-                        "min_angle": float(angles.min()),
-                        "max_angle": float(angles.max()),
-                        "rom": float(angles.max() - angles.min()),
-                        "duration": float(now - self.rep_start_t),
-                        "elbow_drift_absmax": float(np.max(drift)),
-
-                        "rep_tip_seen": bool(self.rep_tip_seen),
-                        "rep_bad_seen": bool(self.rep_bad_seen),
-                        "rep_tip_reason": str(self.rep_tip_reason),
-                        "rep_bad_reason": str(self.rep_bad_reason),
-                    }
-
-                self.state = "down"
-                self.reset_rep(now)
+        if ev == END:
+            rep_done = True
+
+            rep_summary = {
+                "rep": self.rep_count,
+                "min_angle": self.angles.min,
+                "max_angle": self.angles.max,
+                "rom": self.angles.range(),
+                "duration": float(now - self.rep_start_t),
+                "elbow_drift_absmax": self.drift.max,
+
+                "rep_tip_seen": bool(self.rep_tip_seen),
+                "rep_bad_seen": bool(self.rep_bad_seen),
+                "rep_tip_reason": str(self.rep_tip_reason),
+                "rep_bad_reason": str(self.rep_bad_reason),
+            }
+
+        if ev not in (None, START):
+            self.reset_rep(now)
 
         return ang_s, rep_done, rep_summary
 
@@ -287,8 +273,7 @@ def main():
     write_status({"state": "running", "message": "Bicep curl tracking active."})
 
     bundle = joblib.load(MODEL_PKL)
-    scaler = bundle["scaler"]
-    model  = bundle["model"]
+    scorer = OCSVMScorer.from_bundle(bundle)
     feats  = bundle["features"]
     thr    = float(bundle["threshold"])
 
@@ -340,16 +325,18 @@ def main():
         enable_segmentation=False,
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5,
-    ) as pose:
+    ) as mp_tracker:
+        # crop to the trainee before pose inference (pose_roi.py)
+        pose = RoiPose(mp_tracker)
 
         while True:
             ok, frame = cap.read()
             if not ok:
                 break
+            frame_t = time.time()  # capture time, before pose inference
 
             h, w = frame.shape[:2]
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            res = pose.process(rgb)
+            res = pose.process_bgr(frame)
 
             feedback = "Tracking..."
             fb_color = TEXT_COLOR
@@ -358,35 +345,23 @@ def main():
             left_elbow_level = 0
 
             if res.pose_landmarks:
-                lm = res.pose_landmarks.landmark
-
-                LSH = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_SHOULDER,  w, h)
-                RSH = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_SHOULDER, w, h)
-                LEL = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_ELBOW,     w, h)
-                REL = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_ELBOW,    w, h)
-                LWR = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_WRIST,     w, h)
-                RWR = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_WRIST,    w, h)
-                LHP = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_HIP,       w, h)
-                RHP = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_HIP,      w, h)
+                # all per-frame features in one batched pass (pose_features, shared with 01_extract_frames)
+                F = frame_features(res.pose_landmarks.landmark, w, h, min_shoulder_width=2)
 
-                conf_mean = float(np.mean([LSH[2], RSH[2], LEL[2], REL[2], LWR[2], RWR[2], LHP[2], RHP[2]]))
+                conf_mean = F["conf_mean"]
 
                 draw_skeleton_neutral(frame, res.pose_landmarks)
 
                 if conf_mean >= MIN_CONF:
-                    shoulder_width = abs(LSH[0] - RSH[0])
-                    if shoulder_width < 2:
-                        shoulder_width = 2
-
                     # Compute BOTH arms every frame (dynamic highlighting)
-                    right_angle = calculate_angle((RSH[0], RSH[1]), (REL[0], REL[1]), (RWR[0], RWR[1]))
-                    left_angle  = calculate_angle((LSH[0], LSH[1]), (LEL[0], LEL[1]), (LWR[0], LWR[1]))
+                    right_angle = F["R_elbow_angle"]
+                    left_angle  = F["L_elbow_angle"]
 
-                    right_drift_norm = safe_div(abs(REL[0] - RSH[0]), shoulder_width)
-                    left_drift_norm  = safe_div(abs(LEL[0] - LSH[0]), shoulder_width)
+                    right_drift_norm = F["R_elbow_drift"]
+                    left_drift_norm  = F["L_elbow_drift"]
 
                     # Choose rep-arm ONLY for rep counting stability
-                    use_right_for_rep = (REL[2] >= LEL[2])
+                    use_right_for_rep = (F["R_el_vis"] >= F["L_el_vis"])
                     elbow_angle_for_rep = right_angle if use_right_for_rep else left_angle
                     elbow_drift_for_rep = right_drift_norm if use_right_for_rep else left_drift_norm
 
@@ -440,7 +415,7 @@ def main():
                         rep_counter.mark_feedback(bad, tips)
 
                     elbow_s, rep_done, rep_sum = rep_counter.update(
-                        elbow_angle_for_rep, elbow_drift_for_rep
+                        elbow_angle_for_rep, elbow_drift_for_rep, t=frame_t
                     )
 
                     if rep_done and rep_sum:
@@ -457,8 +432,7 @@ def main():
                             feat_map["trunk_absmax"] = 0.0  # neutral placeholder
 
                         x = np.array([[feat_map[f] for f in feats]], dtype=np.float32)
-                        xs = scaler.transform(x)
-                        score = float(model.decision_function(xs)[0])
+                        score = scorer.score(x[0])
 
                         recent.append({
                             "rom": rep_sum["rom"],
@@ -5,10 +5,15 @@ import mediapipe as mp
 import joblib
 import time
 import random
-import json
 from collections import deque
 from pathlib import Path
 
+from ocsvm_score import OCSVMScorer
+from pose_features import frame_features
+from pose_roi import RoiPose
+from status_mirror import write_status as mirror_status
+from rep_engine import REP_CONFIGS, RepSegmenter, RepStats, START, END, SKIP
+
 # ---------------- PATHS ----------------
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 MODEL_PKL = PROJECT_ROOT / "models" / "lateral_raise_ocsvm.pkl"
@@ -22,19 +27,10 @@ CAM_INDEX = 0
 MIN_CONF = 0.50
 
 # ---------------- REP DETECTION ----------------
-SMOOTH_N = 7
-MIN_REP_TIME = 0.35
-MAX_REP_TIME = 8.0
-MIN_REP_FRAMES = 6
-
-# Baseline tuning (fix: rep end was "too low")
-BASELINE_FRAMES = 90      # ~3 sec calibration (more stable)
-BASELINE_PCT = 25         # down-position cluster
-BASELINE_CLAMP_LO = -0.35
-BASELINE_CLAMP_HI = 0.10
-
-DOWN_OFFSET = 0.04        # higher bottom threshold so you don't need to dead-hang
-UP_OFFSET   = 0.25        # start of raise
+# smoothing, baseline calibration (~3 sec), thresholds, min frames / time:
+# rep_engine.REP_CONFIGS (same reps as 02_build_reps_lateral_raise.py)
+REP_CONFIG = REP_CONFIGS["lateral_raise"]
+BASELINE_FRAMES = REP_CONFIG.baseline_frames   # torso height calibration window
 
 # ---------------- COACHING THRESHOLDS ----------------
 TRUNK_WARN = 0.12
@@ -100,17 +96,8 @@ mp_draw = mp.solutions.drawing_utils
 
 
 def write_status(payload):
-    try:
-        payload = dict(payload)
-        payload["timestamp"] = time.time()
-        STATUS_JSON.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-
-
-def lm_xyv(landmarks, idx, w, h):
-    lm = landmarks[idx]
-    return (lm.x * w, lm.y * h, float(lm.visibility))
+    # queued; written (atomically, rate-limited) by the status_mirror thread
+    mirror_status(STATUS_JSON, payload)
 
 
 def safe_div(a, b, eps=1e-6):
@@ -122,18 +109,6 @@ def median_or(x, fallback):
     return float(np.median(x)) if len(x) else float(fallback)
 
 
-def calculate_angle(a, b, c):
-    a = np.array(a, dtype=np.float32)
-    b = np.array(b, dtype=np.float32)
-    c = np.array(c, dtype=np.float32)
-    ba = a - b
-    bc = c - b
-    denom = (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
-    cos_angle = float(np.dot(ba, bc) / denom)
-    cos_angle = float(np.clip(cos_angle, -1.0, 1.0))
-    return float(np.degrees(np.arccos(cos_angle)))
-
-
 def draw_skeleton_neutral(frame, pose_landmarks):
     if pose_landmarks is None:
         return
@@ -199,26 +174,43 @@ class LateralRepCounter:
       - per-rep memory (tip/bad seen)
       - locks arm label once rep starts
     """
-    def __init__(self):
-        self.buf = deque(maxlen=SMOOTH_N)
-        self.state = "down"
-        self.rep_count = 0
-        self.last_rep_t = 0.0
+    __slots__ = ("seg", "vals", "trunk", "elbow", "rep_start_t", "rep_tip_seen", "rep_bad_seen",
+                 "rep_tip_reason", "rep_bad_reason", "rep_arm")
 
-        self.baseline_samples = []
-        self.baseline_ready = False
-        self.baseline = -0.10
-        self.down_thr = -0.06
-        self.up_thr = 0.19
-
-        self.rep_arm = None
-        self.reset_rep(time.time())
+    def __init__(self):
+        self.seg = RepSegmenter(REP_CONFIG)
+        self.vals = RepStats()
+        self.trunk = RepStats()
+        self.elbow = RepStats()
+        self.rep_arm = None  # "R" or "L", locked during rep
+        self.reset_rep(None)
+
+    @property
+    def state(self):
+        return self.seg.state
+
+    @property
+    def rep_count(self):
+        return self.seg.rep_count
+
+    # thresholds: defaults until the engine has calibrated on the first frames
+    @property
+    def baseline(self):
+        return self.seg.baseline
+
+    @property
+    def down_thr(self):
+        return self.seg.down_thr
+
+    @property
+    def up_thr(self):
+        return self.seg.up_thr
 
     def reset_rep(self, t):
         self.rep_start_t = t
-        self.vals = []
-        self.trunk = []
-        self.elbow = []
+        self.vals.reset()
+        self.trunk.reset()
+        self.elbow.reset()
 
         self.rep_tip_seen = False
         self.rep_bad_seen = False
@@ -227,21 +219,6 @@ class LateralRepCounter:
 
         self.rep_arm = None
 
-    def update_baseline(self, y_s):
-        if self.baseline_ready:
-            return
-        self.baseline_samples.append(float(y_s))
-        if len(self.baseline_samples) >= BASELINE_FRAMES:
-            s = np.array(self.baseline_samples, dtype=np.float32)
-            s = s[np.isfinite(s)]
-            base = float(np.percentile(s, BASELINE_PCT)) if len(s) else -0.10
-            base = float(np.clip(base, BASELINE_CLAMP_LO, BASELINE_CLAMP_HI))
-
-            self.baseline = base
-            self.down_thr = float(self.baseline + DOWN_OFFSET)
-            self.up_thr   = float(self.down_thr + UP_OFFSET)
-            self.baseline_ready = True
-
     def mark_feedback(self, bad_list, tip_list):
         if bad_list:
             self.rep_bad_seen = True
@@ -252,78 +229,53 @@ class LateralRepCounter:
             if not self.rep_tip_reason:
                 self.rep_tip_reason = str(tip_list[0])
 
-    def update(self, wrist_rel_y, trunk_offset_norm, elbow_angle, arm_label):
-        now = time.time()
+    def update(self, wrist_rel_y, trunk_offset_norm, elbow_angle, arm_label, t=None):
+        # t: frame capture time; pass it so pose latency doesn't leak into rep timing
+        now = time.time() if t is None else float(t)
 
-        self.buf.append(float(wrist_rel_y))
-        y_s = float(np.median(self.buf))
+        # state == "up": collect only if matching locked arm (only those frames count toward min frames)
+        same_arm = self.rep_arm is None or arm_label == self.rep_arm
 
-        self.update_baseline(y_s)
+        # smoothing, baseline calibration, start / end / stuck reset: rep_engine
+        ev = self.seg.push(wrist_rel_y, now, counted=same_arm)
+        y_s = self.seg.smoothed
 
-        # stuck safety reset
-        if (now - self.rep_start_t) > MAX_REP_TIME:
-            self.state = "down"
+        if ev == START:
             self.reset_rep(now)
-            self.buf.clear()
-            return y_s, False, None
-
-        if not self.baseline_ready:
-            return y_s, False, None
+            self.rep_arm = arm_label
+        if same_arm and (self.seg.state == "up" or ev in (END, SKIP)):
+            self.vals.push(y_s)
+            self.trunk.push(float(trunk_offset_norm))
+            self.elbow.push(float(elbow_angle))
 
         rep_done = False
         rep_summary = None
 
-        # Start rep
-        if self.state == "down":
-            if y_s >= self.up_thr:
-                self.state = "up"
-                self.rep_arm = arm_label
-                self.reset_rep(now)
-
-                self.vals.append(y_s)
-                self.trunk.append(float(trunk_offset_norm))
-                self.elbow.append(float(elbow_angle))
-            return y_s, False, None
-
-        # Collect while up (only if matches locked arm)
-        if self.rep_arm is None or arm_label == self.rep_arm:
-            self.vals.append(y_s)
-            self.trunk.append(float(trunk_offset_norm))
-            self.elbow.append(float(elbow_angle))
-
-        # End rep
-        if y_s <= self.down_thr:
-            if (now - self.last_rep_t) >= MIN_REP_TIME and len(self.vals) >= MIN_REP_FRAMES:
-                self.rep_count += 1
-                self.last_rep_t = now
-                rep_done = True
-
-                vals  = np.array(self.vals, dtype=np.float32)
-                trunk = np.array(self.trunk, dtype=np.float32)
-                elbow = np.array(self.elbow, dtype=np.float32)
-
-                rep_summary = {
-                    "rep": int(self.rep_count),
-                    "min_wrist_rel_y": float(vals.min()),
-                    "max_wrist_rel_y": float(vals.max()),
-                    "wrist_rel_range": float(vals.max() - vals.min()),
-                    "duration": float(now - self.rep_start_t),
-                    "trunk_absmax": float(np.max(np.abs(trunk))) if len(trunk) else 0.0,
-                    "elbow_min": float(np.min(elbow)) if len(elbow) else 180.0,
-
-                    "baseline": float(self.baseline),
-                    "down_thr": float(self.down_thr),
-                    "up_thr": float(self.up_thr),
-                    "arm": str(self.rep_arm) if self.rep_arm else str(arm_label),
-
-                    "rep_tip_seen": bool(self.rep_tip_seen),
-                    "rep_bad_seen": bool(self.rep_bad_seen),
-                    "rep_tip_reason": str(self.rep_tip_reason),
-                    "rep_bad_reason": str(self.rep_bad_reason),
-                    "n_frames": int(len(vals)),
-                }
-
-            self.state = "down"
+        if ev == END:
+            rep_done = True
+
+            rep_summary = {
+                "rep": int(self.rep_count),
+                "min_wrist_rel_y": self.vals.min,
+                "max_wrist_rel_y": self.vals.max,
+                "wrist_rel_range": self.vals.range(),
+                "duration": float(now - self.rep_start_t),
+                "trunk_absmax": self.trunk.absmax if len(self.trunk) else 0.0,
+                "elbow_min": self.elbow.min if len(self.elbow) else 180.0,
+
+                "baseline": float(self.baseline),
+                "down_thr": float(self.down_thr),
+                "up_thr": float(self.up_thr),
+                "arm": str(self.rep_arm) if self.rep_arm else str(arm_label),
+
+                "rep_tip_seen": bool(self.rep_tip_seen),
+                "rep_bad_seen": bool(self.rep_bad_seen),
+                "rep_tip_reason": str(self.rep_tip_reason),
+                "rep_bad_reason": str(self.rep_bad_reason),
+                "n_frames": len(self.vals),
+            }
+
+        if ev not in (None, START):
             self.reset_rep(now)
 
         return y_s, rep_done, rep_summary
@@ -373,8 +325,7 @@ def main():
     write_status({"state": "running", "message": "Lateral raise tracking active."})
 
     bundle = joblib.load(MODEL_PKL)
-    scaler = bundle["scaler"]
-    model  = bundle["model"]
+    scorer = OCSVMScorer.from_bundle(bundle)
     feats  = bundle["features"]
     thr    = float(bundle["threshold"])
 
@@ -434,16 +385,18 @@ def main():
         enable_segmentation=False,
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5,
-    ) as pose:
+    ) as mp_tracker:
+        # crop to the trainee before pose inference (pose_roi.py)
+        pose = RoiPose(mp_tracker)
 
         while True:
             ok, frame = cap.read()
             if not ok:
                 break
+            frame_t = time.time()  # capture time, before pose inference
 
             h, w = frame.shape[:2]
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            res = pose.process(rgb)
+            res = pose.process_bgr(frame)
 
             feedback = "Tracking..."
             fb_color = TEXT_COLOR
@@ -455,40 +408,22 @@ def main():
             elbow_level_left = 0
 
             if res.pose_landmarks:
-                lm = res.pose_landmarks.landmark
-
-                LSH = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_SHOULDER,  w, h)
-                RSH = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_SHOULDER, w, h)
-                LEL = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_ELBOW,     w, h)
-                REL = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_ELBOW,    w, h)
-                LWR = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_WRIST,     w, h)
-                RWR = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_WRIST,    w, h)
-                LHP = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_HIP,       w, h)
-                RHP = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_HIP,      w, h)
+                # all per-frame features in one batched pass (pose_features, shared with 01_extract_frames)
+                F = frame_features(res.pose_landmarks.landmark, w, h, min_shoulder_width=2)
 
-                conf_mean = float(np.mean([LSH[2], RSH[2], LEL[2], REL[2], LWR[2], RWR[2], LHP[2], RHP[2]]))
+                conf_mean = F["conf_mean"]
 
                 draw_skeleton_neutral(frame, res.pose_landmarks)
 
                 if conf_mean >= MIN_CONF:
-                    shoulder_width = abs(LSH[0] - RSH[0])
-                    if shoulder_width < 2:
-                        shoulder_width = 2
-
                     bad = []
                     tips = []
 
                     # trunk side-to-side offset
-                    mid_sh_x = (LSH[0] + RSH[0]) / 2.0
-                    mid_hp_x = (LHP[0] + RHP[0]) / 2.0
-                    trunk_offset_norm = safe_div((mid_sh_x - mid_hp_x), shoulder_width)
-
-                    # midpoints
-                    mid_sh = ((LSH[0] + RSH[0]) / 2.0, (LSH[1] + RSH[1]) / 2.0)
-                    mid_hp = ((LHP[0] + RHP[0]) / 2.0, (LHP[1] + RHP[1]) / 2.0)
+                    trunk_offset_norm = F["trunk_offset_norm"]
 
                     # forward/back lean proxy: torso "compression"
-                    torso_h_norm = abs(mid_sh[1] - mid_hp[1]) / shoulder_width
+                    torso_h_norm = F["torso_h_norm"]
 
                     # calibrate torso_h0 during early frames
                     if torso_h0 is None:
@@ -499,15 +434,15 @@ def main():
                                 torso_h0 = TORSO_COMP_MIN_BASE
 
                     # wrists relative heights
-                    yR = safe_div((RSH[1] - RWR[1]), shoulder_width)
-                    yL = safe_div((LSH[1] - LWR[1]), shoulder_width)
+                    yR = F["R_wrist_rel_y"]
+                    yL = F["L_wrist_rel_y"]
 
                     # elbow angles
-                    angR = calculate_angle((RSH[0], RSH[1]), (REL[0], REL[1]), (RWR[0], RWR[1]))
-                    angL = calculate_angle((LSH[0], LSH[1]), (LEL[0], LEL[1]), (LWR[0], LWR[1]))
+                    angR = F["R_elbow_angle"]
+                    angL = F["L_elbow_angle"]
 
                     # choose arm by wrist visibility; rep counter locks it
-                    use_right = (RWR[2] >= LWR[2])
+                    use_right = (F["R_wr_vis"] >= F["L_wr_vis"])
                     arm_label = "R" if use_right else "L"
                     wrist_rel_y = yR if use_right else yL
                     elbow_angle = angR if use_right else angL
@@ -636,7 +571,8 @@ def main():
                         wrist_rel_y=wrist_rel_y,
                         trunk_offset_norm=trunk_offset_norm,
                         elbow_angle=elbow_angle,
-                        arm_label=arm_label
+                        arm_label=arm_label,
+                        t=frame_t,
                     )
 
                     # rep complete => ML + fatigue + JSON
@@ -657,8 +593,7 @@ def main():
                             continue
 
                         x = np.array([[feat_map[f] for f in feats]], dtype=np.float32)
-                        xs = scaler.transform(x)
-                        score = float(model.decision_function(xs)[0])
+                        score = scorer.score(x[0])
 
                         recent.append({
                             "range": rep_sum["wrist_rel_range"],
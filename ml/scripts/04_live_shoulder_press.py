@@ -5,10 +5,15 @@ import mediapipe as mp
 import joblib
 import time
 import random
-import json
 from collections import deque
 from pathlib import Path
 
+from ocsvm_score import OCSVMScorer
+from pose_features import frame_features
+from pose_roi import RoiPose
+from status_mirror import write_status as mirror_status
+from rep_engine import REP_CONFIGS, RepSegmenter, RepStats, START, END, SKIP
+
 # ---------------- PATHS ----------------
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 MODEL_PKL = PROJECT_ROOT / "models" / "shoulder_press_ocsvm.pkl"
@@ -22,14 +27,9 @@ CAM_INDEX = 0
 MIN_CONF = 0.50
 
 # ---------------- REP DETECTION (KEEP OLD MVP BEHAVIOR) ----------------
-SMOOTH_N = 7
-MIN_REP_TIME = 0.35
-MAX_REP_TIME = 8.0  # make it match your "real thing" lenience
-
-BASELINE_FRAMES = 30      # ~1 sec (old behavior)
-UP_OFFSET = 0.25          # old behavior (down_thr + offset)
-
-MIN_REP_FRAMES = 6
+# smoothing, baseline calibration (~1 sec), thresholds, min frames / time:
+# rep_engine.REP_CONFIGS (same reps as 02_build_reps_shoulder_press.py)
+REP_CONFIG = REP_CONFIGS["shoulder_press"]
 
 # ---------------- COACHING THRESHOLDS ----------------
 TRUNK_WARN = 0.13
@@ -89,16 +89,8 @@ mp_pose = mp.solutions.pose
 mp_draw = mp.solutions.drawing_utils
 
 def write_status(payload):
-    try:
-        payload = dict(payload)
-        payload["timestamp"] = time.time()
-        STATUS_JSON.write_text(json.dumps(payload, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-
-def lm_xyv(landmarks, idx, w, h):
-    lm = landmarks[idx]
-    return (lm.x * w, lm.y * h, float(lm.visibility))
+    # queued; written (atomically, rate-limited) by the status_mirror thread
+    mirror_status(STATUS_JSON, payload)
 
 def safe_div(a, b, eps=1e-6):
     return float(a / (b + eps))
@@ -166,27 +158,43 @@ class PressRepCounter:
       - stores per-rep arrays for range/trunk/stack
       - optional arm lock: pick rep-arm at rep start, keep until rep ends
     """
+    __slots__ = ("seg", "vals", "trunk", "stack", "rep_start_t", "rep_tip_seen", "rep_bad_seen",
+                 "rep_tip_reason", "rep_bad_reason", "rep_arm")
+
     def __init__(self):
-        self.buf = deque(maxlen=SMOOTH_N)
-        self.state = "down"
-        self.rep_count = 0
-        self.last_rep_t = 0.0
+        self.seg = RepSegmenter(REP_CONFIG)
+        self.vals = RepStats()
+        self.trunk = RepStats()
+        self.stack = RepStats()
+        self.rep_arm = None  # "R" or "L", locked during rep
+        self.reset_rep(None)
 
-        self.baseline_samples = []
-        self.baseline_ready = False
-        self.baseline = 0.10
-        self.down_thr = 0.15
-        self.up_thr = 0.45
+    @property
+    def state(self):
+        return self.seg.state
 
-        self.rep_arm = None  # "R" or "L", locked during rep
+    @property
+    def rep_count(self):
+        return self.seg.rep_count
+
+    # thresholds: defaults until the engine has calibrated on the first frames
+    @property
+    def baseline(self):
+        return self.seg.baseline
+
+    @property
+    def down_thr(self):
+        return self.seg.down_thr
 
-        self.reset_rep(time.time())
+    @property
+    def up_thr(self):
+        return self.seg.up_thr
 
     def reset_rep(self, t):
         self.rep_start_t = t
-        self.vals = []
-        self.trunk = []
-        self.stack = []
+        self.vals.reset()
+        self.trunk.reset()
+        self.stack.reset()
 
         self.rep_tip_seen = False
         self.rep_bad_seen = False
@@ -195,30 +203,6 @@ class PressRepCounter:
 
         self.rep_arm = None
 
-    def update_baseline(self, wrist_rel_y):
-        if self.baseline_ready:
-            return
-        self.baseline_samples.append(float(wrist_rel_y))
-
-        if len(self.baseline_samples) >= BASELINE_FRAMES:
-            s = np.array(self.baseline_samples, dtype=np.float32)
-            s = s[np.isfinite(s)]
-
-            base_med = float(np.median(s))
-            s_sorted = np.sort(s)
-            upper_half = s_sorted[len(s_sorted)//2:]
-            rack_guess = float(np.median(upper_half)) if len(upper_half) else base_med
-
-            if base_med < 0.15 and rack_guess > base_med + 0.10:
-                baseline = rack_guess
-            else:
-                baseline = base_med
-
-            self.baseline = float(baseline)
-            self.down_thr = max(0.15, self.baseline + 0.02)
-            self.up_thr = self.down_thr + UP_OFFSET
-            self.baseline_ready = True
-
     def mark_feedback(self, bad_list, tip_list):
         if bad_list:
             self.rep_bad_seen = True
@@ -229,87 +213,61 @@ class PressRepCounter:
             if not self.rep_tip_reason:
                 self.rep_tip_reason = str(tip_list[0])
 
-    def update(self, wrist_rel_y, trunk_offset_norm, wrist_stack_norm, arm_label):
-        now = time.time()
+    def update(self, wrist_rel_y, trunk_offset_norm, wrist_stack_norm, arm_label, t=None):
+        # t: frame capture time; pass it so pose latency doesn't leak into rep timing
+        now = time.time() if t is None else float(t)
 
-        # smooth wrist height
-        self.buf.append(float(wrist_rel_y))
-        y_s = float(np.median(self.buf))
+        # state == "up": collect only if matching locked arm (only those frames count toward min frames)
+        same_arm = self.rep_arm is None or arm_label == self.rep_arm
 
-        # baseline calibration
-        self.update_baseline(y_s)
+        # smoothing, baseline calibration, start / end / stuck reset: rep_engine
+        ev = self.seg.push(wrist_rel_y, now, counted=same_arm)
+        y_s = self.seg.smoothed
 
-        # safety reset if stuck
-        if (now - self.rep_start_t) > MAX_REP_TIME:
-            self.state = "down"
+        if ev == START:
             self.reset_rep(now)
-            self.buf.clear()
-            return y_s, False, None
-
-        # if baseline isn't ready yet, don't count reps
-        if not self.baseline_ready:
-            return y_s, False, None
+            self.rep_arm = arm_label  # lock at rep start
+        if same_arm and (self.seg.state == "up" or ev in (END, SKIP)):
+            self.vals.push(y_s)
+            self.trunk.push(float(trunk_offset_norm))
+            self.stack.push(float(wrist_stack_norm))
 
         rep_done = False
         rep_summary = None
 
-        # lock arm once rep begins
-        if self.state == "down":
-            if y_s >= self.up_thr:
-                self.state = "up"
-                self.rep_arm = arm_label  # lock at rep start
-                self.reset_rep(now)
-                # store first frame of rep
-                self.vals.append(y_s)
-                self.trunk.append(float(trunk_offset_norm))
-                self.stack.append(float(wrist_stack_norm))
-            return y_s, False, None
-
-        # state == "up": collect only if matching locked arm
-        if self.rep_arm is None or arm_label == self.rep_arm:
-            self.vals.append(y_s)
-            self.trunk.append(float(trunk_offset_norm))
-            self.stack.append(float(wrist_stack_norm))
-
-        if y_s <= self.down_thr:
-            if (now - self.last_rep_t) >= MIN_REP_TIME and len(self.vals) >= MIN_REP_FRAMES:
-                self.rep_count += 1
-                self.last_rep_t = now
-                rep_done = True
-
-                vals = np.array(self.vals, dtype=np.float32)
-                trunk = np.array(self.trunk, dtype=np.float32)
-                stack = np.array(self.stack, dtype=np.float32)
-
-                rep_summary = {
-                    "rep": int(self.rep_count),
-                    "min_wrist_rel_y": float(vals.min()),
-                    "max_wrist_rel_y": float(vals.max()),
-                    "wrist_rel_range": float(vals.max() - vals.min()),
-                    "duration": float(now - self.rep_start_t),
-                    "trunk_absmax": float(np.max(np.abs(trunk))) if len(trunk) else 0.0,
-
-                    # IMPORTANT: keep key name consistent with your 03 FEATURES
-                    # We redefine "wrist_drift_absmax" to mean "wrist stack absmax"
-                    "wrist_drift_absmax": float(np.max(stack)) if len(stack) else 0.0,
-
-                    "baseline": float(self.baseline),
-                    "down_thr": float(self.down_thr),
-                    "up_thr": float(self.up_thr),
-                    "arm": str(self.rep_arm) if self.rep_arm else str(arm_label),
-
-                    "rep_tip_seen": bool(self.rep_tip_seen),
-                    "rep_bad_seen": bool(self.rep_bad_seen),
-                    "rep_tip_reason": str(self.rep_tip_reason),
-                    "rep_bad_reason": str(self.rep_bad_reason),
-                    "n_frames": int(len(vals)),
-                }
-
-            self.state = "down"
+        if ev == END:
+            rep_done = True
+
+            rep_summary = {
+                "rep": int(self.rep_count),
+                "min_wrist_rel_y": self.vals.min,
+                "max_wrist_rel_y": self.vals.max,
+                "wrist_rel_range": self.vals.range(),
+                "duration": float(now - self.rep_start_t),
+                "trunk_absmax": self.trunk.absmax if len(self.trunk) else 0.0,
+
+                # IMPORTANT: keep key name consistent with your 03 FEATURES
+                # We redefine "wrist_drift_absmax" to mean "wrist stack absmax"
+                "wrist_drift_absmax": self.stack.max if len(self.stack) else 0.0,
+
+                "baseline": float(self.baseline),
+                "down_thr": float(self.down_thr),
+                "up_thr": float(self.up_thr),
+                "arm": str(self.rep_arm) if self.rep_arm else str(arm_label),
+
+                "rep_tip_seen": bool(self.rep_tip_seen),
+                "rep_bad_seen": bool(self.rep_bad_seen),
+                "rep_tip_reason": str(self.rep_tip_reason),
+                "rep_bad_reason": str(self.rep_bad_reason),
+                "n_frames": len(self.vals),
+            }
+
+        if ev not in (None, START):
             self.reset_rep(now)
 
         return y_s, rep_done, rep_summary
 
+
 def compute_fatigue_index(baseline, range_med, dur_med, stack_med):
     """
     Similar structure to bicep:
@@ -356,8 +314,7 @@ def main():
     write_status({"state": "running", "message": "Shoulder press tracking active."})
 
     bundle = joblib.load(MODEL_PKL)
-    scaler = bundle["scaler"]
-    model  = bundle["model"]
+    scorer = OCSVMScorer.from_bundle(bundle)
     feats  = bundle["features"]
     thr    = float(bundle["threshold"])
 
@@ -406,16 +363,18 @@ def main():
         enable_segmentation=False,
         min_detection_confidence=0.5,
         min_tracking_confidence=0.5,
-    ) as pose:
+    ) as mp_tracker:
+        # crop to the trainee before pose inference (pose_roi.py)
+        pose = RoiPose(mp_tracker)
 
         while True:
             ok, frame = cap.read()
             if not ok:
                 break
+            frame_t = time.time()  # capture time, before pose inference
 
             h, w = frame.shape[:2]
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            res = pose.process(rgb)
+            res = pose.process_bgr(frame)
 
             feedback = "Tracking..."
             fb_color = TEXT_COLOR
@@ -426,41 +385,27 @@ def main():
             asym_level = 0
 
             if res.pose_landmarks:
-                lm = res.pose_landmarks.landmark
+                # all per-frame features in one batched pass (pose_features, shared with 01_extract_frames)
+                F = frame_features(res.pose_landmarks.landmark, w, h, min_shoulder_width=2)
 
-                LSH = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_SHOULDER,  w, h)
-                RSH = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_SHOULDER, w, h)
-                LEL = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_ELBOW,     w, h)
-                REL = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_ELBOW,    w, h)
-                LWR = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_WRIST,     w, h)
-                RWR = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_WRIST,    w, h)
-                LHP = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_HIP,       w, h)
-                RHP = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_HIP,      w, h)
-
-                conf_mean = float(np.mean([LSH[2], RSH[2], LEL[2], REL[2], LWR[2], RWR[2], LHP[2], RHP[2]]))
+                conf_mean = F["conf_mean"]
 
                 draw_skeleton_neutral(frame, res.pose_landmarks)
 
                 if conf_mean >= MIN_CONF:
-                    shoulder_width = abs(LSH[0] - RSH[0])
-                    if shoulder_width < 2:
-                        shoulder_width = 2
-
                     # trunk offset
-                    mid_sh_x = (LSH[0] + RSH[0]) / 2.0
-                    mid_hp_x = (LHP[0] + RHP[0]) / 2.0
-                    trunk_offset_norm = safe_div((mid_sh_x - mid_hp_x), shoulder_width)
+                    trunk_offset_norm = F["trunk_offset_norm"]
 
                     # wrist relative heights
-                    yR = safe_div((RSH[1] - RWR[1]), shoulder_width)
-                    yL = safe_div((LSH[1] - LWR[1]), shoulder_width)
+                    yR = F["R_wrist_rel_y"]
+                    yL = F["L_wrist_rel_y"]
 
                     # wrist stacked over elbow (this replaces "wrist drifting")
-                    stackR = safe_div(abs(RWR[0] - REL[0]), shoulder_width)
-                    stackL = safe_div(abs(LWR[0] - LEL[0]), shoulder_width)
+                    stackR = F["R_wrist_stack"]
+                    stackL = F["L_wrist_stack"]
 
                     # choose arm by wrist visibility (like old)
-                    use_right = (RWR[2] >= LWR[2])
+                    use_right = (F["R_wr_vis"] >= F["L_wr_vis"])
                     arm_label = "R" if use_right else "L"
                     wrist_rel_y = yR if use_right else yL
                     wrist_stack = stackR if use_right else stackL
@@ -543,7 +488,8 @@ def main():
                         wrist_rel_y=wrist_rel_y,
                         trunk_offset_norm=trunk_offset_norm,
                         wrist_stack_norm=wrist_stack,
-                        arm_label=arm_label
+                        arm_label=arm_label,
+                        t=frame_t,
                     )
 
                     # rep complete => ML + fatigue + JSON
@@ -562,8 +508,7 @@ def main():
                             continue
 
                         x = np.array([[feat_map[f] for f in feats]], dtype=np.float32)
-                        xs = scaler.transform(x)
-                        score = float(model.decision_function(xs)[0])
+                        score = scorer.score(x[0])
 
                         recent.append({
                             "range": rep_sum["wrist_rel_range"],
@@ -0,0 +1,476 @@
+# liftright/ml/scripts/bench_hotpaths.py
+# Micro-benchmarks for the realtime server's per-frame and per-rep hot paths, so a
+# change to realtime_server.py / realtime_*.py / pose_features.py can be checked
+# against a saved baseline instead of guessed at.
+#
+# Cases (per call; median, best and spread of REPEATS timing rounds):
+#   per frame   joint_angles          elbow angles (the vectorized calculate_angle)
+#               frame_features        landmarks -> feature dict (the old lm_xyv + angle assembly)
+#               compute_features[T]   one batched call over the whole stream (01_extract / builders)
+#               rep_update            the exercise's rep counter update, args picked like analyze()
+#               track                 ExercisePipeline.track: everything but pose + drawing
+#   per rep     ocsvm_score           OCSVMScorer.score (what the pipelines call)
+#               ocsvm_sklearn         scaler.transform + decision_function (reference)
+#               ocsvm_score_batch[N]  N reps in one call
+#               fatigue_index         the exercise's compute_fatigue_index
+#   per image   decode_dataurl_to_bgr / bgr_to_dataurl_jpeg (realtime_server, JPEG_QUALITY)
+#
+# Landmark streams:
+#   synthetic:<exercise>   generated reps (fixed seed), slower reps at the end so the
+#                          fatigue path runs
+#   recorded:<exercise>/<video>
+#                          the videos/<exercise>/ tree (like 01_extract_frames.py) run
+#                          through the server's Pose once; landmarks cached under
+#                          outputs/bench/streams/ (not timed)
+# Rep vectors for the OC-SVM cases come from datasets/reps/<exercise>_reps.csv.
+#
+#   python bench_hotpaths.py --save-baseline          # before the change
+#   python bench_hotpaths.py --compare                # after: exit 1 on a regression
+#   python bench_hotpaths.py --compare --only track --threshold-pct 15
+#
+# --compare gates on the best-of time (us_min: the least disturbed round, far steadier
+# than the median run to run), needs at least MIN_COMPARE_REPEATS rounds on both sides,
+# and ignores differences inside the noise floor: NOISE_FLOOR_US, or NOISE_SPREAD_K x the
+# larger measured spread (median - best) of the two runs, whichever is bigger.
+#
+# Results are saved as JSON under outputs/bench/ (baseline: outputs/bench/baseline.json).
+# Compare baselines from the same machine only.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import joblib
+import numpy as np
+import pandas as pd
+
+from pose_features import KEY_IDX, LSH, RSH, LEL, REL, LWR, RWR, joint_angles, compute_features, frame_features
+from realtime_common import MIN_CONF, MIN_SHOULDER_WIDTH_PX, new_pose
+
+# ---------------- CONFIG ----------------
+PROJECT_ROOT = Path(__file__).resolve().parents[1]   # .../ml
+VIDEOS_DIR   = PROJECT_ROOT / "videos"
+REPS_DIR     = PROJECT_ROOT / "datasets" / "reps"
+OUT_DIR      = PROJECT_ROOT / "outputs" / "bench"
+STREAMS_DIR  = OUT_DIR / "streams"
+BASELINE_JSON = OUT_DIR / "baseline.json"
+
+EXERCISES = ["bicep_curl", "lateral_raise", "shoulder_press"]
+VIDEO_EXTS = [".mp4", ".mov", ".mkv", ".avi"]
+
+# synthetic streams
+SYNTH_W, SYNTH_H = 640, 480
+SYNTH_FPS = 30.0
+SYNTH_REST_S = 3.5          # > lateral raise calibration (90 frames)
+SYNTH_REP_S = 2.0
+SYNTH_PAUSE_S = 0.4
+SYNTH_REPS = 12
+SYNTH_SLOW_AFTER = 8        # reps after this take SYNTH_SLOWDOWN x longer (fatigue)
+SYNTH_SLOWDOWN = 1.6
+SYNTH_JITTER = 0.002        # normalized coords
+SYNTH_SEED = 0
+
+# recorded streams
+MAX_FRAMES = 450            # per video
+FRAME_WIDTH = 640           # frames resized like the load test client before JPEG
+
+OCSVM_BATCH = 64
+REPEATS = 7                 # timing rounds per case
+MIN_ROUND_S = 0.05          # a round repeats the case until at least this long
+REGRESSION_PCT = 25.0       # best-of slower than baseline by more than this = regression
+NOISE_FLOOR_US = 0.5        # ... and by at least this much (sub-us cases jitter)
+NOISE_SPREAD_K = 2.0        # ... or this many times the runs' spread, if larger
+MIN_COMPARE_REPEATS = 5     # fewer rounds: best-of is not reliable enough to gate on
+
+
+# ----------------------------- STREAMS -----------------------------
+def synthetic_stream(exercise: str, seed: int = SYNTH_SEED) -> Dict[str, Any]:
+    """(T, 33, 4) landmarks of SYNTH_REPS reps after a rest period, plus frame times."""
+    rng = np.random.default_rng(seed)
+    fps = SYNTH_FPS
+    phase = [np.zeros(int(SYNTH_REST_S * fps))]
+    for r in range(SYNTH_REPS):
+        n = int(SYNTH_REP_S * fps * (SYNTH_SLOWDOWN if r >= SYNTH_SLOW_AFTER else 1.0))
+        phase.append(np.sin(np.pi * np.arange(n) / n))
+        phase.append(np.zeros(int(SYNTH_PAUSE_S * fps)))
+    ph = np.concatenate(phase)
+    T = len(ph)
+
+    lms = np.zeros((T, 33, 4), dtype=np.float32)
+    lms[..., :2] = 0.5
+    lms[..., 3] = 0.2
+    pts = {11: (0.60, 0.35), 12: (0.40, 0.35), 23: (0.58, 0.70), 24: (0.42, 0.70)}
+    for i, (x, y) in pts.items():
+        lms[:, i, 0], lms[:, i, 1] = x, y
+
+    ua, fa = 0.15, 0.14   # upper arm / forearm length
+    for sh, el, wr, sgn in ((11, 13, 15, 1.0), (12, 14, 16, -1.0)):
+        sx, sy = pts[sh]
+        if exercise == "bicep_curl":
+            a = np.radians(170.0 - 130.0 * ph)                 # elbow angle
+            ex, ey = np.full(T, sx), np.full(T, sy + ua)
+            wx, wy = ex + sgn * fa * np.sin(a), ey - fa * np.cos(a)
+        elif exercise == "lateral_raise":
+            a = np.radians(10.0 + 80.0 * ph)                   # arm from vertical
+            ex, ey = sx + sgn * ua * np.sin(a), sy + ua * np.cos(a)
+            wx, wy = sx + sgn * (ua + fa) * np.sin(a), sy + (ua + fa) * np.cos(a)
+        else:
+            ex, ey = sx + sgn * 0.10, sy + 0.05 - 0.15 * ph    # rack -> lockout
+            wx, wy = ex, sy - 0.30 * ph
+        lms[:, el, 0], lms[:, el, 1] = ex, ey
+        lms[:, wr, 0], lms[:, wr, 1] = wx, wy
+
+    lms[:, KEY_IDX, :2] += rng.normal(0.0, SYNTH_JITTER, (T, len(KEY_IDX), 2)).astype(np.float32)
+    lms[:, KEY_IDX, 3] = 0.95
+    lms[:, (12, 14, 16), 3] = 0.97   # right side slightly more visible: stable arm choice
+    return {
+        "name": f"synthetic:{exercise}", "exercise": exercise,
+        "lms": lms, "t": np.arange(T) / fps, "w": SYNTH_W, "h": SYNTH_H,
+        "frame": synthetic_frame(rng),
+    }
+
+
+def synthetic_frame(rng: np.random.Generator) -> np.ndarray:
+    """Smooth gradient + blurred noise: compresses roughly like a camera frame."""
+    yy, xx = np.mgrid[0:SYNTH_H, 0:SYNTH_W].astype(np.float32)
+    base = np.stack([xx / SYNTH_W * 200, yy / SYNTH_H * 200, (xx + yy) / (SYNTH_W + SYNTH_H) * 255], axis=-1)
+    noise = cv2.GaussianBlur(rng.normal(0, 40, base.shape).astype(np.float32), (0, 0), 1.5)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def list_videos(exercises: List[str], videos_dir: Path = VIDEOS_DIR) -> List[Tuple[str, Path]]:
+    out = []
+    for ex in exercises:
+        ex_dir = videos_dir / ex
+        if not ex_dir.exists():
+            continue
+        out.extend((ex, p) for p in sorted(ex_dir.iterdir()) if p.suffix.lower() in VIDEO_EXTS)
+    return out
+
+
+def recorded_stream(exercise: str, path: Path, max_frames: int = MAX_FRAMES) -> Dict[str, Any]:
+    """Landmarks of a video through the server's Pose (NaN rows = no pose), cached by mtime / size."""
+    st = path.stat()
+    cache = STREAMS_DIR / exercise / f"{path.stem}.npz"
+    key = f"{st.st_size}:{st.st_mtime_ns}:{max_frames}:{FRAME_WIDTH}"
+    if cache.exists():
+        z = np.load(cache)
+        if str(z["key"]) == key:
+            return {"name": f"recorded:{exercise}/{path.stem}", "exercise": exercise,
+                    "lms": z["lms"], "t": z["t"], "w": int(z["w"]), "h": int(z["h"]), "frame": z["frame"]}
+
+    cap = cv2.VideoCapture(str(path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    pose = new_pose()
+    lms, frame = [], None
+    try:
+        while len(lms) < max_frames:
+            ok, img = cap.read()
+            if not ok:
+                break
+            if FRAME_WIDTH and img.shape[1] > FRAME_WIDTH:
+                img = cv2.resize(img, (FRAME_WIDTH, int(img.shape[0] * FRAME_WIDTH / img.shape[1])),
+                                 interpolation=cv2.INTER_AREA)
+            res = pose.process(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+            if res.pose_landmarks:
+                lms.append([(p.x, p.y, p.z, p.visibility) for p in res.pose_landmarks.landmark])
+            else:
+                lms.append(np.full((33, 4), np.nan))
+            if len(lms) == max(1, max_frames // 2) or frame is None:
+                frame = img
+    finally:
+        cap.release()
+        pose.close()
+    if frame is None:
+        raise ValueError(f"no frames in {path}")
+
+    h, w = frame.shape[:2]
+    arr = np.asarray(lms, dtype=np.float32)
+    t = np.arange(len(arr)) / fps
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(cache, key=key, lms=arr, t=t, w=w, h=h, frame=frame)
+    return {"name": f"recorded:{exercise}/{path.stem}", "exercise": exercise,
+            "lms": arr, "t": t, "w": w, "h": h, "frame": frame}
+
+
+def rep_vectors(exercise: str, feats: List[str], scorer, n: int, seed: int = SYNTH_SEED) -> np.ndarray:
+    """(n, d) rep feature rows: datasets/reps when it has the model's columns, else around the scaler center."""
+    path = REPS_DIR / f"{exercise}_reps.csv"
+    if path.exists():
+        df = pd.read_csv(path)
+        if all(c in df.columns for c in feats) and len(df):
+            X = df[feats].to_numpy(dtype=np.float64)
+            return X[np.arange(n) % len(X)]
+    rng = np.random.default_rng(seed)
+    return scorer.center + scorer.scale * rng.normal(0.0, 1.0, (n, len(feats)))
+
+
+# ----------------------------- CASES -----------------------------
+def counter_args(exercise: str, F: Dict[str, float]) -> Tuple[tuple, Dict[str, Any]]:
+    """rep_counter.update arguments for one frame, chosen the way the pipeline's analyze() does."""
+    conf = F["conf_mean"]
+    if exercise == "bicep_curl":
+        r = F["R_el_vis"] >= F["L_el_vis"]
+        return ((F["R_elbow_angle"] if r else F["L_elbow_angle"],
+                 F["R_elbow_drift"] if r else F["L_elbow_drift"], conf), {})
+    r = F["R_wr_vis"] >= F["L_wr_vis"]
+    kw = {"wrist_rel_y": F["R_wrist_rel_y"] if r else F["L_wrist_rel_y"],
+          "trunk_offset_norm": F["trunk_offset_norm"], "arm_label": "R" if r else "L", "conf_mean": conf}
+    if exercise == "lateral_raise":
+        kw["elbow_angle"] = F["R_elbow_angle"] if r else F["L_elbow_angle"]
+    else:
+        kw["wrist_stack_norm"] = F["R_wrist_stack"] if r else F["L_wrist_stack"]
+    return (), kw
+
+
+def stream_cases(stream: Dict[str, Any], pipeline) -> Dict[str, Callable[[], int]]:
+    """Per-frame cases of one stream: name -> run() doing one pass, returning its number of calls."""
+    ex, w, h = stream["exercise"], stream["w"], stream["h"]
+    lms_all, ts = stream["lms"], stream["t"]
+    found = ~np.isnan(lms_all[:, 0, 0])
+    frames = [(lms_all[i] if found[i] else None, float(ts[i])) for i in range(len(lms_all))]
+    posed = [l for l, _ in frames if l is not None]
+    Fs = [frame_features(l, w, h, min_shoulder_width=MIN_SHOULDER_WIDTH_PX) for l in posed]
+    Fts = [(F, float(ts[i])) for F, i in zip(Fs, np.flatnonzero(found))]
+    updates = [counter_args(ex, F) + (t,) for F, t in Fts if F["conf_mean"] >= MIN_CONF]
+
+    kp = lms_all[found][:, KEY_IDX, :2] * np.array([w, h], dtype=np.float32)
+    arms = [(k[[RSH, LSH]], k[[REL, LEL]], k[[RWR, LWR]]) for k in kp]
+    batch = lms_all[found]
+
+    def run_angles():
+        for a, b, c in arms:
+            joint_angles(a, b, c)
+        return len(arms)
+
+    def run_features():
+        for l in posed:
+            frame_features(l, w, h, min_shoulder_width=MIN_SHOULDER_WIDTH_PX)
+        return len(posed)
+
+    def run_batch():
+        compute_features(batch, w, h, MIN_SHOULDER_WIDTH_PX)
+        return 1
+
+    def run_update():
+        counter = pipeline.new_session("bench", 0, 0).rep_counter
+        for args, kw, t in updates:
+            counter.update(*args, t=t, **kw)
+        return len(updates)
+
+    def run_track():
+        sess = pipeline.new_session("bench", 0, 0)
+        for l, t in frames:
+            pipeline.track(l, w, h, sess, ts=t)
+        return len(frames)
+
+    cases = {"track": run_track}
+    if posed:
+        cases.update({"joint_angles": run_angles, "frame_features": run_features,
+                      f"compute_features[{len(batch)}]": run_batch})
+    if updates:
+        cases["rep_update"] = run_update
+    return cases
+
+
+def model_cases(exercise: str, pipeline) -> Dict[str, Callable[[], int]]:
+    """Per-rep cases: OC-SVM scoring (fast path vs sklearn) and the fatigue index."""
+    scorer = pipeline.scorer
+    bundle = joblib.load(pipeline.model_pkl)
+    scaler, model = bundle["scaler"], bundle["model"]
+    X = rep_vectors(exercise, pipeline.feats, scorer, OCSVM_BATCH)
+    rows = [x for x in X]
+    rows_2d = [x[None, :] for x in X]
+
+    baseline = dict(pipeline.calib_fallbacks)
+    base = [baseline[k] for k in pipeline.baseline_keys]
+    meds = [[v * f for v in base] for f in np.linspace(0.6, 1.6, 32)]
+
+    def run_score():
+        for x in rows:
+            scorer.score(x)
+        return len(rows)
+
+    def run_sklearn():
+        for x in rows_2d:
+            model.decision_function(scaler.transform(x))
+        return len(rows_2d)
+
+    def run_score_batch():
+        scorer.score_batch(X)
+        return 1
+
+    def run_fatigue():
+        for m in meds:
+            pipeline.compute_fatigue_index(baseline, *m)
+        return len(meds)
+
+    return {"ocsvm_score": run_score, "ocsvm_sklearn": run_sklearn,
+            f"ocsvm_score_batch[{OCSVM_BATCH}]": run_score_batch, "fatigue_index": run_fatigue}
+
+
+def codec_cases(frame: np.ndarray) -> Dict[str, Callable[[], int]]:
+    from realtime_server import JPEG_QUALITY, decode_dataurl_to_bgr, bgr_to_dataurl_jpeg
+    url = bgr_to_dataurl_jpeg(frame, JPEG_QUALITY)
+
+    def run_decode():
+        decode_dataurl_to_bgr(url)
+        return 1
+
+    def run_encode():
+        bgr_to_dataurl_jpeg(frame, JPEG_QUALITY)
+        return 1
+
+    return {"decode_dataurl_to_bgr": run_decode, "bgr_to_dataurl_jpeg": run_encode}
+
+
+# ----------------------------- TIMING -----------------------------
+def measure(run: Callable[[], int], repeats: int = REPEATS, min_round_s: float = MIN_ROUND_S) -> Dict[str, float]:
+    """Per-call microseconds: median, best and spread (median - best) of `repeats` rounds (after one warm-up pass)."""
+    calls = run()
+    per_call = []
+    for _ in range(repeats):
+        n = 0
+        t0 = time.perf_counter()
+        while True:
+            n += run()
+            dt = time.perf_counter() - t0
+            if dt >= min_round_s:
+                break
+        per_call.append(dt / max(1, n) * 1e6)
+    med, best = statistics.median(per_call), min(per_call)
+    return {"us": med, "us_min": best, "us_spread": med - best, "calls": calls, "rounds": repeats}
+
+
+def run_bench(exercises: List[str], recorded: bool, videos_dir: Path, max_frames: int,
+              only: Optional[List[str]], repeats: int) -> Dict[str, Dict[str, float]]:
+    from realtime_server import PIPELINES
+
+    def want(key: str) -> bool:
+        return not only or any(s in key for s in only)
+
+    groups: List[Tuple[str, Dict[str, Callable[[], int]]]] = []
+    streams = [synthetic_stream(ex) for ex in exercises]
+    if recorded:
+        for ex, path in list_videos(exercises, videos_dir):
+            try:
+                streams.append(recorded_stream(ex, path, max_frames))
+            except Exception as e:
+                print(f"!! skipping {path}: {e}")
+
+    for ex in exercises:
+        groups.append((f"model:{ex}", model_cases(ex, PIPELINES[ex])))
+    groups.append((f"synthetic:frame{SYNTH_W}x{SYNTH_H}", codec_cases(streams[0]["frame"])))
+    for s in streams:
+        groups.append((s["name"], stream_cases(s, PIPELINES[s["exercise"]])))
+        if s["name"].startswith("recorded:"):
+            groups.append((s["name"], codec_cases(s["frame"])))
+
+    results = {}
+    for prefix, cases in groups:
+        for name, fn in cases.items():
+            key = f"{prefix}/{name}"
+            if not want(key):
+                continue
+            results[key] = measure(fn, repeats)
+            print(f"{key:<62} {results[key]['us']:>11.2f} us")
+    return results
+
+
+# ----------------------------- REPORT -----------------------------
+def environment() -> Dict[str, Any]:
+    import sklearn
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold_pct: float) -> List[str]:
+    """Print the comparison table (best-of times); return the keys that regressed."""
+    base = baseline.get("results", {})
+    regressed = []
+    print(f"\n{'case':<62} {'base us':>10} {'now us':>10} {'noise us':>9} {'change':>8}")
+    for key in sorted(results):
+        now = results[key]["us_min"]
+        if key not in base:
+            print(f"{key:<62} {'-':>10} {now:>10.2f} {'-':>9} {'new':>8}")
+            continue
+        was = base[key]["us_min"]
+        spread = max(results[key]["us_spread"], base[key].get("us_spread", base[key]["us"] - was))
+        noise = max(NOISE_FLOOR_US, NOISE_SPREAD_K * spread)
+        pct = (now / was - 1.0) * 100.0 if was > 0 else 0.0
+        slow = pct > threshold_pct and now - was > noise
+        if slow:
+            regressed.append(key)
+        print(f"{key:<62} {was:>10.2f} {now:>10.2f} {noise:>9.2f} {pct:>+7.1f}%{'  REGRESSION' if slow else ''}")
+    missing = sorted(set(base) - set(results))
+    if missing:
+        print(f"(not run this time: {len(missing)} baseline cases)")
+    return regressed
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Micro-benchmarks for the realtime frame / rep hot paths")
+    ap.add_argument("--exercise", choices=EXERCISES, action="append", help="repeatable; default all")
+    ap.add_argument("--videos", type=Path, default=VIDEOS_DIR, help="videos/<exercise>/ tree for recorded streams")
+    ap.add_argument("--no-recorded", action="store_true", help="synthetic streams only")
+    ap.add_argument("--max-frames", type=int, default=MAX_FRAMES)
+    ap.add_argument("--only", action="append", help="run cases whose key contains this (repeatable)")
+    ap.add_argument("--repeats", type=int, default=REPEATS)
+    ap.add_argument("--save-baseline", action="store_true", help=f"also write {BASELINE_JSON.name}")
+    ap.add_argument("--compare", nargs="?", type=Path, const=BASELINE_JSON, default=None,
+                    help="results JSON to compare against (default: the saved baseline)")
+    ap.add_argument("--threshold-pct", type=float, default=REGRESSION_PCT)
+    ap.add_argument("--out", type=Path, default=None, help="results JSON (default outputs/bench/<time>.json)")
+    args = ap.parse_args(argv)
+    if args.compare is not None and args.repeats < MIN_COMPARE_REPEATS:
+        ap.error(f"--compare needs --repeats >= {MIN_COMPARE_REPEATS}")
+
+    exercises = args.exercise or EXERCISES
+    results = run_bench(exercises, not args.no_recorded, args.videos, args.max_frames, args.only, args.repeats)
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "env": environment(),
+              "repeats": args.repeats, "results": results}
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    out = args.out or OUT_DIR / f"bench_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print("\nSaved", out)
+    if args.save_baseline:
+        BASELINE_JSON.write_text(json.dumps(report, indent=2))
+        print("Saved baseline", BASELINE_JSON)
+
+    if args.compare is None:
+        return 0
+    if not args.compare.exists():
+        print(f"!! no baseline at {args.compare} (run with --save-baseline first)")
+        return 1
+    baseline = json.loads(args.compare.read_text())
+    if baseline.get("repeats", 0) < MIN_COMPARE_REPEATS:
+        print(f"!! baseline {args.compare} has {baseline.get('repeats')} rounds per case;"
+              f" re-save it with --repeats >= {MIN_COMPARE_REPEATS}")
+        return 1
+    if baseline.get("env") != report["env"]:
+        print("!! baseline was recorded in a different environment:", baseline.get("env"))
+    regressed = compare(results, baseline, args.threshold_pct)
+    if regressed:
+        print(f"\nFAIL: {len(regressed)} case(s) more than {args.threshold_pct:g}% slower than baseline")
+        return 1
+    print(f"\nOK: no case more than {args.threshold_pct:g}% slower than baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
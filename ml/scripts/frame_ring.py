@@ -0,0 +1,142 @@
+# liftright/ml/scripts/frame_ring.py
+# Shared-memory ring of preallocated frame slots for the realtime server's /frame path.
+#
+# One SharedMemory segment holds `n` slots; each slot has
+#   - a JPEG region (MAX_JPEG_BYTES): the upload as received, read in place by the decoder
+#   - an RGB plane (MAX_FRAME_W x MAX_FRAME_H x 3 uint8): the decoded frame converted
+#     straight into it (cv2.cvtColor dst=), which pose.process reads in place
+# A frame claims a slot for as long as it is being decoded + posed and gives it back
+# afterwards, so frames in flight never share memory and nothing frame-sized is
+# allocated or pickled per frame (besides cv2.imdecode's own BGR output, which
+# OpenCV's Python API cannot decode into a caller buffer).
+#
+# The server creates the ring in POSE_EXECUTION=process mode only; pose worker processes
+# attach to it by name (pose_workers.py). Each slot is SLOT_BYTES (~10.4 MB) of /dev/shm,
+# reserved when the ring is created: a segment that does not fit (e.g. Docker's default
+# 64 MB /dev/shm and a large POSE_POOL_SIZE) fails there with a clear error instead of
+# SIGBUS on a later frame's first touch.
+
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, Optional
+
+import cv2
+import numpy as np
+
+# ---------------- CONFIG ----------------
+MAX_JPEG_BYTES = 4 << 20
+MAX_FRAME_W = 1920
+MAX_FRAME_H = 1080
+
+RGB_BYTES = MAX_FRAME_W * MAX_FRAME_H * 3
+SLOT_BYTES = MAX_JPEG_BYTES + RGB_BYTES
+
+
+class FrameRing:
+    """
+    n preallocated slots in one shared-memory segment (see module header).
+    FrameRing(n) creates the segment; FrameRing(n, name=...) attaches to an existing one.
+    Larger-than-slot frames are the caller's fallback (fits_jpeg / rgb_plane -> None).
+    """
+    def __init__(self, n: int, name: Optional[str] = None):
+        self.n = int(n)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.n * SLOT_BYTES)
+            self._reserve()
+            atexit.register(self.close)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = np.ndarray((self.n, SLOT_BYTES), dtype=np.uint8, buffer=self.shm.buf)
+        self._free = list(range(self.n))
+        self._next = 0
+        self._guard = threading.Lock()
+
+    def _reserve(self) -> None:
+        """Back the whole segment now (tmpfs allocates pages lazily), or raise."""
+        size = self.n * SLOT_BYTES
+        fd = getattr(self.shm, "_fd", -1)
+        if fd < 0 or not hasattr(os, "posix_fallocate"):
+            return
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError as e:
+            self.shm.close()
+            self.shm.unlink()
+            raise RuntimeError(
+                f"cannot reserve {size / 2**20:.0f} MB of shared memory for {self.n} frame slots "
+                f"({SLOT_BYTES / 2**20:.1f} MB each): {e}. Enlarge /dev/shm (docker --shm-size) "
+                f"or lower POSE_POOL_SIZE."
+            ) from e
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # ---- slot lease (server side) ----
+    def take(self) -> Optional[int]:
+        """Next free slot in ring order, or None if every slot is in flight."""
+        with self._guard:
+            if not self._free:
+                return None
+            for k in range(self.n):
+                i = (self._next + k) % self.n
+                if i in self._free:
+                    self._free.remove(i)
+                    self._next = (i + 1) % self.n
+                    return i
+        return None
+
+    def give(self, i: Optional[int]) -> None:
+        if i is None:
+            return
+        with self._guard:
+            if i not in self._free:
+                self._free.append(i)
+
+    @contextmanager
+    def claim(self) -> Iterator[Optional[int]]:
+        i = self.take()
+        try:
+            yield i
+        finally:
+            self.give(i)
+
+    # ---- slot memory ----
+    def fits_jpeg(self, n_bytes: int) -> bool:
+        return n_bytes <= MAX_JPEG_BYTES
+
+    def write_jpeg(self, i: int, raw: bytes) -> int:
+        n = len(raw)
+        self.buf[i, :n] = np.frombuffer(raw, dtype=np.uint8)
+        return n
+
+    def jpeg(self, i: int, n: int) -> np.ndarray:
+        """The first n bytes of slot i's JPEG region (a view)."""
+        return self.buf[i, :n]
+
+    def rgb_plane(self, i: Optional[int], h: int, w: int) -> Optional[np.ndarray]:
+        """(h, w, 3) view on slot i's RGB plane; None if there is no slot or the frame is too big."""
+        if i is None or h * w * 3 > RGB_BYTES:
+            return None
+        return self.buf[i, MAX_JPEG_BYTES:MAX_JPEG_BYTES + h * w * 3].reshape(h, w, 3)
+
+    def to_rgb(self, i: Optional[int], frame_bgr: np.ndarray) -> np.ndarray:
+        """BGR -> RGB into slot i's plane (a fresh array if it doesn't fit)."""
+        h, w = frame_bgr.shape[:2]
+        dst = self.rgb_plane(i, h, w)
+        if dst is None:
+            return cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=dst)
+        return dst
+
+    def close(self) -> None:
+        if self.buf is None:
+            return
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,140 @@
+# liftright/ml/scripts/frames_dataset.py
+# Per-frame features dataset written by 01_extract_frames.py and read by 02_build_reps_*.py.
+#
+# Layout (hive partitioned Parquet, one file per video):
+#   datasets/frames/parquet/exercise=<exercise>/video_id=<video_id>/part-0.parquet
+#   datasets/frames/parquet/exercise=<exercise>/video_id=<video_id>/_manifest.json  (extract cache)
+# Feature columns are float32; exercise / video_id come from the directory names.
+# A rep builder reads one exercise directory and only the columns it needs.
+#
+# Run directly to convert the legacy all_exercises_frames.csv into this layout:
+#   python frames_dataset.py
+
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from pose_features import FRAME_COLUMNS
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]   # .../ml
+FRAMES_DIR   = PROJECT_ROOT / "datasets" / "frames"
+PARQUET_DIR  = FRAMES_DIR / "parquet"
+LEGACY_CSV   = FRAMES_DIR / "all_exercises_frames.csv"
+
+PART_FILE = "part-0.parquet"
+MANIFEST_FILE = "_manifest.json"   # "_" prefix: skipped by Parquet dataset discovery
+
+PARTITION_COLUMNS = ["exercise", "video_id"]
+# ids are names ("001" stays "001"), never numbers
+ID_DTYPES = {"video_id": str, "participant_id": str}
+
+# stored columns and dtypes (partition columns excluded)
+COLUMN_DTYPES = {
+    "participant_id": "string",
+    "frame_idx": np.int32,
+    "time_sec": np.float64,     # keep full precision: rep durations are differences of this
+    "fps": np.float32,
+    **{c: np.float32 for c in FRAME_COLUMNS},
+}
+
+
+def partition_dir(exercise: str, video_id: str) -> Path:
+    return PARQUET_DIR / f"exercise={quote(exercise, safe='')}" / f"video_id={quote(str(video_id), safe='')}"
+
+
+def write_video_partition(df: pd.DataFrame, exercise: str, video_id: str) -> Path:
+    """Write one video's frames (atomic replace). Partition columns in df are dropped."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    out_dir = partition_dir(exercise, video_id)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    cols = {c: df[c].astype(t) if c in df else pd.Series([], dtype=t) for c, t in COLUMN_DTYPES.items()}
+    table = pa.Table.from_pandas(pd.DataFrame(cols), preserve_index=False)
+
+    out = out_dir / PART_FILE
+    tmp = out_dir / f"_{PART_FILE}.tmp"
+    pq.write_table(table, tmp)
+    tmp.replace(out)
+    return out
+
+
+def prune_partitions(exercise: str, keep: Iterable[str]) -> List[str]:
+    """Delete the exercise's video partitions (frames + extract manifest) not in keep; returns their video_ids."""
+    ex_dir = PARQUET_DIR / f"exercise={quote(exercise, safe='')}"
+    if not ex_dir.exists():
+        return []
+    keep = {str(v) for v in keep}
+    removed = []
+    for d in sorted(ex_dir.glob("video_id=*")):
+        video_id = unquote(d.name[len("video_id="):])
+        if d.is_dir() and video_id not in keep:
+            shutil.rmtree(d)
+            removed.append(video_id)
+    return removed
+
+
+def _video_partitioning():
+    """video_id=<id> directories, read back as strings (no "001" -> 1 type inference)."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([("video_id", pa.string())]), flavor="hive")
+
+
+def has_exercise(exercise: str) -> bool:
+    ex_dir = PARQUET_DIR / f"exercise={quote(exercise, safe='')}"
+    return ex_dir.exists() and any(ex_dir.glob(f"*/{PART_FILE}"))
+
+
+def load_frames(exercise: str, columns: Optional[Sequence[str]] = None,
+                video_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Frames of one exercise, sorted by (video_id, frame_idx), with exercise/video_id columns.
+    columns: stored columns to read (None = all). Falls back to the legacy CSV when
+    the Parquet dataset has not been built yet.
+    """
+    want = None
+    if columns is not None:
+        want = [c for c in dict.fromkeys(list(columns) + ["frame_idx"]) if c not in PARTITION_COLUMNS]
+
+    if has_exercise(exercise):
+        import pyarrow.dataset as ds
+
+        ex_dir = PARQUET_DIR / f"exercise={quote(exercise, safe='')}"
+        dataset = ds.dataset(str(ex_dir), format="parquet", partitioning=_video_partitioning())
+        flt = None
+        if video_ids is not None:
+            flt = ds.field("video_id").isin([str(v) for v in video_ids])
+        table = dataset.to_table(columns=None if want is None else want + ["video_id"], filter=flt)
+        df = table.to_pandas()
+        df.insert(0, "video_id", df.pop("video_id").astype(str))
+        df.insert(0, "exercise", exercise)
+    else:
+        usecols = None if want is None else PARTITION_COLUMNS + want
+        df = pd.read_csv(LEGACY_CSV, usecols=usecols, dtype=ID_DTYPES)
+        df = df[df["exercise"] == exercise]
+        if video_ids is not None:
+            df = df[df["video_id"].astype(str).isin([str(v) for v in video_ids])]
+
+    return df.sort_values(["video_id", "frame_idx"]).reset_index(drop=True)
+
+
+def convert_csv(csv_path: Path = LEGACY_CSV) -> int:
+    """Legacy all_exercises_frames.csv -> partitioned Parquet. Returns number of videos written."""
+    df = pd.read_csv(csv_path, dtype=ID_DTYPES)
+    n = 0
+    for (ex, vid), part in df.groupby(PARTITION_COLUMNS, sort=True):
+        write_video_partition(part.sort_values("frame_idx"), ex, vid)
+        n += 1
+    return n
+
+
+if __name__ == "__main__":
+    n = convert_csv()
+    print("Wrote", n, "video partitions under", PARQUET_DIR)
@@ -0,0 +1,350 @@
+# liftright/ml/scripts/loadtest_realtime.py
+# Load test for realtime_server.py: replays the videos/<exercise>/ tree that
+# 01_extract_frames.py reads as N concurrent sessions against a running server
+# (/start -> /frame ... -> /finish) and reports
+#   - throughput (processed frames/s, all sessions) and per-session achieved FPS
+#   - /frame latency p50 / p95 / p99 (processed frames; dropped replies separately)
+#   - frames sent / processed / dropped (server latest-wins) / skipped (client had
+#     MAX_INFLIGHT requests outstanding) / errors
+#   - rep-count agreement: /finish reps_total vs the video's rows in
+#     datasets/reps/<exercise>_reps.csv (02_build_reps_*.py), for exercises whose
+#     offline and live rep calibration are the same (rep_engine RepConfig.offline_matches_live;
+#     shoulder press / lateral raise differ by design and are listed but not compared)
+#
+# Each session sends its video's frames at --fps without waiting for replies (up to
+# MAX_INFLIGHT outstanding, like a browser tab), with capture_ts_ms = the frame's video
+# time so rep timing matches the offline builders. Each session reads and JPEG-encodes
+# its video frame by frame as it sends, so client memory stays at a few frames per
+# session whatever the clip length.
+#
+#   python realtime_server.py &
+#   python loadtest_realtime.py --sessions 4 --fps 15 --exercise bicep_curl
+#   python loadtest_realtime.py --sessions 4 --max-p95-ms 250 --min-fps 40   # exit 1 if missed
+#   python loadtest_realtime.py --exercise bicep_curl --min-rep-exact 0.9     # rep agreement gate
+#
+# The report is printed and saved as JSON under outputs/loadtest/.
+
+import argparse
+import base64
+import http.client
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from rep_engine import REP_CONFIGS
+
+# ---------------- CONFIG ----------------
+PROJECT_ROOT = Path(__file__).resolve().parents[1]   # .../ml
+VIDEOS_DIR   = PROJECT_ROOT / "videos"
+REPS_DIR     = PROJECT_ROOT / "datasets" / "reps"
+OUT_DIR      = PROJECT_ROOT / "outputs" / "loadtest"
+
+SERVER_URL = "http://127.0.0.1:5101"
+EXERCISES = ["bicep_curl", "lateral_raise", "shoulder_press"]
+VIDEO_EXTS = [".mp4", ".mov", ".mkv", ".avi"]
+
+SESSIONS = 4
+TARGET_FPS = 15.0
+MAX_FRAMES = 0            # per video; 0 = whole video
+FRAME_WIDTH = 640         # client-side resize before JPEG (0 = as recorded)
+JPEG_QUALITY = 80
+MAX_INFLIGHT = 2          # outstanding /frame requests per session
+RESPONSE_MODE = "landmarks"
+HTTP_TIMEOUT_S = 30.0
+
+
+# ----------------------------- INPUT -----------------------------
+def list_videos(exercises: List[str], videos_dir: Path = VIDEOS_DIR) -> List[Tuple[str, Path]]:
+    out = []
+    for ex in exercises:
+        ex_dir = videos_dir / ex
+        if not ex_dir.exists():
+            continue
+        out.extend((ex, p) for p in sorted(ex_dir.iterdir()) if p.suffix.lower() in VIDEO_EXTS)
+    return out
+
+
+def encode_video(path: Path, max_frames: int, width: int, quality: int) -> Iterator[Tuple[str, float]]:
+    """Video -> (JPEG data URL, capture time ms) per frame, read and encoded as consumed."""
+    cap = cv2.VideoCapture(str(path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    n = 0
+    try:
+        while not max_frames or n < max_frames:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if width and frame.shape[1] > width:
+                frame = cv2.resize(frame, (width, int(round(frame.shape[0] * width / frame.shape[1]))),
+                                   interpolation=cv2.INTER_AREA)
+            ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+            if not ok:
+                continue
+            yield "data:image/jpeg;base64," + base64.b64encode(buf.tobytes()).decode("ascii"), n * 1000.0 / fps
+            n += 1
+    finally:
+        cap.release()
+
+
+def offline_rep_counts(exercise: str) -> Dict[str, int]:
+    """video_id -> reps in the 02_build_reps_<exercise> output (empty if not built)."""
+    path = REPS_DIR / f"{exercise}_reps.csv"
+    if not path.exists():
+        return {}
+    df = pd.read_csv(path, usecols=["video_id"])
+    return {str(k): int(v) for k, v in df["video_id"].value_counts().items()}
+
+
+# ----------------------------- CLIENT -----------------------------
+class Api:
+    """Minimal JSON-over-HTTP client; one keep-alive connection per calling thread."""
+    def __init__(self, base_url: str, timeout: float = HTTP_TIMEOUT_S):
+        u = urlparse(base_url)
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return c
+
+    def post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        body = json.dumps(payload)
+        for attempt in range(2):
+            c = self._conn()
+            try:
+                c.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                r = c.getresponse()
+                return json.loads(r.read() or b"{}")
+            except (http.client.HTTPException, ConnectionError, OSError):
+                c.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        return {}
+
+
+class SessionRun:
+    """One simulated trainee: a video replayed at target_fps against the server."""
+    def __init__(self, api: Api, exercise: str, video: Path, target_fps: float, inflight: int,
+                 log_id: int, response_mode: str = RESPONSE_MODE,
+                 max_frames: int = MAX_FRAMES, width: int = FRAME_WIDTH, quality: int = JPEG_QUALITY):
+        self.api = api
+        self.exercise = exercise
+        self.video = video
+        self.max_frames = max_frames
+        self.width = width
+        self.quality = quality
+        self.target_fps = float(target_fps)
+        self.inflight = max(1, int(inflight))
+        self.log_id = log_id
+        self.response_mode = response_mode
+
+        self.token: Optional[str] = None
+        self.error: Optional[str] = None
+        self.latencies: List[float] = []        # processed frames, seconds
+        self.drop_latencies: List[float] = []
+        self.frames = self.sent = self.processed = self.dropped = self.skipped = self.errors = 0
+        self.t_first = self.t_last = None
+        self.summary: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> bool:
+        r = self.api.post("/start", {"exercise_type": self.exercise, "log_id": self.log_id,
+                                     "user_id": self.log_id, "response_mode": self.response_mode})
+        self.token = r.get("session_token")
+        if not self.token:
+            self.error = r.get("error") or "no session_token"
+        return bool(self.token)
+
+    def _send(self, url: str, ts_ms: float) -> None:
+        t0 = time.perf_counter()
+        try:
+            r = self.api.post("/frame", {"session_token": self.token, "frame_dataurl": url,
+                                         "capture_ts_ms": ts_ms})
+        except Exception:
+            r = {"ok": False}
+        dt = time.perf_counter() - t0
+        with self._lock:
+            if r.get("dropped"):
+                self.dropped += 1
+                self.drop_latencies.append(dt)
+            elif r.get("ok") is False or "status" not in r:
+                self.errors += 1
+            else:
+                self.processed += 1
+                self.latencies.append(dt)
+                now = time.perf_counter()
+                self.t_first = now if self.t_first is None else self.t_first
+                self.t_last = now
+
+    def run(self) -> None:
+        busy = threading.Semaphore(self.inflight)
+        period = 1.0 / self.target_fps if self.target_fps > 0 else 0.0
+        with ThreadPoolExecutor(max_workers=self.inflight) as pool:
+            t0 = time.perf_counter()
+            for i, (url, ts_ms) in enumerate(encode_video(self.video, self.max_frames, self.width, self.quality)):
+                self.frames += 1
+                wait = t0 + i * period - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                if not busy.acquire(blocking=False):
+                    self.skipped += 1
+                    continue
+                self.sent += 1
+                fut = pool.submit(self._send, url, ts_ms)
+                fut.add_done_callback(lambda _f: busy.release())
+        self.summary = self.api.post("/finish", {"session_token": self.token})
+
+    def achieved_fps(self) -> float:
+        if self.t_first is None or self.t_last is None or self.t_last <= self.t_first:
+            return 0.0
+        return (self.processed - 1) / (self.t_last - self.t_first)
+
+
+# ----------------------------- REPORT -----------------------------
+def pct_ms(x: List[float]) -> Dict[str, float]:
+    if not x:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    a = np.asarray(x) * 1000.0
+    return {"p50": float(np.percentile(a, 50)), "p95": float(np.percentile(a, 95)),
+            "p99": float(np.percentile(a, 99)), "max": float(a.max())}
+
+
+def build_report(runs: List[SessionRun], wall_s: float, args) -> Dict[str, Any]:
+    offline = {ex: offline_rep_counts(ex) for ex in {r.exercise for r in runs}}
+    sessions = []
+    for r in runs:
+        live = r.summary.get("reps_total") if r.summary else None
+        ref = offline[r.exercise].get(r.video.stem)
+        sessions.append({
+            "exercise": r.exercise, "video": r.video.name, "error": r.error,
+            "frames": r.frames, "sent": r.sent, "processed": r.processed, "dropped": r.dropped,
+            "skipped": r.skipped, "errors": r.errors, "fps": round(r.achieved_fps(), 2),
+            "latency_ms": pct_ms(r.latencies), "reps_live": live, "reps_offline": ref,
+            "reps_comparable": REP_CONFIGS[r.exercise].offline_matches_live,
+        })
+
+    ok = [s for s in sessions if not s["error"]]
+    all_lat = [v for r in runs for v in r.latencies]
+    processed = sum(s["processed"] for s in ok)
+    compared = [s for s in ok if s["reps_comparable"]
+                and s["reps_live"] is not None and s["reps_offline"] is not None]
+    return {
+        "server": args.url, "sessions_requested": args.sessions, "sessions_started": len(ok),
+        "target_fps": args.fps, "inflight": args.inflight, "response_mode": args.mode,
+        "wall_s": round(wall_s, 3),
+        "throughput_fps": round(processed / wall_s, 2) if wall_s > 0 else 0.0,
+        "frames": {k: sum(s[k] for s in ok) for k in ("frames", "sent", "processed", "dropped", "skipped", "errors")},
+        "latency_ms": pct_ms(all_lat),
+        "dropped_latency_ms": pct_ms([v for r in runs for v in r.drop_latencies]),
+        "reps": {
+            "sessions_compared": len(compared),
+            "not_comparable": sorted({s["exercise"] for s in ok if not s["reps_comparable"]}),
+            "exact": sum(1 for s in compared if s["reps_live"] == s["reps_offline"]),
+            "mean_abs_diff": (float(np.mean([abs(s["reps_live"] - s["reps_offline"]) for s in compared]))
+                              if compared else None),
+        },
+        "per_session": sessions,
+    }
+
+
+def print_report(rep: Dict[str, Any]) -> None:
+    f, lat = rep["frames"], rep["latency_ms"]
+    print(f"\nSessions: {rep['sessions_started']}/{rep['sessions_requested']}  target {rep['target_fps']} fps"
+          f"  wall {rep['wall_s']:.1f}s")
+    print(f"Throughput: {rep['throughput_fps']:.1f} processed frames/s")
+    print(f"Frames: sent {f['sent']} processed {f['processed']} dropped {f['dropped']}"
+          f" skipped {f['skipped']} errors {f['errors']}")
+    print(f"/frame latency ms: p50 {lat['p50']:.1f}  p95 {lat['p95']:.1f}  p99 {lat['p99']:.1f}  max {lat['max']:.1f}")
+    r = rep["reps"]
+    if r["sessions_compared"]:
+        print(f"Reps vs offline: {r['exact']}/{r['sessions_compared']} exact, mean |diff| {r['mean_abs_diff']:.2f}")
+    if r["not_comparable"]:
+        print(f"Reps not compared (offline calibration differs from live): {', '.join(r['not_comparable'])}")
+    print("\n  exercise        video                      fps  proc  drop  skip   p95ms  reps live/offline")
+    for s in rep["per_session"]:
+        if s["error"]:
+            print(f"  {s['exercise']:<15} {s['video']:<24} !! {s['error']}")
+            continue
+        print(f"  {s['exercise']:<15} {s['video'][:24]:<24} {s['fps']:5.1f} {s['processed']:5d} {s['dropped']:5d}"
+              f" {s['skipped']:5d} {s['latency_ms']['p95']:7.1f}  {s['reps_live']}/{s['reps_offline']}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Replay videos as concurrent sessions against realtime_server.py")
+    ap.add_argument("--url", default=SERVER_URL)
+    ap.add_argument("--sessions", type=int, default=SESSIONS)
+    ap.add_argument("--fps", type=float, default=TARGET_FPS, help="frames/s sent per session")
+    ap.add_argument("--exercise", choices=EXERCISES, action="append", help="repeatable; default all")
+    ap.add_argument("--videos", type=Path, default=VIDEOS_DIR, help="videos/<exercise>/ tree")
+    ap.add_argument("--mode", choices=["landmarks", "annotated"], default=RESPONSE_MODE)
+    ap.add_argument("--max-frames", type=int, default=MAX_FRAMES)
+    ap.add_argument("--width", type=int, default=FRAME_WIDTH)
+    ap.add_argument("--inflight", type=int, default=MAX_INFLIGHT)
+    ap.add_argument("--max-p95-ms", type=float, default=None, help="fail if /frame p95 latency is above this")
+    ap.add_argument("--min-fps", type=float, default=None, help="fail if total throughput is below this")
+    ap.add_argument("--min-rep-exact", type=float, default=None,
+                    help="fail if fewer than this fraction of compared sessions match the offline rep count")
+    ap.add_argument("--out", type=Path, default=None, help="report JSON (default outputs/loadtest/<time>.json)")
+    args = ap.parse_args(argv)
+
+    videos = list_videos(args.exercise or EXERCISES, args.videos)
+    if not videos:
+        print("No videos under", args.videos)
+        return 2
+
+    picks = [videos[i % len(videos)] for i in range(args.sessions)]
+    api = Api(args.url)
+    runs = [SessionRun(api, ex, vp, args.fps, args.inflight, log_id=i + 1, response_mode=args.mode,
+                       max_frames=args.max_frames, width=args.width)
+            for i, (ex, vp) in enumerate(picks)]
+    started = [r for r in runs if r.start()]
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=r.run, name=f"session-{r.log_id}") for r in started]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    rep = build_report(runs, wall, args)
+    print_report(rep)
+
+    out = args.out or OUT_DIR / time.strftime("loadtest_%Y%m%d_%H%M%S.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(rep, indent=2), encoding="utf-8")
+    print("\nSaved:", out)
+
+    failed = []
+    if args.max_p95_ms is not None and rep["latency_ms"]["p95"] > args.max_p95_ms:
+        failed.append(f"p95 {rep['latency_ms']['p95']:.1f} ms > {args.max_p95_ms} ms")
+    if args.min_fps is not None and rep["throughput_fps"] < args.min_fps:
+        failed.append(f"throughput {rep['throughput_fps']:.1f} fps < {args.min_fps} fps")
+    reps = rep["reps"]
+    if args.min_rep_exact is not None and reps["sessions_compared"]:
+        exact = reps["exact"] / reps["sessions_compared"]
+        if exact < args.min_rep_exact:
+            failed.append(f"rep counts exact in {exact:.0%} of compared sessions < {args.min_rep_exact:.0%}")
+    if len(started) < len(runs):
+        failed.append(f"only {len(started)}/{len(runs)} sessions started")
+    for msg in failed:
+        print("FAIL:", msg)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# liftright/ml/scripts/ocsvm_score.py
+# OC-SVM rep scoring with plain NumPy, from the arrays inside a 03_train_*_ocsvm bundle.
+#
+# The realtime pipelines and 04_live_*.py score one 1x4 rep vector at a time; through
+# scaler.transform + model.decision_function most of that time is sklearn input
+# validation. The scorer keeps only what the math needs:
+#   RobustScaler: center, scale           xs = (x - center) / scale   (float32, like sklearn)
+#   OneClassSVM (rbf): support vectors, dual coefs, gamma, intercept
+#       score = sum_i dual_i * exp(-gamma * |sv_i - xs|^2) + intercept
+# and evaluates it for one rep or a whole (n, d) batch (reps from many sessions) in
+# one call. Matches sklearn's decision_function to ~1e-7.
+#
+# Training scripts store the same arrays under bundle["scoring"] (export_scoring); older
+# bundles without it are exported on load from their sklearn objects.
+
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+
+def export_scoring(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    """Scaler / OC-SVM parameters of a bundle as plain arrays (picklable without sklearn)."""
+    scaler = bundle["scaler"]
+    model = bundle["model"]
+    if getattr(model, "kernel", "rbf") != "rbf":
+        raise ValueError(f"only rbf OC-SVMs can be exported, got kernel={model.kernel!r}")
+
+    n = len(bundle["features"])
+    center = getattr(scaler, "center_", None)
+    scale = getattr(scaler, "scale_", None)
+    if center is None or scale is None:
+        raise ValueError(f"scaler {type(scaler).__name__} has no center_/scale_ (fitted RobustScaler expected)")
+    center = np.asarray(center, dtype=np.float64)
+    scale = np.asarray(scale, dtype=np.float64)
+    if center.shape != (n,) or scale.shape != (n,):
+        raise ValueError(f"scaler has {center.size} center / {scale.size} scale values for {n} features")
+    return {
+        "features": list(bundle["features"]),
+        "center": center,
+        "scale": scale,
+        "support_vectors": np.asarray(model.support_vectors_, dtype=np.float64),
+        "dual_coef": np.asarray(model.dual_coef_, dtype=np.float64).ravel(),
+        "gamma": float(model._gamma),
+        "intercept": float(np.ravel(model.intercept_)[0]),
+    }
+
+
+class OCSVMScorer:
+    """decision_function of a bundle's scaler + OC-SVM; see the module header."""
+    __slots__ = ("features", "center", "scale", "sv", "sv_sq", "dual_coef", "gamma", "intercept")
+
+    def __init__(self, scoring: Dict[str, Any]):
+        self.features = list(scoring["features"])
+        self.center = np.asarray(scoring["center"], dtype=np.float64)
+        self.scale = np.asarray(scoring["scale"], dtype=np.float64)
+        self.sv = np.ascontiguousarray(scoring["support_vectors"], dtype=np.float64)
+        self.sv_sq = np.einsum("ij,ij->i", self.sv, self.sv)
+        self.dual_coef = np.asarray(scoring["dual_coef"], dtype=np.float64).ravel()
+        self.gamma = float(scoring["gamma"])
+        self.intercept = float(scoring["intercept"])
+
+    @classmethod
+    def from_bundle(cls, bundle: Dict[str, Any]) -> "OCSVMScorer":
+        scoring = bundle.get("scoring")
+        return cls(scoring if scoring is not None else export_scoring(bundle))
+
+    def vector(self, feat_map: Dict[str, float]) -> np.ndarray:
+        """feat_map -> one row in model feature order (KeyError on a missing feature)."""
+        missing = [f for f in self.features if f not in feat_map]
+        if missing:
+            raise KeyError(f"rep features missing for the model: {missing}")
+        return np.array([feat_map[f] for f in self.features], dtype=np.float32)
+
+    def score_batch(self, X: Sequence[Sequence[float]]) -> np.ndarray:
+        """(n, d) raw feature rows -> (n,) decision_function values."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        # RobustScaler.transform on float32 input: each step rounds back to float32
+        xs = ((X - self.center).astype(np.float32) / self.scale).astype(np.float32).astype(np.float64)
+        # |sv - x|^2 = |x|^2 + |sv|^2 - 2 x.sv; clipped at 0 against cancellation
+        d2 = np.einsum("ij,ij->i", xs, xs)[:, None] + self.sv_sq[None, :] - 2.0 * (xs @ self.sv.T)
+        np.maximum(d2, 0.0, out=d2)
+        return np.exp(-self.gamma * d2) @ self.dual_coef + self.intercept
+
+    def score(self, x: Sequence[float]) -> float:
+        """One raw feature row -> decision_function value."""
+        return float(self.score_batch(x)[0])
+
+    def score_map(self, feat_map: Dict[str, float]) -> float:
+        return self.score(self.vector(feat_map))
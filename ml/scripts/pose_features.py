@@ -0,0 +1,199 @@
+# liftright/ml/scripts/pose_features.py
+# Pose landmark -> per-frame features, shared by 01_extract_frames.py, the realtime
+# pipelines and the 04_live_*.py scripts so offline and online features are the same
+# numbers computed the same way.
+#
+# Landmarks live in one float32 array of shape (33, 4) = (x, y, z, visibility) in
+# MediaPipe's normalized image coordinates, or (T, 33, 4) for a whole video.
+# compute_features() works on either and returns one value (or one (T,) column) per key;
+# frame_features() is the per-frame live path (scalar math, FRAME_KEYS only).
+
+import math
+import struct
+from typing import Dict, Optional
+
+import numpy as np
+
+# bump when a feature's definition changes (01_extract_frames cache key)
+FEATURE_SCHEMA_VERSION = 1
+
+N_LANDMARKS = 33
+
+# MediaPipe Pose indices of the points the exercises use, in KEY_NAMES order
+KEY_NAMES = ("LSH", "RSH", "LEL", "REL", "LWR", "RWR", "LHP", "RHP")
+KEY_IDX = np.array([11, 12, 13, 14, 15, 16, 23, 24], dtype=np.intp)
+_KEY_IDX = tuple(KEY_IDX.tolist())
+LSH, RSH, LEL, REL, LWR, RWR, LHP, RHP = range(len(KEY_NAMES))
+
+# 01_extract_frames.py CSV columns (besides the per-row metadata)
+FRAME_COLUMNS = (
+    "conf_mean",
+    "shoulder_width_px", "trunk_offset_norm",
+    "R_elbow_angle", "L_elbow_angle",
+    "R_wrist_rel_y", "L_wrist_rel_y",
+    "R_sh_x", "R_el_x", "R_wr_x", "L_sh_x", "L_el_x", "L_wr_x",
+)
+
+_EPS = 1e-6
+
+
+def landmarks_to_array(landmarks, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """MediaPipe landmark list (res.pose_landmarks.landmark) -> (33, 4) float32."""
+    rows = [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks]
+    if out is None:
+        return np.array(rows, dtype=np.float32)
+    out[:] = rows
+    return out
+
+
+def key_points(arr: np.ndarray, w: float, h: float) -> np.ndarray:
+    """(..., 33, 4) -> (..., 8, 3) float64 of (x_px, y_px, visibility) in KEY_NAMES order."""
+    k = arr[..., KEY_IDX, :].astype(np.float64)
+    k[..., 0] *= w
+    k[..., 1] *= h
+    return k[..., (0, 1, 3)]
+
+
+def joint_angles(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    Angle ABC in degrees for (..., 2) point arrays.
+    float32 vector math like the scalar calculate_angle it replaces.
+    """
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    c = c.astype(np.float32)
+    ba = a - b
+    bc = c - b
+    denom = np.sqrt(np.sum(ba * ba, axis=-1)) * np.sqrt(np.sum(bc * bc, axis=-1)) + np.float32(_EPS)
+    cos = (np.sum(ba * bc, axis=-1) / denom).astype(np.float64)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+# (from, to) key-point pairs for |x_to - x_from| / shoulder width:
+# R/L elbow drift from shoulder, R/L wrist stacked over elbow
+_X_SPANS = (np.array([RSH, LSH, REL, LEL]), np.array([REL, LEL, RWR, LWR]))
+# R/L arm triples for joint_angles: shoulder, elbow, wrist
+_ARM_SH, _ARM_EL, _ARM_WR = np.array([RSH, LSH]), np.array([REL, LEL]), np.array([RWR, LWR])
+
+
+def compute_features(arr: np.ndarray, w: float, h: float,
+                     min_shoulder_width: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    All per-frame features for (33, 4) or (T, 33, 4) landmarks.
+    Ratios are normalized by shoulder width, floored at min_shoulder_width when given
+    (the realtime code uses 2 px); shoulder_width_px itself is the raw value.
+    """
+    P = key_points(arr, w, h)
+    xy = P[..., :2]
+    x, y, vis = P[..., 0], P[..., 1], P[..., 2]
+
+    sw_raw = np.abs(x[..., LSH] - x[..., RSH])
+    sw = sw_raw if min_shoulder_width is None else np.maximum(sw_raw, float(min_shoulder_width))
+    sw_eps = (sw + _EPS)[..., None]
+
+    # shoulder / hip midpoints: [..., (sh, hp), (x, y)]
+    mid = (xy[..., (LSH, LHP), :] + xy[..., (RSH, RHP), :]) / 2.0
+    spans = np.abs(x[..., _X_SPANS[1]] - x[..., _X_SPANS[0]]) / sw_eps
+    wrist_rel = (y[..., (RSH, LSH)] - y[..., (RWR, LWR)]) / sw_eps
+    ang = joint_angles(xy[..., _ARM_SH, :], xy[..., _ARM_EL, :], xy[..., _ARM_WR, :])
+
+    return {
+        "conf_mean": np.mean(vis, axis=-1),
+        "shoulder_width_px": sw_raw,
+        "trunk_offset_norm": (mid[..., 0, 0] - mid[..., 1, 0]) / sw_eps[..., 0],
+        # forward/back lean proxy (torso "compression")
+        "torso_h_norm": np.abs(mid[..., 0, 1] - mid[..., 1, 1]) / sw,
+
+        "R_elbow_angle": ang[..., 0],
+        "L_elbow_angle": ang[..., 1],
+
+        # wrist height relative to shoulder line (positive = wrist above shoulder)
+        "R_wrist_rel_y": wrist_rel[..., 0],
+        "L_wrist_rel_y": wrist_rel[..., 1],
+
+        "R_elbow_drift": spans[..., 0],
+        "L_elbow_drift": spans[..., 1],
+        "R_wrist_stack": spans[..., 2],
+        "L_wrist_stack": spans[..., 3],
+
+        "R_sh_x": x[..., RSH], "R_el_x": x[..., REL], "R_wr_x": x[..., RWR],
+        "L_sh_x": x[..., LSH], "L_el_x": x[..., LEL], "L_wr_x": x[..., LWR],
+
+        "R_el_vis": vis[..., REL], "L_el_vis": vis[..., LEL],
+        "R_wr_vis": vis[..., RWR], "L_wr_vis": vis[..., LWR],
+    }
+
+
+# what the realtime pipelines / 04_live_* read per frame (compute_features minus the *_x columns)
+FRAME_KEYS = (
+    "conf_mean", "shoulder_width_px", "trunk_offset_norm", "torso_h_norm",
+    "R_elbow_angle", "L_elbow_angle", "R_wrist_rel_y", "L_wrist_rel_y",
+    "R_elbow_drift", "L_elbow_drift", "R_wrist_stack", "L_wrist_stack",
+    "R_el_vis", "L_el_vis", "R_wr_vis", "L_wr_vis",
+)
+
+_F32 = struct.Struct("f")
+
+
+def _f32(v: float) -> float:
+    """Round a Python float to float32 (joint_angles' precision)."""
+    return _F32.unpack(_F32.pack(v))[0]
+
+
+def _cos(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> float:
+    """cos of angle ABC with joint_angles' float32 steps, clipped to [-1, 1]."""
+    ax, ay, bx, by, cx, cy = _f32(ax), _f32(ay), _f32(bx), _f32(by), _f32(cx), _f32(cy)
+    bax, bay, bcx, bcy = _f32(ax - bx), _f32(ay - by), _f32(cx - bx), _f32(cy - by)
+    nba = _f32(math.sqrt(_f32(_f32(bax * bax) + _f32(bay * bay))))
+    nbc = _f32(math.sqrt(_f32(_f32(bcx * bcx) + _f32(bcy * bcy))))
+    denom = _f32(_f32(nba * nbc) + _f32(_EPS))
+    cos = _f32(_f32(_f32(bax * bcx) + _f32(bay * bcy)) / denom)
+    return min(max(cos, -1.0), 1.0)
+
+
+def frame_features(landmarks, w: float, h: float,
+                   min_shoulder_width: Optional[float] = None) -> Dict[str, float]:
+    """
+    Single frame: landmark list or (33, 4) array -> {feature: float} for FRAME_KEYS.
+    Plain float math on the 8 key points; the same values as compute_features (which
+    stays the batched path for 01_extract_frames) without its per-call array overhead.
+    """
+    if isinstance(landmarks, np.ndarray):
+        pts = landmarks[KEY_IDX].tolist()
+    else:
+        pts = [(lm.x, lm.y, lm.z, lm.visibility) for lm in (landmarks[i] for i in _KEY_IDX)]
+    x = [p[0] * w for p in pts]
+    y = [p[1] * h for p in pts]
+    v = [float(p[3]) for p in pts]
+
+    sw_raw = abs(x[LSH] - x[RSH])
+    sw = sw_raw if min_shoulder_width is None else max(sw_raw, float(min_shoulder_width))
+    sw_eps = sw + _EPS
+
+    sh_x, sh_y = (x[LSH] + x[RSH]) / 2.0, (y[LSH] + y[RSH]) / 2.0
+    hp_x, hp_y = (x[LHP] + x[RHP]) / 2.0, (y[LHP] + y[RHP]) / 2.0
+    torso = abs(sh_y - hp_y)
+    # both elbows in one np.arccos call: NumPy's arccos, not libm's, like joint_angles
+    ang_r, ang_l = np.degrees(np.arccos((
+        _cos(x[RSH], y[RSH], x[REL], y[REL], x[RWR], y[RWR]),
+        _cos(x[LSH], y[LSH], x[LEL], y[LEL], x[LWR], y[LWR]),
+    ))).tolist()
+    # np.mean's summation order for 8 values
+    conf = (((v[0] + v[1]) + (v[2] + v[3])) + ((v[4] + v[5]) + (v[6] + v[7]))) / 8.0
+
+    return {
+        "conf_mean": conf,
+        "shoulder_width_px": sw_raw,
+        "trunk_offset_norm": (sh_x - hp_x) / sw_eps,
+        "torso_h_norm": torso / sw if sw else (math.inf if torso else math.nan),
+        "R_elbow_angle": ang_r,
+        "L_elbow_angle": ang_l,
+        "R_wrist_rel_y": (y[RSH] - y[RWR]) / sw_eps,
+        "L_wrist_rel_y": (y[LSH] - y[LWR]) / sw_eps,
+        "R_elbow_drift": abs(x[REL] - x[RSH]) / sw_eps,
+        "L_elbow_drift": abs(x[LEL] - x[LSH]) / sw_eps,
+        "R_wrist_stack": abs(x[RWR] - x[REL]) / sw_eps,
+        "L_wrist_stack": abs(x[LWR] - x[LEL]) / sw_eps,
+        "R_el_vis": v[REL], "L_el_vis": v[LEL],
+        "R_wr_vis": v[RWR], "L_wr_vis": v[LWR],
+    }
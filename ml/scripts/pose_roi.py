@@ -0,0 +1,155 @@
+# liftright/ml/scripts/pose_roi.py
+# Region-of-interest cropping in front of MediaPipe Pose.
+#
+# The trainee usually fills only part of a webcam frame. RoiPose wraps a Pose and
+# feeds it the padded bounding box of the previous frame's visible landmarks instead
+# of the full frame, so the BGR->RGB conversion and MediaPipe's own image copy only
+# touch the crop, and high-resolution frames give the landmark model more pixels per
+# joint. Landmarks come back mapped to full-frame normalized coordinates (in place on
+# the result), so everything downstream (features, drawing) is unchanged.
+#
+#   - the crop is sticky: it only moves when the body gets close to its edge or it
+#     has become much larger than needed
+#   - full frame whenever there is no track, every ROI_REDETECT_EVERY frames
+#     (re-detect: someone stepped back in / a better candidate), and when the crop
+#     would cover most of the frame anyway (small frames: no cropping)
+#   - MediaPipe's tracking and smoothing state is relative to its input image, so the
+#     wrapped Pose is reset whenever its window changes: the crop moved, the track was
+#     lost, and both into and out of the periodic re-detect frame (two resets every
+#     ROI_REDETECT_EVERY frames while cropping)
+#
+#   pose = RoiPose(mp_pose.Pose(...))
+#   res = pose.process_bgr(frame_bgr)          # 04_live_* loops
+#   res = pose.process(frame_rgb)              # drop-in for Pose.process
+#   win = pose.begin(w, h); res = pose.process_crop(rgb_of_win)   # caller converts the crop
+#
+# POSE_ROI=0 turns cropping off (every frame full, same results as a bare Pose).
+
+import os
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# ---------------- CONFIG ----------------
+ROI_ENABLED = os.environ.get("POSE_ROI", "1").strip() != "0"
+ROI_PAD = 0.25               # padding on each side, fraction of the landmark bbox's longer side
+ROI_KEEP_PAD = 0.10          # keep the current crop while the bbox + this padding still fits
+ROI_SHRINK_AREA = 2.5        # ... and the crop is at most this many times the padded bbox area
+ROI_MIN_VIS = 0.5            # landmarks that count for the bbox
+ROI_MIN_SIDE = 160           # px
+ROI_ALIGN = 16               # crop corners snap to this many px (fewer distinct windows)
+ROI_MAX_AREA_FRAC = 0.6      # crop covering more than this of the frame: use the full frame
+ROI_REDETECT_EVERY = 60      # frames between full-frame re-detections
+
+Window = Tuple[int, int, int, int]   # x0, y0, x1, y1 in px
+
+
+class RoiPose:
+    """MediaPipe Pose behind a motion-tracked crop (see module header)."""
+    def __init__(self, pose, enabled: bool = ROI_ENABLED, redetect_every: int = ROI_REDETECT_EVERY):
+        self.pose = pose
+        self.enabled = bool(enabled)
+        self.redetect_every = int(redetect_every)
+        self.size: Optional[Tuple[int, int]] = None
+        self.track: Optional[Window] = None     # crop for the next frame; None = full frame
+        self.window: Optional[Window] = None    # window of the frame being processed
+        self.last: Optional[Window] = None      # window the Pose's tracking state belongs to
+        self.since_full = 0
+        self.frames = 0
+        self.cropped = 0
+
+    # ---- per frame ----
+    def begin(self, w: int, h: int) -> Window:
+        """Window (x0, y0, x1, y1) to crop the next w x h frame to."""
+        full = (0, 0, int(w), int(h))
+        if self.size != (w, h):
+            self.size = (w, h)
+            self.track = None
+        win = self.track
+        if not self.enabled or win is None or self.since_full >= self.redetect_every:
+            win = full
+
+        # the Pose's state belongs to the window it last saw; any other window (moved crop,
+        # lost track, re-detect frame and the way back to the crop after it) starts fresh
+        if self.last is not None and win != self.last:
+            self.pose.reset()
+        self.last = win
+        self.window = win
+        self.frames += 1
+        if win == full:
+            self.since_full = 0
+        else:
+            self.since_full += 1
+            self.cropped += 1
+        return win
+
+    def process_crop(self, rgb: np.ndarray):
+        """Pose on the crop begin() returned; landmarks mapped back to the full frame."""
+        res = self.pose.process(rgb)
+        w, h = self.size
+        x0, y0, x1, y1 = self.window
+        lms = res.pose_landmarks
+        if lms is None:
+            self.track = None
+            return res
+
+        if (x1 - x0, y1 - y0) != (w, h) or x0 or y0:
+            sx, sy = (x1 - x0) / w, (y1 - y0) / h
+            ox, oy = x0 / w, y0 / h
+            for lm in lms.landmark:
+                lm.x = lm.x * sx + ox
+                lm.y = lm.y * sy + oy
+                lm.z = lm.z * sx
+        if self.enabled:
+            pts = np.array([(lm.x, lm.y, lm.visibility) for lm in lms.landmark], dtype=np.float64)
+            self.track = self._next_track(pts, w, h)
+        return res
+
+    def process_bgr(self, frame_bgr: np.ndarray):
+        x0, y0, x1, y1 = self.begin(frame_bgr.shape[1], frame_bgr.shape[0])
+        return self.process_crop(cv2.cvtColor(frame_bgr[y0:y1, x0:x1], cv2.COLOR_BGR2RGB))
+
+    def process(self, frame_rgb: np.ndarray):
+        x0, y0, x1, y1 = self.begin(frame_rgb.shape[1], frame_rgb.shape[0])
+        crop = frame_rgb if (x1 - x0, y1 - y0) == frame_rgb.shape[1::-1] else np.ascontiguousarray(frame_rgb[y0:y1, x0:x1])
+        return self.process_crop(crop)
+
+    # ---- state ----
+    def _next_track(self, pts: np.ndarray, w: int, h: int) -> Optional[Window]:
+        vis = pts[pts[:, 2] >= ROI_MIN_VIS]
+        if len(vis) < 2:
+            return None
+        bx0, by0 = np.clip(vis[:, :2].min(axis=0), 0.0, 1.0) * (w, h)
+        bx1, by1 = np.clip(vis[:, :2].max(axis=0), 0.0, 1.0) * (w, h)
+        side = max(bx1 - bx0, by1 - by0, 1.0)
+
+        cur = self.track
+        if cur is not None:
+            k = ROI_KEEP_PAD * side
+            fits = cur[0] <= bx0 - k and cur[1] <= by0 - k and cur[2] >= bx1 + k and cur[3] >= by1 + k
+            want = (bx1 - bx0 + 2 * ROI_PAD * side) * (by1 - by0 + 2 * ROI_PAD * side)
+            if fits and (cur[2] - cur[0]) * (cur[3] - cur[1]) <= ROI_SHRINK_AREA * want:
+                return cur
+
+        p = ROI_PAD * side
+        x0, y0, x1, y1 = bx0 - p, by0 - p, bx1 + p, by1 + p
+        # minimum size around the center
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        half_w, half_h = max(x1 - x0, ROI_MIN_SIDE) / 2, max(y1 - y0, ROI_MIN_SIDE) / 2
+        a = ROI_ALIGN
+        x0 = max(0, int(cx - half_w) // a * a)
+        y0 = max(0, int(cy - half_h) // a * a)
+        x1 = min(w, -(-int(cx + half_w) // a) * a)
+        y1 = min(h, -(-int(cy + half_h) // a) * a)
+        if (x1 - x0) * (y1 - y0) > ROI_MAX_AREA_FRAC * w * h:
+            return None
+        return (x0, y0, x1, y1)
+
+    def reset(self) -> None:
+        self.track = self.window = self.last = None
+        self.since_full = 0
+        self.pose.reset()
+
+    def close(self) -> None:
+        self.pose.close()
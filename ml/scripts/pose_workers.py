@@ -0,0 +1,182 @@
+# liftright/ml/scripts/pose_workers.py
+# Process-pool execution mode for realtime_server.py (POSE_EXECUTION = "process").
+#
+# JPEG decode, MediaPipe Pose, frame features and (annotated mode) overlay drawing +
+# JPEG encode run in worker processes; the server process keeps the HTTP layer and
+# the per-session rep / fatigue state machines (ExercisePipeline.track).
+#
+# Each pose slot (one live session) is pinned to one worker process, which owns that
+# slot's Pose (tracking state) and its last decoded frame. Incoming JPEG bytes go to
+# the worker through a frame_ring.FrameRing slot instead of being pickled: the worker
+# decodes them in place and converts the pose crop (pose_roi.RoiPose window) into the
+# slot's RGB plane, which Pose reads in place. Only small things cross the pipe (slot index / sizes, the (33, 4) landmarks,
+# the feature dict, the overlay marks, the encoded output JPEG).
+#
+# Per frame:
+#   process(slot, jpeg) -> PoseFrame(w, h, lms, F)   (worker: decode, pose, features)
+#   render(slot, marks, quality) -> JPEG bytes       (worker: draw on the frame it decoded)
+
+import atexit
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from frame_ring import FrameRing
+from pose_features import landmarks_to_array, frame_features
+from realtime_common import MIN_SHOULDER_WIDTH_PX, new_pose, render_overlay
+
+@dataclass
+class PoseFrame:
+    """Worker result for one frame. lms / F are None when no pose was found."""
+    w: int
+    h: int
+    lms: Optional[np.ndarray]
+    F: Optional[Dict[str, float]]
+    ok: bool = True
+    timings: Dict[str, float] = field(default_factory=dict)   # worker stage -> seconds
+
+
+# ----------------------------- WORKER SIDE -----------------------------
+_RING: Optional[FrameRing] = None
+_POSES: Dict[int, Any] = {}
+_FRAMES: Dict[int, Any] = {}   # slot -> (frame_bgr, pose_landmarks) of the last processed frame
+
+
+def _attach(name: str, n: int) -> FrameRing:
+    global _RING
+    if _RING is None or _RING.name != name:
+        # the server process creates and unlinks it (spawned workers share its resource tracker)
+        _RING = FrameRing(n, name=name)
+    return _RING
+
+
+def _pose(slot: int, reset: bool):
+    pose = _POSES.get(slot)
+    if pose is None:
+        pose = _POSES[slot] = new_pose()
+    elif reset:
+        pose.reset()
+    return pose
+
+
+def _worker_frame(slot: int, ring_name: str, ring_n: int, r: Optional[int], n: int,
+                  raw: Optional[bytes], reset: bool) -> PoseFrame:
+    """r: FrameRing slot holding the JPEG's n bytes (raw=None) or lending its RGB plane only."""
+    _FRAMES.pop(slot, None)
+    ring = _attach(ring_name, ring_n)
+    t0 = time.perf_counter()
+    buf = ring.jpeg(r, n) if raw is None else np.frombuffer(raw, np.uint8)
+    img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    del buf
+    if img is None:
+        return PoseFrame(0, 0, None, None, ok=False)
+
+    h, w = img.shape[:2]
+    pose = _pose(slot, reset)
+    x0, y0, x1, y1 = pose.begin(w, h)
+    t1 = time.perf_counter()
+    rgb = ring.to_rgb(r, img[y0:y1, x0:x1])
+    t2 = time.perf_counter()
+    res = pose.process_crop(rgb)
+    t3 = time.perf_counter()
+    timings = {"imdecode": t1 - t0, "cvtcolor": t2 - t1, "pose": t3 - t2}
+    _FRAMES[slot] = (img, res.pose_landmarks)
+    if not res.pose_landmarks:
+        return PoseFrame(w, h, None, None, timings=timings)
+
+    lms = landmarks_to_array(res.pose_landmarks.landmark)
+    F = frame_features(lms, w, h, min_shoulder_width=MIN_SHOULDER_WIDTH_PX)
+    timings["features"] = time.perf_counter() - t3
+    return PoseFrame(w, h, lms, F, timings=timings)
+
+
+def _worker_render(slot: int, marks: Dict[str, Any], quality: int) -> bytes:
+    img, pose_landmarks = _FRAMES.pop(slot, (None, None))
+    if img is None:
+        return b""
+    render_overlay(img, pose_landmarks, marks)
+    ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    return buf.tobytes() if ok else b""
+
+
+def _worker_release(slot: int) -> None:
+    _FRAMES.pop(slot, None)
+
+
+def _worker_ping() -> bool:
+    return True
+
+
+# ----------------------------- SERVER SIDE -----------------------------
+class PoseProcessPool:
+    """
+    Same slot lease API as realtime_server.PosePool (acquire / release / in_use),
+    but slot s runs in worker process s % workers. Frames reach the workers through
+    `ring` (owned by the caller); each frame holds a ring slot until its pose result is back.
+    """
+    def __init__(self, size: int, workers: int, ring: FrameRing):
+        self.size = int(size)
+        self.workers = max(1, min(int(workers), self.size))
+        self.ring = ring
+        self._free = list(range(self.size))
+        self._fresh = [True] * self.size     # next frame resets the slot's Pose
+        self._guard = threading.Lock()
+        ctx = multiprocessing.get_context("spawn")
+        self._procs = [ProcessPoolExecutor(max_workers=1, mp_context=ctx) for _ in range(self.workers)]
+        atexit.register(self.close)
+
+    def start(self) -> None:
+        """Spawn the workers now (process start + imports take seconds) instead of on the first frame."""
+        for f in [p.submit(_worker_ping) for p in self._procs]:
+            f.result()
+
+    def _proc(self, slot: int) -> ProcessPoolExecutor:
+        return self._procs[slot % self.workers]
+
+    def acquire(self) -> Optional[int]:
+        with self._guard:
+            if not self._free:
+                return None
+            slot = self._free.pop(0)
+            self._fresh[slot] = True
+        return slot
+
+    def release(self, slot: int) -> None:
+        if slot < 0 or slot >= self.size:
+            return
+        with self._guard:
+            if slot not in self._free:
+                self._free.append(slot)
+        self._proc(slot).submit(_worker_release, slot)
+
+    def in_use(self) -> int:
+        with self._guard:
+            return self.size - len(self._free)
+
+    def process(self, slot: int, jpeg: bytes) -> PoseFrame:
+        """Decode + pose + features for one JPEG in the slot's worker."""
+        reset, self._fresh[slot] = self._fresh[slot], False
+        ring = self.ring
+        with ring.claim() as r:
+            if r is not None and ring.fits_jpeg(len(jpeg)):
+                n = ring.write_jpeg(r, jpeg)
+                fut = self._proc(slot).submit(_worker_frame, slot, ring.name, ring.n, r, n, None, reset)
+            else:
+                fut = self._proc(slot).submit(_worker_frame, slot, ring.name, ring.n, r, len(jpeg), bytes(jpeg), reset)
+            return fut.result()
+
+    def render(self, slot: int, marks: Dict[str, Any], quality: int = 80) -> bytes:
+        """Draw marks on the slot's last processed frame and JPEG-encode it (in the worker)."""
+        return self._proc(slot).submit(_worker_render, slot, marks, quality).result()
+
+    def close(self) -> None:
+        procs: List[ProcessPoolExecutor] = self._procs
+        self._procs = []
+        for p in procs:
+            p.shutdown(wait=True)
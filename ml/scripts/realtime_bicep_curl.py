@@ -0,0 +1,294 @@
+# liftright/ml/scripts/realtime_bicep_curl.py
+# Bicep curl pipeline for realtime_server.py — ported from golden standard 04_live_bicep_curl.py
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from realtime_common import (
+    MODELS_DIR,
+    GOOD_COLOR, WARN_COLOR, BAD_COLOR,
+    ExerciseSession, ExercisePipeline,
+    safe_div, arm_segments, mark_feedback,
+)
+from rep_engine import REP_CONFIGS, RepSegmenter, RepStats, START, END, SKIP
+
+
+# ---------------- PATHS ----------------
+MODEL_PKL = MODELS_DIR / "bicep_curl_ocsvm.pkl"
+
+# ---------------- CONFIG (match golden standard) ----------------
+# rep thresholds / smoothing: rep_engine.REP_CONFIGS (same reps as 02_build_reps_bicep_curl.py)
+REP_CONFIG = REP_CONFIGS["bicep_curl"]
+
+ELBOW_DRIFT_WARN = 0.35
+ELBOW_DRIFT_BAD  = 0.55
+
+ML_MARGIN = 0.030
+ML_LOW_STREAK_FOR_TIP = 3
+
+GENERAL_TIPS = [
+    "Control the way down (slow eccentric).",
+    "Keep wrists neutral.",
+    "Relax the shoulders.",
+    "Breathe out as you curl.",
+    "Keep your upper arm steady.",
+]
+
+
+# ----------------------------- FATIGUE -----------------------------
+def compute_fatigue_index(baseline, rom_med, dur_med, drift_med):
+    rom_ratio = safe_div(rom_med, baseline["rom"])
+    dur_ratio = safe_div(dur_med, baseline["duration"])
+    drift_delta = drift_med - baseline["drift"]
+
+    c_rom = np.clip((0.70 - rom_ratio) / 0.70, 0.0, 1.0)
+    c_dur = np.clip((dur_ratio - 1.25) / 1.25, 0.0, 1.0)
+    c_drift = np.clip(drift_delta / 0.25, 0.0, 1.0)
+
+    idx = (0.45 * c_rom + 0.25 * c_dur + 0.30 * c_drift) * 100.0
+
+    comps = {
+        "rom_ratio": float(rom_ratio),
+        "dur_ratio": float(dur_ratio),
+        "drift_delta": float(drift_delta),
+        "c_rom": float(c_rom),
+        "c_dur": float(c_dur),
+        "c_drift": float(c_drift),
+    }
+    return float(idx), comps
+
+
+def top_set_issues(set_counts):
+    items = []
+    right_total = set_counts["elbow_bad_right"] + set_counts["elbow_warn_right"]
+    left_total  = set_counts["elbow_bad_left"] + set_counts["elbow_warn_left"]
+
+    if right_total > 0:
+        items.append(("right elbow drift", right_total))
+    if left_total > 0:
+        items.append(("left elbow drift", left_total))
+    if set_counts["low_conf"] > 0:
+        items.append(("tracking low", set_counts["low_conf"]))
+
+    items.sort(key=lambda x: x[1], reverse=True)
+    return items[:2]
+
+
+# ----------------------------- REP COUNTER -----------------------------
+class CurlRepCounter:
+    """
+    Golden standard + adds per-rep conf accumulation so we can report confidence_avg to DB.
+    Rep boundaries come from rep_engine.RepSegmenter; this class keeps the per-rep arrays.
+    """
+    __slots__ = ("seg", "angles", "drift", "confs", "rep_start_t", "rep_tip_seen", "rep_bad_seen",
+                 "rep_tip_reason", "rep_bad_reason")
+
+    def __init__(self):
+        self.seg = RepSegmenter(REP_CONFIG)
+        self.angles = RepStats()
+        self.drift = RepStats()
+        self.confs = RepStats()
+        self.reset_rep(None)
+
+    @property
+    def state(self):
+        return self.seg.state
+
+    @property
+    def rep_count(self):
+        return self.seg.rep_count
+
+    def reset_rep(self, t):
+        self.rep_start_t = t
+        self.angles.reset()
+        self.drift.reset()
+        self.confs.reset()
+
+        self.rep_tip_seen = False
+        self.rep_bad_seen = False
+        self.rep_tip_reason = ""
+        self.rep_bad_reason = ""
+
+    def mark_feedback(self, bad_list, tip_list):
+        mark_feedback(self, bad_list, tip_list)
+
+    def update(self, elbow_angle, elbow_drift_norm, conf_mean: float, t: Optional[float] = None):
+        # t: frame capture time in seconds (client timestamp / video PTS); wall clock if absent
+        now = time.time() if t is None else float(t)
+        ev = self.seg.push(elbow_angle, now)
+        ang_s = self.seg.smoothed
+
+        if ev == START:
+            self.reset_rep(now)
+        if self.seg.state == "up" or ev in (END, SKIP):
+            self.angles.push(ang_s)
+            self.drift.push(float(elbow_drift_norm))
+            self.confs.push(float(conf_mean))
+
+        rep_done = False
+        rep_summary = None
+
+        if ev == END:
+            rep_done = True
+
+            rep_summary = {
+                "rep": self.rep_count,
+                "min_angle": self.angles.min,
+                "max_angle": self.angles.max,
+                "rom": self.angles.range(),
+                "duration": float(now - self.rep_start_t),
+                "elbow_drift_absmax": self.drift.max,
+                "confidence_avg": self.confs.mean(),
+
+                "rep_tip_seen": bool(self.rep_tip_seen),
+                "rep_bad_seen": bool(self.rep_bad_seen),
+                "rep_tip_reason": str(self.rep_tip_reason),
+                "rep_bad_reason": str(self.rep_bad_reason),
+            }
+
+        if ev is not None and ev != START:
+            self.reset_rep(now)
+
+        return ang_s, rep_done, rep_summary
+
+
+# ----------------------------- SESSION STATE -----------------------------
+@dataclass
+class BicepCurlSession(ExerciseSession):
+    exercise_type: str = "bicep_curl"
+
+    rep_counter: CurlRepCounter = field(default_factory=CurlRepCounter)
+
+    baseline: Dict[str, Any] = field(default_factory=lambda: {"rom": None, "duration": None, "drift": None})
+
+    set_counts: Dict[str, int] = field(default_factory=lambda: {
+        "elbow_warn_right": 0,
+        "elbow_bad_right": 0,
+        "elbow_warn_left": 0,
+        "elbow_bad_left": 0,
+        "low_conf": 0,
+    })
+
+
+class BicepCurlPipeline(ExercisePipeline):
+    exercise = "bicep_curl"
+    model_pkl = MODEL_PKL
+
+    baseline_keys = ("rom", "duration", "drift")
+    calib_fallbacks = {"rom": 120.0, "duration": 1.5, "drift": 0.14}
+
+    ml_margin = ML_MARGIN
+    ml_low_streak_for_tip = ML_LOW_STREAK_FOR_TIP
+    general_tips = GENERAL_TIPS
+
+    def new_session(self, session_token: str, user_id: int, log_id: int, **kw) -> BicepCurlSession:
+        return BicepCurlSession(session_token=session_token, user_id=user_id, log_id=log_id, **kw)
+
+    def compute_fatigue_index(self, baseline, *meds):
+        return compute_fatigue_index(baseline, *meds)
+
+    def top_set_issues(self, set_counts):
+        return top_set_issues(set_counts)
+
+    def analyze(self, F, conf_mean: float, sess: BicepCurlSession):
+        right_angle = F["R_elbow_angle"]
+        left_angle  = F["L_elbow_angle"]
+
+        right_drift_norm = F["R_elbow_drift"]
+        left_drift_norm  = F["L_elbow_drift"]
+
+        use_right_for_rep = (F["R_el_vis"] >= F["L_el_vis"])
+        elbow_angle_for_rep = right_angle if use_right_for_rep else left_angle
+        elbow_drift_for_rep = right_drift_norm if use_right_for_rep else left_drift_norm
+
+        bad = []
+        tips = []
+        right_elbow_level = 0
+        left_elbow_level = 0
+
+        if right_drift_norm > ELBOW_DRIFT_BAD:
+            right_elbow_level = 2
+            sess.set_counts["elbow_bad_right"] += 1
+        elif right_drift_norm > ELBOW_DRIFT_WARN:
+            right_elbow_level = 1
+            sess.set_counts["elbow_warn_right"] += 1
+
+        if left_drift_norm > ELBOW_DRIFT_BAD:
+            left_elbow_level = 2
+            sess.set_counts["elbow_bad_left"] += 1
+        elif left_drift_norm > ELBOW_DRIFT_WARN:
+            left_elbow_level = 1
+            sess.set_counts["elbow_warn_left"] += 1
+
+        worst_elbow = max(right_elbow_level, left_elbow_level)
+        if worst_elbow == 2:
+            if right_elbow_level == 2 and left_elbow_level == 2:
+                bad.append("Elbow drifting a lot (both)")
+            elif right_elbow_level == 2:
+                bad.append("Elbow drifting a lot (right)")
+            else:
+                bad.append("Elbow drifting a lot (left)")
+        elif worst_elbow == 1:
+            if right_elbow_level == 1 and left_elbow_level == 1:
+                tips.append("Keep elbows steadier (both)")
+            elif right_elbow_level == 1:
+                tips.append("Keep elbow steadier (right)")
+            else:
+                tips.append("Keep elbow steadier (left)")
+
+        segments = arm_segments("R", right_elbow_level) + arm_segments("L", left_elbow_level)
+
+        if bad:
+            feedback = "UNSAFE: " + bad[0]
+            fb_color = BAD_COLOR
+        elif tips:
+            feedback = "COACHING: " + tips[0]
+            fb_color = WARN_COLOR
+        else:
+            feedback = "STATUS: Stable"
+            fb_color = GOOD_COLOR
+
+        # While "up", carry feedback into the rep summary (golden behavior)
+        if sess.rep_counter.state == "up":
+            sess.rep_counter.mark_feedback(bad, tips)
+
+        _, rep_done, rep_sum = sess.rep_counter.update(
+            elbow_angle_for_rep, elbow_drift_for_rep, conf_mean, t=sess.frame_t
+        )
+
+        return feedback, fb_color, segments, (rep_sum if rep_done else None)
+
+    def rep_features(self, rep_sum):
+        drift_clip = min(rep_sum["elbow_drift_absmax"], 0.70)
+        feat_map = {
+            "rom": rep_sum["rom"],
+            "duration": rep_sum["duration"],
+            "elbow_drift_absmax": drift_clip,
+            # bicep curl uses elbow drift; trunk is not tracked
+            "trunk_absmax": 0.0,
+        }
+        entry = {
+            "rom": rep_sum["rom"],
+            "duration": rep_sum["duration"],
+            "drift": drift_clip,
+        }
+        return feat_map, entry
+
+    def rep_tips(self, sess, rep_sum) -> List[str]:
+        tips = []
+        if sess.baseline_ready:
+            if rep_sum["rom"] < 0.55 * sess.baseline["rom"]:
+                tips.append("ROM is dropping - lighten weight or rest")
+        else:
+            if rep_sum["rom"] < 45:
+                tips.append("Try a fuller range of motion (if comfortable)")
+        if sess.baseline_ready and rep_sum["duration"] > 1.8 * sess.baseline["duration"]:
+            tips.append("Tempo slowing - stay controlled")
+        return tips
+
+    def rep_row(self, rep_sum, entry):
+        # bicep curl uses elbow drift; trunk_sway is a placeholder
+        return rep_sum["rom"], 0.0, {"elbow_drift_absmax": float(entry["drift"])}
@@ -0,0 +1,625 @@
+# liftright/ml/scripts/realtime_common.py
+# Shared pieces of the realtime pipelines (bicep_curl / shoulder_press / lateral_raise).
+# Each exercise module supplies its rep counter, per-frame rules and per-rep features;
+# everything after "a rep finished" (OC-SVM score, calibration, fatigue, ML softness,
+# rep labels, DB rows) follows the same golden-standard flow and lives here.
+
+import time
+import random
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple, List
+from collections import deque
+from pathlib import Path
+
+import cv2
+import numpy as np
+import joblib
+import mediapipe as mp
+
+from ocsvm_score import OCSVMScorer
+from pose_roi import RoiPose
+from pose_features import landmarks_to_array, frame_features
+from server_metrics import METRICS
+from status_mirror import write_status
+
+
+# ---------------- PATHS ----------------
+PROJECT_ROOT = Path(__file__).resolve().parents[1]  # liftright/ml
+MODELS_DIR = PROJECT_ROOT / "models"
+OUT_DIR = PROJECT_ROOT / "outputs"
+OUT_DIR.mkdir(parents=True, exist_ok=True)
+STATUS_DIR = OUT_DIR / "status"  # per-session debug mirrors: <exercise>_<session_token>.json
+
+# ---------------- CONFIG (same for all exercises) ----------------
+DRAW_TEXT_OVERLAY = False  # set True if you want cv2.putText inside the frame
+
+MIN_CONF = 0.50
+MIN_SHOULDER_WIDTH_PX = 2  # floor for the shoulder-width normalization
+
+CALIB_REPS = 5
+FATIGUE_WINDOW = 6
+
+ML_SCORE_WINDOW = 8
+ML_REL_DROP = 0.020
+ML_MIN_SCORES_FOR_REL = 4
+
+FATIGUE_WARN_INDEX = 55
+FATIGUE_STOP_INDEX = 80
+FATIGUE_STOP_STREAK = 2
+
+GOOD_COLOR = (0, 255, 0)
+WARN_COLOR = (0, 255, 255)
+BAD_COLOR  = (0, 0, 255)
+TEXT_COLOR = (240, 240, 240)
+NEUTRAL_COLOR = (160, 160, 160)
+
+PRAISE_LINES = [
+    "Clean rep - controlled.",
+    "Solid rep - keep it steady.",
+    "Nice rep - good control.",
+    "Smooth rep.",
+    "Good rep - consistent tempo.",
+]
+
+mp_pose = mp.solutions.pose
+mp_draw = mp.solutions.drawing_utils
+
+
+def new_pose() -> RoiPose:
+    """Live-tracking Pose used by the server (one per session slot), behind a landmark-tracked crop."""
+    return RoiPose(mp_pose.Pose(
+        static_image_mode=False,
+        model_complexity=1,
+        smooth_landmarks=True,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+    ))
+
+
+# ----------------------------- UTIL -----------------------------
+def safe_div(a, b, eps=1e-6) -> float:
+    return float(a / (b + eps))
+
+
+def median_or(x, fallback: float) -> float:
+    x = [v for v in x if np.isfinite(v)]
+    return float(np.median(x)) if len(x) else float(fallback)
+
+
+def level_color(level: int):
+    return WARN_COLOR if level == 1 else BAD_COLOR
+
+
+def draw_skeleton_neutral(frame_bgr, pose_landmarks):
+    if pose_landmarks is None:
+        return
+    spec = mp_draw.DrawingSpec(color=NEUTRAL_COLOR, thickness=2, circle_radius=2)
+    mp_draw.draw_landmarks(
+        frame_bgr,
+        pose_landmarks,
+        mp_pose.POSE_CONNECTIONS,
+        landmark_drawing_spec=spec,
+        connection_drawing_spec=spec
+    )
+
+
+def draw_segment(frame_bgr, pose_landmarks, a, b, color, thickness=6):
+    if pose_landmarks is None:
+        return
+    lm = pose_landmarks.landmark
+    h, w = frame_bgr.shape[:2]
+    ax, ay = int(lm[a].x * w), int(lm[a].y * h)
+    bx, by = int(lm[b].x * w), int(lm[b].y * h)
+    cv2.line(frame_bgr, (ax, ay), (bx, by), color, thickness)
+
+
+def render_overlay(frame_bgr, pose_landmarks, marks: Dict[str, Any]) -> None:
+    """Draw ExercisePipeline.track()'s marks in place: skeleton, issue highlights, text lines."""
+    if pose_landmarks is not None:
+        draw_skeleton_neutral(frame_bgr, pose_landmarks)
+        highlight_issues(frame_bgr, pose_landmarks, marks["segments"])
+    for text, org, scale, color in marks["texts"]:
+        cv2.putText(frame_bgr, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
+
+def segment(a, b, level: int, thickness: int = 6) -> Tuple[int, int, int, int]:
+    return (int(a), int(b), int(level), int(thickness))
+
+
+def arm_segments(side: str, level: int) -> List[Tuple[int, int, int, int]]:
+    """Shoulder->elbow->wrist for one side ("R" / "L")."""
+    if level <= 0:
+        return []
+    if side == "R":
+        sh, el, wr = mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST
+    else:
+        sh, el, wr = mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST
+    return [segment(sh, el, level), segment(el, wr, level)]
+
+
+def highlight_issues(frame_bgr, pose_landmarks, segments: List[Tuple[int, int, int, int]]):
+    """segments: (landmark_a, landmark_b, level, thickness). Levels: 1 warn, 2 bad."""
+    if pose_landmarks is None:
+        return
+
+    for a, b, level, thickness in segments:
+        draw_segment(frame_bgr, pose_landmarks, a, b, level_color(level), thickness)
+
+
+def landmarks_to_list(lms: Optional[np.ndarray]) -> List[List[float]]:
+    """(33, 4) landmarks -> 33 x [x, y, z, visibility], x/y normalized to the frame (what the client draws)."""
+    if lms is None:
+        return []
+    out = np.empty(lms.shape, dtype=np.float64)
+    out[:, :3] = np.round(lms[:, :3], 4)
+    out[:, 3] = np.round(lms[:, 3], 3)
+    return out.tolist()
+
+
+def issues_text(issues, empty: str) -> str:
+    return ", ".join([f"{n} x{c}" for n, c in issues]) if issues else empty
+
+
+def mark_feedback(counter, bad_list, tip_list):
+    """Remember the first bad / tip reason seen during the current rep (shared by all rep counters)."""
+    if bad_list:
+        counter.rep_bad_seen = True
+        if not counter.rep_bad_reason:
+            counter.rep_bad_reason = str(bad_list[0])
+    if tip_list:
+        counter.rep_tip_seen = True
+        if not counter.rep_tip_reason:
+            counter.rep_tip_reason = str(tip_list[0])
+
+
+# ----------------------------- SESSION STATE -----------------------------
+@dataclass
+class ExerciseSession:
+    session_token: str
+    user_id: int
+    log_id: int
+    exercise_type: str = ""
+
+    # PosePool slot leased for the lifetime of the session
+    pose_slot: int = -1
+
+    # wall clock of the last /start or frame; drives idle eviction in the server
+    last_seen: float = field(default_factory=time.time)
+
+    # "annotated": /frame returns a JPEG with the overlay drawn server-side
+    # "landmarks": /frame returns landmarks + highlight segments, client draws
+    response_mode: str = "annotated"
+
+    calib: list = field(default_factory=list)
+    baseline_ready: bool = False
+    baseline: Dict[str, Optional[float]] = field(default_factory=dict)
+    recent: deque = field(default_factory=lambda: deque(maxlen=FATIGUE_WINDOW))
+
+    set_counts: Dict[str, int] = field(default_factory=dict)
+
+    # ML
+    ml_low_streak: int = 0
+    score_hist: deque = field(default_factory=lambda: deque(maxlen=ML_SCORE_WINDOW))
+
+    # Fatigue
+    fatigue_stop_streak: int = 0
+    fatigue_index: float = 0.0
+    fatigue_since_rep: Optional[int] = None
+    fatigue_text: str = ""
+    fatigue_details: Dict[str, Any] = field(default_factory=dict)
+
+    # UI text
+    last_rep_text: str = "-"
+    last_rep_color: Tuple[int, int, int] = TEXT_COLOR
+
+    # Summary for /finish
+    reps: List[Dict[str, Any]] = field(default_factory=list)        # per rep metrics
+    feedback: List[Dict[str, Any]] = field(default_factory=list)    # feedback events
+    fatigue_flag: int = 0
+    stopped: bool = False
+
+    # last seen conf
+    conf_last: float = 0.0
+
+    # frame accounting (server-side latest-frame-wins inbox lives in `inbox`)
+    inbox: Any = None
+    frames_processed: int = 0
+    frames_dropped: int = 0
+    status_last: Dict[str, Any] = field(default_factory=dict)
+    mirror_last: Dict[str, Any] = field(default_factory=dict)  # last write_status payload
+
+    # rep timing clock (see frame_clock): capture time of the frame being processed
+    frame_t: Optional[float] = None
+    clock_offset: float = 0.0
+
+    # input recording (session_record.SessionRecorder) when the server records sessions
+    recorder: Any = None
+
+
+def frame_clock(sess: "ExerciseSession", ts: Optional[float]) -> float:
+    """
+    Timestamp (seconds) the rep counters see for this frame.
+    ts is the capture time from the client (or a video PTS). Frames without one
+    fall back to wall clock shifted onto the client's timeline. Never goes backwards,
+    so a reordered frame costs zero time instead of a negative duration.
+    """
+    now = time.time()
+    if ts is None:
+        t = now - sess.clock_offset
+    else:
+        t = float(ts)
+        sess.clock_offset = now - t
+
+    if sess.frame_t is not None and t < sess.frame_t:
+        t = sess.frame_t
+    sess.frame_t = t
+    return t
+
+
+def session_summary(sess: "ExerciseSession") -> Dict[str, Any]:
+    """/finish payload for a session (also used for evicted sessions and by replay_session.py)."""
+    reps_total = len(sess.reps)
+    reps_bad = sum(1 for r in sess.reps if (r.get("form_label") == "bad"))
+    reps_warn = sum(1 for r in sess.reps if bool((r.get("meta") or {}).get("is_warning")))
+    # warnings count as "good" (not unsafe)
+    reps_good = reps_total - reps_bad
+
+    # form_error_count: count posture feedback "danger" entries
+    form_error_count = sum(1 for f in sess.feedback if f.get("severity") == "danger")
+
+    return {
+        "reps_total": int(reps_total),
+        "reps_good": int(reps_good),
+        "reps_bad": int(reps_bad),
+        "reps_warn": int(reps_warn),
+        "form_error_count": int(form_error_count),
+        "fatigue_flag": int(sess.fatigue_flag),
+        "reps": sess.reps,
+        "feedback": sess.feedback,
+    }
+
+
+# ----------------------------- PIPELINE -----------------------------
+class ExercisePipeline:
+    """
+    Base for the per-exercise pipelines. The OC-SVM bundle is loaded once in __init__.
+
+    Subclasses set the class attributes below and implement:
+      new_session(...)                      -> ExerciseSession subclass
+      analyze(F, conf_mean, sess)           -> (feedback, fb_color, segments, rep_summary or None)
+                                               F = pose_features.frame_features(...) for this frame
+      rep_features(rep_sum)                 -> (feat_map for the model, recent-entry dict keyed like baseline)
+      rep_tips(sess, rep_sum)               -> exercise-specific coaching tips after a rep
+      rep_row(rep_sum, entry)               -> (rom_score, trunk_sway, extra meta) for rep_metrics
+      compute_fatigue_index(baseline, *meds)
+      top_set_issues(set_counts)
+    """
+    exercise = ""
+    model_pkl: Path = MODELS_DIR
+
+    # keys shared by baseline / recent entries, in compute_fatigue_index argument order
+    baseline_keys: Tuple[str, ...] = ()
+    calib_fallbacks: Dict[str, float] = {}
+
+    ml_margin = 0.030
+    ml_low_streak_for_tip = 3
+    # lateral raise: post-rep tips (ROM/tempo/elbow) alone are enough to show COACHING
+    rep_tips_trigger_coaching = False
+
+    general_tips: List[str] = []
+
+    def __init__(self):
+        bundle = joblib.load(self.model_pkl)
+        self.scorer = OCSVMScorer.from_bundle(bundle)
+        self.feats = bundle["features"]
+        self.thr = float(bundle["threshold"])
+
+    # ---- hooks ----
+    def new_session(self, session_token: str, user_id: int, log_id: int, **kw) -> ExerciseSession:
+        raise NotImplementedError
+
+    def analyze(self, F: Dict[str, float], conf_mean: float, sess):
+        raise NotImplementedError
+
+    def rep_features(self, rep_sum):
+        raise NotImplementedError
+
+    def rep_tips(self, sess, rep_sum) -> List[str]:
+        return []
+
+    def rep_row(self, rep_sum, entry):
+        raise NotImplementedError
+
+    def compute_fatigue_index(self, baseline, *meds):
+        raise NotImplementedError
+
+    def top_set_issues(self, set_counts):
+        raise NotImplementedError
+
+    # ---- shared flow ----
+    def status_path(self, sess) -> Path:
+        return STATUS_DIR / f"{self.exercise}_{sess.session_token}.json"
+
+    def write_status(self, sess, payload: Dict[str, Any]) -> None:
+        """Per-session debug mirror; written off the frame path by status_mirror."""
+        sess.mirror_last = dict(payload)
+        write_status(self.status_path(sess), payload)
+
+    def score(self, feat_map: Dict[str, float]) -> float:
+        return self.scorer.score_map(feat_map)
+
+    def score_batch(self, feat_maps: List[Dict[str, float]]) -> np.ndarray:
+        """OC-SVM scores of many reps (any sessions) in one call."""
+        return self.scorer.score_batch([self.scorer.vector(m) for m in feat_maps])
+
+    def process(self, frame_bgr: np.ndarray, res, sess, draw: bool = True,
+                ts: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, Any], Dict[str, Any]]:
+        """
+        res is the mp_pose result for this frame, ts its capture time in seconds
+        (None = server clock). Rep timing follows ts, not processing time.
+        Returns (frame_bgr, status, overlay).
+        With draw=False the frame is left untouched and the caller is expected
+        to render overlay["landmarks"] / overlay["highlights"] itself.
+        """
+        h, w = frame_bgr.shape[:2]
+        lms = landmarks_to_array(res.pose_landmarks.landmark) if res.pose_landmarks else None
+        status, overlay, marks = self.track(lms, w, h, sess, ts=ts)
+        if draw:
+            with METRICS.time("draw"):
+                render_overlay(frame_bgr, res.pose_landmarks, marks)
+        return frame_bgr, status, overlay
+
+    def track(self, lms: Optional[np.ndarray], w: int, h: int, sess, ts: Optional[float] = None,
+              F: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """
+        The per-frame logic of process() on (33, 4) landmarks (None = no pose) of a w x h frame,
+        without touching pixels. F: frame_features(lms, w, h) if already computed (pose workers).
+        Returns (status, overlay, marks); marks is what render_overlay() draws.
+        """
+        frame_clock(sess, ts)
+        sess.frames_processed += 1
+        if sess.recorder is not None:
+            sess.recorder.landmarks(sess.frame_t, lms, w, h)
+
+        feedback = "Tracking..."
+        fb_color = TEXT_COLOR
+        segments: List[Tuple[int, int, int, int]] = []
+
+        if lms is not None:
+            if F is None:
+                with METRICS.time("features"):
+                    F = frame_features(lms, w, h, min_shoulder_width=MIN_SHOULDER_WIDTH_PX)
+
+            conf_mean = F["conf_mean"]
+            sess.conf_last = conf_mean
+
+            if conf_mean >= MIN_CONF:
+                with METRICS.time("rep_logic"):
+                    feedback, fb_color, segments, rep_sum = self.analyze(F, conf_mean, sess)
+
+                if rep_sum:
+                    with METRICS.time("after_rep"):
+                        self.after_rep(sess, rep_sum)
+            else:
+                sess.set_counts["low_conf"] += 1
+                feedback = f"Tracking quality low ({conf_mean:.2f})"
+                fb_color = WARN_COLOR
+        else:
+            # no landmarks
+            sess.set_counts["low_conf"] += 1
+            feedback = "No pose detected"
+            fb_color = WARN_COLOR
+
+        # overlays (match golden style positions)
+        texts = []
+        if DRAW_TEXT_OVERLAY:
+            texts.append((feedback, (10, h - 110), 0.8, fb_color))
+            if sess.fatigue_text:
+                texts.append((sess.fatigue_text, (10, h - 75), 0.7, WARN_COLOR))
+            texts.append((sess.last_rep_text, (10, h - 35), 0.8, sess.last_rep_color))
+
+        status = {
+            "state": "stop" if sess.stopped else "running",
+            "exercise": self.exercise,
+            "rep_now": int(sess.rep_counter.rep_count),
+            "last_rep_text": sess.last_rep_text,
+            "fatigue_index": float(sess.fatigue_index),
+            "fatigue_warning": bool(sess.fatigue_text),
+            "baseline_ready": bool(sess.baseline_ready),
+            "set_top_issues_text": issues_text(self.top_set_issues(sess.set_counts), "no major issues"),
+            "conf": float(sess.conf_last),
+            "frames_processed": int(sess.frames_processed),
+            "frames_dropped": int(sess.frames_dropped),
+        }
+        sess.status_last = status
+
+        overlay = {
+            "landmarks": landmarks_to_list(lms),
+            "highlights": [[a, b, lvl] for a, b, lvl, _ in segments],
+        }
+
+        return status, overlay, {"segments": segments, "texts": texts}
+
+    def after_rep(self, sess, rep_sum: Dict[str, Any]) -> None:
+        # --- ML score ---
+        feat_map, entry = self.rep_features(rep_sum)
+        with METRICS.time("ocsvm_score"):
+            score = self.score(feat_map)
+        entry["score"] = score
+        sess.recent.append(entry)
+
+        # --- Baseline ---
+        if not sess.baseline_ready and not rep_sum.get("rep_bad_seen", False):
+            sess.calib.append(sess.recent[-1])
+            if len(sess.calib) >= CALIB_REPS:
+                for k in self.baseline_keys:
+                    sess.baseline[k] = median_or([r[k] for r in sess.calib], self.calib_fallbacks[k])
+                sess.baseline_ready = True
+
+        # --- Fatigue ---
+        sess.fatigue_text = ""
+        sess.fatigue_details = {}
+        if sess.baseline_ready and len(sess.recent) >= 4:
+            last3 = list(sess.recent)[-3:]
+            meds = [median_or([r[k] for r in last3], sess.baseline[k]) for k in self.baseline_keys]
+            sess.fatigue_index, comps = self.compute_fatigue_index(sess.baseline, *meds)
+            sess.fatigue_details = comps
+
+            if sess.fatigue_since_rep is None and sess.fatigue_index >= FATIGUE_WARN_INDEX:
+                sess.fatigue_since_rep = int(rep_sum["rep"])
+
+            if sess.fatigue_index >= FATIGUE_WARN_INDEX:
+                sess.fatigue_text = f"FATIGUE WARNING: index {sess.fatigue_index:.0f}/100"
+
+            if sess.fatigue_index >= FATIGUE_STOP_INDEX:
+                sess.fatigue_stop_streak += 1
+            else:
+                sess.fatigue_stop_streak = 0
+
+            if sess.fatigue_stop_streak >= FATIGUE_STOP_STREAK:
+                sess.fatigue_flag = 1
+                sess.stopped = True
+
+                since = sess.fatigue_since_rep if sess.fatigue_since_rep is not None else int(rep_sum["rep"])
+                issues = self.top_set_issues(sess.set_counts)
+                msg = (
+                    f"Stop recommended. Strong fatigue detected since Rep {since}. "
+                    f"Top issues: {issues_text(issues, 'no dominant issue')}. Please rest or reduce weight."
+                )
+                sess.feedback.append({
+                    "feedback_type": "fatigue",
+                    "severity": "warning",
+                    "feedback_text": msg,
+                    "meta": {"since_rep": int(since), "top_issues": issues, "fatigue_index": float(sess.fatigue_index)}
+                })
+
+        # --- ML softness (rolling baseline) ---
+        sess.score_hist.append(float(score))
+        use_relative = (len(sess.score_hist) >= ML_MIN_SCORES_FOR_REL)
+        score_ref = float(np.median(sess.score_hist)) if use_relative else float(self.thr)
+
+        ml_low_rel = use_relative and (score < (score_ref - ML_REL_DROP))
+        ml_low_abs = (score < (self.thr - self.ml_margin))
+        ml_low = ml_low_rel if use_relative else ml_low_abs
+
+        sess.ml_low_streak = sess.ml_low_streak + 1 if ml_low else 0
+        ml_tip = (sess.ml_low_streak >= self.ml_low_streak_for_tip)
+
+        rep_tips = []
+        if sess.fatigue_text:
+            rep_tips.append("Fatigue trend - consider rest or lighter weight")
+        rep_tips.extend(self.rep_tips(sess, rep_sum))
+        if ml_tip:
+            rep_tips.append("Consistency drifting (ML)")
+
+        rep_bad_reason = rep_sum.get("rep_bad_reason", "")
+        rep_tip_reason = rep_sum.get("rep_tip_reason", "")
+
+        rep_n = int(rep_sum["rep"])
+        reasons: List[str] = []
+        if rep_sum.get("rep_bad_seen", False):
+            reasons.append(rep_bad_reason or "unsafe form")
+        if rep_sum.get("rep_tip_seen", False) and rep_tip_reason:
+            reasons.append(rep_tip_reason)
+        for t in rep_tips[:2]:
+            reasons.append(t)
+
+        # last_rep_text (golden style)
+        if rep_sum.get("rep_bad_seen", False):
+            sess.last_rep_text = f"Rep {rep_n}: UNSAFE - {rep_bad_reason or 'adjust form'}"
+            sess.last_rep_color = BAD_COLOR
+        else:
+            any_tip = rep_sum.get("rep_tip_seen", False) or ml_tip
+            if self.rep_tips_trigger_coaching:
+                any_tip = any_tip or bool(rep_tips)
+            if any_tip:
+                reason = rep_tip_reason if rep_tip_reason else (rep_tips[0] if rep_tips else "small adjustment")
+                sess.last_rep_text = f"Rep {rep_n}: COACHING - {reason}"
+                sess.last_rep_color = WARN_COLOR
+            else:
+                msg = random.choice(PRAISE_LINES)
+                if self.general_tips and random.random() < 0.40:
+                    msg += " " + random.choice(self.general_tips)
+                sess.last_rep_text = f"Rep {rep_n}: {msg}"
+                sess.last_rep_color = GOOD_COLOR
+
+        # ---- Rep label rules (DB-safe) ----
+        # bad (unsafe) overrides everything
+        rep_bad = bool(rep_sum.get("rep_bad_seen", False))
+        # warning = not bad, but any tip happened DURING rep OR ML tip OR any rep_tips (tempo/ROM/fatigue)
+        rep_warn = (not rep_bad) and (
+            bool(rep_sum.get("rep_tip_seen", False)) or
+            bool(ml_tip) or
+            (len(rep_tips) > 0)
+        )
+
+        # DB stays binary: good/bad
+        form_label_db = "bad" if rep_bad else "good"
+
+        # UI-friendly label lives in meta (good/warning/bad)
+        label_ui = "bad" if rep_bad else ("warning" if rep_warn else "good")
+
+        rom_score, trunk_sway, meta_extra = self.rep_row(rep_sum, entry)
+
+        meta = {
+            "label_ui": label_ui,
+            "is_warning": bool(rep_warn),
+        }
+        meta.update(meta_extra)
+        meta.update({
+            "rep_tip_seen": bool(rep_sum.get("rep_tip_seen", False)),
+            "rep_bad_seen": bool(rep_sum.get("rep_bad_seen", False)),
+            "reasons": reasons[:4],
+            "fatigue_index": float(sess.fatigue_index),
+        })
+
+        sess.reps.append({
+            "rep_index": rep_n,
+            "duration_ms": int(round(rep_sum["duration"] * 1000)),
+            "rom_score": float(rom_score),
+            "trunk_sway": float(trunk_sway),
+            "confidence_avg": float(rep_sum.get("confidence_avg", 0.0)),
+            "form_label": form_label_db,
+            # "anomaly_score" in the DB schema stores the OCSVM decision_function
+            "anomaly_score": float(score),
+            "meta": meta,
+        })
+
+        # feedback table rows (optional)
+        if rep_bad:
+            sess.feedback.append({
+                "feedback_type": "posture",
+                "severity": "danger",
+                "feedback_text": rep_bad_reason or "Unsafe form detected",
+                "meta": {"rep": rep_n}
+            })
+        elif reasons:
+            # coaching/info
+            sess.feedback.append({
+                "feedback_type": "posture",
+                "severity": "warning" if ("COACHING" in sess.last_rep_text) else "info",
+                "feedback_text": reasons[0],
+                "meta": {"rep": rep_n, "all": reasons[:4]}
+            })
+
+        # optional debug status mirror
+        issues = self.top_set_issues(sess.set_counts)
+        self.write_status(sess, {
+            "state": "stop" if sess.stopped else "running",
+            "exercise": self.exercise,
+            "rep_now": rep_n,
+            "last_rep_text": sess.last_rep_text,
+            "last_rep_reasons": reasons[:4],
+            "score": float(score),
+            "threshold": float(self.thr),
+            "fatigue_index": float(sess.fatigue_index),
+            "fatigue_warning": bool(sess.fatigue_text),
+            "message": "Active",
+            "baseline_ready": bool(sess.baseline_ready),
+            "set_summary": sess.set_counts,
+            "set_top_issues": issues,
+            "set_top_issues_text": issues_text(issues, "no major issues"),
+            "recent_reps": [],
+            "fatigue_details": sess.fatigue_details,
+        })
@@ -0,0 +1,445 @@
+# liftright/ml/scripts/realtime_lateral_raise.py
+# Lateral raise pipeline for realtime_server.py — ported from golden standard 04_live_lateral_raise.py
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from realtime_common import (
+    MODELS_DIR,
+    GOOD_COLOR, WARN_COLOR, BAD_COLOR,
+    ExerciseSession, ExercisePipeline, mp_pose,
+    safe_div, segment, arm_segments, mark_feedback,
+)
+from rep_engine import REP_CONFIGS, RepSegmenter, RepStats, START, END, SKIP
+
+
+# ---------------- PATHS ----------------
+MODEL_PKL = MODELS_DIR / "lateral_raise_ocsvm.pkl"
+
+# ---------------- REP DETECTION ----------------
+# smoothing, baseline calibration (~3 sec), thresholds, min frames / time:
+# rep_engine.REP_CONFIGS (same reps as 02_build_reps_lateral_raise.py)
+REP_CONFIG = REP_CONFIGS["lateral_raise"]
+BASELINE_FRAMES = REP_CONFIG.baseline_frames   # torso height calibration window
+
+# ---------------- COACHING THRESHOLDS ----------------
+TRUNK_WARN = 0.12
+TRUNK_BAD  = 0.20
+
+ASYM_WARN = 0.18
+ASYM_BAD  = 0.28
+
+ELBOW_WARN = 120.0
+ELBOW_BAD  = 95.0
+
+# forward/back lean proxy (torso compression vs baseline)
+TORSO_COMP_WARN_DROP = 0.04
+TORSO_COMP_BAD_DROP  = 0.07
+TORSO_COMP_MIN_BASE  = 0.60   # ignore if calibration is weird (very close camera)
+
+WARN_STREAK = 6
+BAD_STREAK  = 4
+
+# ML softness (do not override clean reps)
+ML_MARGIN = 0.040
+ML_LOW_STREAK_FOR_TIP = 3
+
+GENERAL_TIPS = [
+    "Keep shoulders down and relaxed.",
+    "Lead with elbows slightly.",
+    "Control the way down (eccentric).",
+    "Avoid swinging your torso.",
+    "Stop around shoulder height.",
+]
+
+
+# ----------------------------- FATIGUE -----------------------------
+def compute_fatigue_index(baseline, range_med, dur_med, elbow_med):
+    range_ratio = safe_div(range_med, baseline["range"])
+    dur_ratio   = safe_div(dur_med, baseline["duration"])
+    elbow_delta = baseline["elbow"] - elbow_med
+
+    c_range = np.clip((0.70 - range_ratio) / 0.70, 0.0, 1.0)
+    c_dur   = np.clip((dur_ratio - 1.25) / 1.25, 0.0, 1.0)
+    c_elbow = np.clip(elbow_delta / 25.0, 0.0, 1.0)
+
+    idx = (0.45 * c_range + 0.25 * c_dur + 0.30 * c_elbow) * 100.0
+    comps = {
+        "range_ratio": float(range_ratio),
+        "dur_ratio": float(dur_ratio),
+        "elbow_delta": float(elbow_delta),
+        "c_range": float(c_range),
+        "c_dur": float(c_dur),
+        "c_elbow": float(c_elbow),
+    }
+    return float(idx), comps
+
+
+def top_set_issues(set_counts):
+    items = []
+    if set_counts["trunk_bad"] + set_counts["trunk_warn"] > 0:
+        items.append(("side lean/swing", set_counts["trunk_bad"] + set_counts["trunk_warn"]))
+    if set_counts["tilt_bad"] + set_counts["tilt_warn"] > 0:
+        items.append(("forward/back lean", set_counts["tilt_bad"] + set_counts["tilt_warn"]))
+    if set_counts["asym_bad"] + set_counts["asym_warn"] > 0:
+        items.append(("arm asymmetry", set_counts["asym_bad"] + set_counts["asym_warn"]))
+    if set_counts["elbow_bad_right"] + set_counts["elbow_warn_right"] > 0:
+        items.append(("right elbow bend", set_counts["elbow_bad_right"] + set_counts["elbow_warn_right"]))
+    if set_counts["elbow_bad_left"] + set_counts["elbow_warn_left"] > 0:
+        items.append(("left elbow bend", set_counts["elbow_bad_left"] + set_counts["elbow_warn_left"]))
+    if set_counts["low_conf"] > 0:
+        items.append(("tracking low", set_counts["low_conf"]))
+
+    items.sort(key=lambda x: x[1], reverse=True)
+    return items[:2]
+
+
+def streak_level(streak: int) -> int:
+    if streak >= BAD_STREAK:
+        return 2
+    if streak >= WARN_STREAK:
+        return 1
+    return 0
+
+
+def next_streak(streak: int, is_bad: bool, is_warn: bool) -> int:
+    if is_bad:
+        return streak + 1
+    if is_warn:
+        return max(streak, 1)
+    return 0
+
+
+# ----------------------------- REP COUNTER -----------------------------
+class LateralRepCounter:
+    """
+    Gold-standard style (04_live_lateral_raise.py):
+      - baseline via percentile on early frames (clamped)
+      - down->up->down state machine
+      - per-rep memory (tip/bad seen)
+      - locks arm label once rep starts
+    + per-rep conf accumulation so we can report confidence_avg to DB.
+    """
+    __slots__ = ("seg", "vals", "trunk", "elbow", "confs", "rep_start_t", "rep_tip_seen",
+                 "rep_bad_seen", "rep_tip_reason", "rep_bad_reason", "rep_arm")
+
+    def __init__(self):
+        self.seg = RepSegmenter(REP_CONFIG)
+        self.vals = RepStats()
+        self.trunk = RepStats()
+        self.elbow = RepStats()
+        self.confs = RepStats()
+        self.rep_arm = None  # "R" or "L", locked during rep
+        self.reset_rep(None)
+
+    @property
+    def state(self):
+        return self.seg.state
+
+    @property
+    def rep_count(self):
+        return self.seg.rep_count
+
+    # thresholds: defaults until the engine has calibrated on the first frames
+    @property
+    def baseline(self):
+        return self.seg.baseline
+
+    @property
+    def down_thr(self):
+        return self.seg.down_thr
+
+    @property
+    def up_thr(self):
+        return self.seg.up_thr
+
+    def reset_rep(self, t):
+        self.rep_start_t = t
+        self.vals.reset()
+        self.trunk.reset()
+        self.elbow.reset()
+        self.confs.reset()
+
+        self.rep_tip_seen = False
+        self.rep_bad_seen = False
+        self.rep_tip_reason = ""
+        self.rep_bad_reason = ""
+
+        self.rep_arm = None
+
+    def mark_feedback(self, bad_list, tip_list):
+        mark_feedback(self, bad_list, tip_list)
+
+    def _collect(self, y_s, trunk_offset_norm, elbow_angle, conf_mean):
+        self.vals.push(y_s)
+        self.trunk.push(float(trunk_offset_norm))
+        self.elbow.push(float(elbow_angle))
+        self.confs.push(float(conf_mean))
+
+    def update(self, wrist_rel_y, trunk_offset_norm, elbow_angle, arm_label, conf_mean: float = 0.0, t: Optional[float] = None):
+        # t: frame capture time in seconds (client timestamp / video PTS); wall clock if absent
+        now = time.time() if t is None else float(t)
+
+        # state == "up": collect only if matching locked arm (only those frames count toward min frames)
+        same_arm = self.rep_arm is None or arm_label == self.rep_arm
+
+        # smoothing, baseline calibration, start / end / stuck reset: rep_engine
+        ev = self.seg.push(wrist_rel_y, now, counted=same_arm)
+        y_s = self.seg.smoothed
+
+        if ev == START:
+            self.reset_rep(now)
+            self.rep_arm = arm_label
+        if same_arm and (self.seg.state == "up" or ev in (END, SKIP)):
+            self._collect(y_s, trunk_offset_norm, elbow_angle, conf_mean)
+
+        rep_done = False
+        rep_summary = None
+
+        if ev == END:
+            rep_done = True
+
+            rep_summary = {
+                "rep": int(self.rep_count),
+                "min_wrist_rel_y": self.vals.min,
+                "max_wrist_rel_y": self.vals.max,
+                "wrist_rel_range": self.vals.range(),
+                "duration": float(now - self.rep_start_t),
+                "trunk_absmax": self.trunk.absmax if len(self.trunk) else 0.0,
+                "elbow_min": self.elbow.min if len(self.elbow) else 180.0,
+                "confidence_avg": self.confs.mean(),
+
+                "baseline": float(self.baseline),
+                "down_thr": float(self.down_thr),
+                "up_thr": float(self.up_thr),
+                "arm": str(self.rep_arm) if self.rep_arm else str(arm_label),
+
+                "rep_tip_seen": bool(self.rep_tip_seen),
+                "rep_bad_seen": bool(self.rep_bad_seen),
+                "rep_tip_reason": str(self.rep_tip_reason),
+                "rep_bad_reason": str(self.rep_bad_reason),
+                "n_frames": len(self.vals),
+            }
+
+        if ev not in (None, START):
+            self.reset_rep(now)
+
+        return y_s, rep_done, rep_summary
+
+
+# ----------------------------- SESSION STATE -----------------------------
+@dataclass
+class LateralRaiseSession(ExerciseSession):
+    exercise_type: str = "lateral_raise"
+
+    rep_counter: LateralRepCounter = field(default_factory=LateralRepCounter)
+
+    baseline: Dict[str, Any] = field(default_factory=lambda: {"range": None, "duration": None, "elbow": None})
+
+    set_counts: Dict[str, int] = field(default_factory=lambda: {
+        "trunk_warn": 0, "trunk_bad": 0,
+        "tilt_warn": 0, "tilt_bad": 0,
+        "asym_warn": 0, "asym_bad": 0,
+        "elbow_warn_right": 0, "elbow_bad_right": 0,
+        "elbow_warn_left": 0, "elbow_bad_left": 0,
+        "low_conf": 0,
+    })
+
+    # rule streaks (frames in a row over threshold)
+    trunk_streak: int = 0
+    tilt_streak: int = 0
+    asym_streak: int = 0
+    elbow_streak_R: int = 0
+    elbow_streak_L: int = 0
+
+    # forward/back lean calibration (torso compression)
+    torso_h_samples: List[float] = field(default_factory=list)
+    torso_h0: Optional[float] = None
+
+
+class LateralRaisePipeline(ExercisePipeline):
+    exercise = "lateral_raise"
+    model_pkl = MODEL_PKL
+
+    baseline_keys = ("range", "duration", "elbow")
+    calib_fallbacks = {"range": 0.35, "duration": 1.6, "elbow": 145.0}
+
+    ml_margin = ML_MARGIN
+    ml_low_streak_for_tip = ML_LOW_STREAK_FOR_TIP
+    rep_tips_trigger_coaching = True
+    general_tips = GENERAL_TIPS
+
+    def new_session(self, session_token: str, user_id: int, log_id: int, **kw) -> LateralRaiseSession:
+        return LateralRaiseSession(session_token=session_token, user_id=user_id, log_id=log_id, **kw)
+
+    def compute_fatigue_index(self, baseline, *meds):
+        return compute_fatigue_index(baseline, *meds)
+
+    def top_set_issues(self, set_counts):
+        return top_set_issues(set_counts)
+
+    def analyze(self, F, conf_mean: float, sess: LateralRaiseSession):
+        counts = sess.set_counts
+
+        bad = []
+        tips = []
+
+        # trunk side-to-side offset
+        trunk_offset_norm = F["trunk_offset_norm"]
+
+        # forward/back lean proxy: torso "compression"
+        torso_h_norm = F["torso_h_norm"]
+
+        # calibrate torso_h0 during early frames
+        if sess.torso_h0 is None:
+            sess.torso_h_samples.append(float(torso_h_norm))
+            if len(sess.torso_h_samples) >= BASELINE_FRAMES:
+                sess.torso_h0 = max(float(np.median(sess.torso_h_samples)), TORSO_COMP_MIN_BASE)
+
+        # wrists relative heights
+        yR = F["R_wrist_rel_y"]
+        yL = F["L_wrist_rel_y"]
+
+        # elbow angles
+        angR = F["R_elbow_angle"]
+        angL = F["L_elbow_angle"]
+
+        # choose arm by wrist visibility; rep counter locks it
+        use_right = (F["R_wr_vis"] >= F["L_wr_vis"])
+        arm_label = "R" if use_right else "L"
+        wrist_rel_y = yR if use_right else yL
+        elbow_angle = angR if use_right else angL
+
+        # ---------------- rules with streaking ----------------
+        # trunk side-to-side
+        sess.trunk_streak = next_streak(sess.trunk_streak, abs(trunk_offset_norm) > TRUNK_BAD, abs(trunk_offset_norm) > TRUNK_WARN)
+        trunk_level = streak_level(sess.trunk_streak)
+        if trunk_level == 2:
+            counts["trunk_bad"] += 1
+            bad.append("Avoid leaning / swinging (side-to-side)")
+        elif trunk_level == 1:
+            counts["trunk_warn"] += 1
+            tips.append("Reduce torso swing")
+
+        # forward/back lean via torso compression drop
+        tilt_level = 0
+        if sess.torso_h0 is not None:
+            drop = (sess.torso_h0 - torso_h_norm) / (sess.torso_h0 + 1e-6)
+            sess.tilt_streak = next_streak(sess.tilt_streak, drop > TORSO_COMP_BAD_DROP, drop > TORSO_COMP_WARN_DROP)
+            tilt_level = streak_level(sess.tilt_streak)
+            if tilt_level == 2:
+                counts["tilt_bad"] += 1
+                bad.append("Don't hinge forward/back (stay upright)")
+            elif tilt_level == 1:
+                counts["tilt_warn"] += 1
+                tips.append("Stay upright (avoid forward lean)")
+
+        # asymmetry
+        asym = abs(yR - yL)
+        sess.asym_streak = next_streak(sess.asym_streak, asym > ASYM_BAD, asym > ASYM_WARN)
+        asym_level = streak_level(sess.asym_streak)
+        if asym_level == 2:
+            counts["asym_bad"] += 1
+            bad.append("Raise both arms evenly")
+        elif asym_level == 1:
+            counts["asym_warn"] += 1
+            tips.append("Even out both arms")
+
+        # elbow bend per side
+        sess.elbow_streak_R = next_streak(sess.elbow_streak_R, angR < ELBOW_BAD, angR < ELBOW_WARN)
+        elbow_level_right = streak_level(sess.elbow_streak_R)
+        if elbow_level_right == 2:
+            counts["elbow_bad_right"] += 1
+        elif elbow_level_right == 1:
+            counts["elbow_warn_right"] += 1
+
+        sess.elbow_streak_L = next_streak(sess.elbow_streak_L, angL < ELBOW_BAD, angL < ELBOW_WARN)
+        elbow_level_left = streak_level(sess.elbow_streak_L)
+        if elbow_level_left == 2:
+            counts["elbow_bad_left"] += 1
+        elif elbow_level_left == 1:
+            counts["elbow_warn_left"] += 1
+
+        # decide text
+        worst_elbow = max(elbow_level_left, elbow_level_right)
+        if bad:
+            feedback = "UNSAFE: " + bad[0]
+            fb_color = BAD_COLOR
+        elif tips:
+            feedback = "COACHING: " + tips[0]
+            fb_color = WARN_COLOR
+        elif worst_elbow == 2:
+            feedback = "UNSAFE: Don't curl (elbow too bent)"
+            fb_color = BAD_COLOR
+        elif worst_elbow == 1:
+            feedback = "COACHING: Keep arms straighter"
+            fb_color = WARN_COLOR
+        else:
+            feedback = "STATUS: Stable"
+            fb_color = GOOD_COLOR
+
+        segments = []
+        body_level = max(trunk_level, tilt_level)
+        if body_level > 0:
+            segments.append(segment(mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_HIP, body_level, 5))
+            segments.append(segment(mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_HIP, body_level, 5))
+        if asym_level > 0:
+            segments.append(segment(mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_WRIST, asym_level, 4))
+            segments.append(segment(mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_WRIST, asym_level, 4))
+        segments += arm_segments("R", elbow_level_right) + arm_segments("L", elbow_level_left)
+
+        # remember issues during rep (elbow bend counts too)
+        if sess.rep_counter.state == "up":
+            rep_bad = list(bad)
+            rep_tips = list(tips)
+            if worst_elbow == 2:
+                rep_bad.append("Don't curl (elbow too bent)")
+            elif worst_elbow == 1:
+                rep_tips.append("Keep arms straighter")
+            sess.rep_counter.mark_feedback(rep_bad, rep_tips)
+
+        _, rep_done, rep_sum = sess.rep_counter.update(
+            wrist_rel_y=wrist_rel_y,
+            trunk_offset_norm=trunk_offset_norm,
+            elbow_angle=elbow_angle,
+            arm_label=arm_label,
+            conf_mean=conf_mean,
+            t=sess.frame_t,
+        )
+
+        return feedback, fb_color, segments, (rep_sum if rep_done else None)
+
+    def rep_features(self, rep_sum):
+        trunk_clip = min(rep_sum["trunk_absmax"], 0.55)
+        elbow_clip = float(np.clip(rep_sum["elbow_min"], 60.0, 180.0))
+        feat_map = {
+            "wrist_rel_range": rep_sum["wrist_rel_range"],
+            "duration": rep_sum["duration"],
+            "trunk_absmax": trunk_clip,
+            "elbow_min": elbow_clip,
+        }
+        entry = {
+            "range": rep_sum["wrist_rel_range"],
+            "duration": rep_sum["duration"],
+            "elbow": elbow_clip,
+        }
+        return feat_map, entry
+
+    def rep_tips(self, sess, rep_sum) -> List[str]:
+        tips = []
+        if sess.baseline_ready and rep_sum["wrist_rel_range"] < 0.55 * sess.baseline["range"]:
+            tips.append("Range dropping - lighten weight or rest")
+        if sess.baseline_ready and rep_sum["duration"] > 1.8 * sess.baseline["duration"]:
+            tips.append("Tempo slowing - stay controlled")
+        if sess.baseline_ready and rep_sum["elbow_min"] < (sess.baseline["elbow"] - 18.0):
+            tips.append("Arms bending more - avoid upright-row motion")
+        return tips
+
+    def rep_row(self, rep_sum, entry):
+        return rep_sum["wrist_rel_range"], min(rep_sum["trunk_absmax"], 0.55), {
+            "elbow_min": float(entry["elbow"]),
+            "arm": rep_sum.get("arm", "?"),
+        }
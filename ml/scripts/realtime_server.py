@@ -1,742 +1,595 @@
 # liftright/ml/scripts/realtime_server.py
-# v1: BICEP CURL ONLY — ported from golden standard 04_live_bicep_curl.py
+# Serves bicep_curl / shoulder_press / lateral_raise — pipelines ported from the golden
+# standard 04_live_*.py scripts (realtime_bicep_curl.py, realtime_shoulder_press.py,
+# realtime_lateral_raise.py). Each OC-SVM bundle is loaded once at startup.
 # Contract matches your PHP bridge:
 #   POST /start  {exercise_type, log_id, user_id} -> {session_token}
-#   POST /frame  {session_token, frame_dataurl}   -> {annotated_frame_dataurl, status}
+#   POST /frame  {session_token, frame_dataurl, capture_ts_ms?} -> {annotated_frame_dataurl, status}
+#     (sessions started with response_mode="landmarks" get {landmarks[33], highlights[], status} instead)
+#   GET  /status/{session_token}                  -> {ok, status, last_update} (in-memory; file mirror is outputs/status/)
 #   POST /finish {session_token}                  -> {reps_total, reps_good, reps_bad, form_error_count, fatigue_flag, reps[], feedback[]}
-
+# Streaming alternative to /frame (same session_token from /start):
+#   WS /ws/{session_token}?annotated=1  binary JPEG in -> JSON {ok, status, annotated} (+ binary JPEG if annotated)
+#     (?ts=1: each message is a little-endian float64 capture time in ms followed by the JPEG)
+# Rep duration / MIN_REP_TIME follow capture_ts_ms when sent, so server queueing doesn't leak into metrics.
+# Frames are latest-wins per session: a frame overtaken before processing gets {dropped: true, status}.
+# Sessions idle for SESSION_IDLE_TTL_S are auto-finalized; a later /finish still returns their summary.
+# pose.process calls from all sessions go through one PoseBatcher: at most POSE_WORKERS at
+# once; with POSE_BATCH_WAIT_MS > 0 (default 0 = straight through) frames arriving within
+# that window are dispatched together.
+# POSE_EXECUTION=process moves JPEG decode / pose / features / drawing into worker
+# processes (pose_workers.py); this process keeps HTTP and the rep state machines.
+# Either way pose.process sees a crop around the trainee (pose_roi.py, POSE_ROI=0 = full frames).
+#   GET  /metrics  Prometheus text: per-stage / per-endpoint latency p50/p95/p99, per-session
+#                  FPS, live sessions, dropped frames (server_metrics.py)
+# RECORD_SESSIONS=landmarks|jpeg records each session's processed frames (+ its /finish
+# summary) to outputs/sessions/*.lrrec; replay_session.py re-runs and diffs them offline.
+
+import asyncio
 import base64
+import struct
 import json
+import os
+import threading
 import time
 import uuid
-import random
-from dataclasses import dataclass, field
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional, Tuple, List
-from collections import deque
-from pathlib import Path
 
 import cv2
 import numpy as np
-import joblib
-import mediapipe as mp
 
-from fastapi import FastAPI
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
-
-VERSION = "realtime_server_bicep_contract_v1_2026-01-21"
-
-# ---------------- PATHS ----------------
-PROJECT_ROOT = Path(__file__).resolve().parents[1]  # liftright/ml
-MODEL_PKL = PROJECT_ROOT / "models" / "bicep_curl_ocsvm.pkl"
-OUT_DIR = PROJECT_ROOT / "outputs"
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-STATUS_JSON = OUT_DIR / "bicep_curl_status.json"  # optional debug mirror
-
-# ---------------- CONFIG (match golden standard) ----------------
-
-DRAW_TEXT_OVERLAY = False  # set True if you want cv2.putText inside the frame
-
-MIN_CONF = 0.50
-
-TOP_THR = 75
-BOT_THR = 155
-SMOOTH_N = 7
-MIN_REP_TIME = 0.35
-
-ELBOW_DRIFT_WARN = 0.35
-ELBOW_DRIFT_BAD  = 0.55
-
-CALIB_REPS = 5
-FATIGUE_WINDOW = 6
-
-ML_MARGIN = 0.030
-ML_LOW_STREAK_FOR_TIP = 3
-
-ML_SCORE_WINDOW = 8
-ML_REL_DROP = 0.020
-ML_MIN_SCORES_FOR_REL = 4
-
-FATIGUE_WARN_INDEX = 55
-FATIGUE_STOP_INDEX = 80
-FATIGUE_STOP_STREAK = 2
-
-GOOD_COLOR = (0, 255, 0)
-WARN_COLOR = (0, 255, 255)
-BAD_COLOR  = (0, 0, 255)
-TEXT_COLOR = (240, 240, 240)
-NEUTRAL_COLOR = (160, 160, 160)
-
-PRAISE_LINES = [
-    "Clean rep - controlled.",
-    "Solid rep - keep it steady.",
-    "Nice rep - good control.",
-    "Smooth rep.",
-    "Good rep - consistent tempo.",
-]
-
-GENERAL_TIPS = [
-    "Control the way down (slow eccentric).",
-    "Keep wrists neutral.",
-    "Relax the shoulders.",
-    "Breathe out as you curl.",
-    "Keep your upper arm steady.",
-]
-
-mp_pose = mp.solutions.pose
-mp_draw = mp.solutions.drawing_utils
+from realtime_common import new_pose, OUT_DIR, ExerciseSession, ExercisePipeline, session_summary
+from frame_ring import FrameRing
+from pose_workers import PoseProcessPool
+from session_record import open_recorder
+from server_metrics import METRICS, timed
+from status_mirror import STATUS_MIRROR
+from realtime_bicep_curl import BicepCurlPipeline
+from realtime_shoulder_press import ShoulderPressPipeline
+from realtime_lateral_raise import LateralRaisePipeline
+
+
+VERSION = "realtime_server_multi_exercise_v2_2026-10-17"
+
+# ---------------- CONFIG ----------------
+# One MediaPipe Pose per live session (smoothing state is per-trainee).
+# This is the max number of concurrent sessions one server process accepts
+# (POSE_POOL_SIZE env; /start beyond it returns a "Server at capacity" error).
+POSE_POOL_SIZE = max(1, int(os.environ.get("POSE_POOL_SIZE", "4")))
+
+# Session lifetime. A tab closed mid-set never calls /finish, so idle sessions
+# are auto-finalized by a background sweeper and their summary is kept for a
+# late /finish (and dumped to outputs/evicted/ so it is not lost).
+MAX_SESSIONS = POSE_POOL_SIZE
+SESSION_IDLE_TTL_S = 120.0
+LRU_MIN_IDLE_S = 10.0        # never evict a session that sent a frame this recently
+SWEEP_INTERVAL_S = 15.0
+FINISHED_KEEP = 256          # finalized-but-uncollected summaries kept in memory
+EVICTED_DIR = OUT_DIR / "evicted"
+
+# Cross-session pose micro-batching (POSE_BATCH_WAIT_MS env, off by default). A batch
+# closes when it has POSE_BATCH_MAX frames, one frame from every live session, or
+# POSE_BATCH_WAIT_MS after its first frame (the worst-case latency added to a frame).
+# MediaPipe takes one image per call, so batching only saves wake-ups; with 0 each
+# request thread runs its own pose.process (no dispatcher hop, no wait).
+# POSE_WORKERS bounds how many pose.process calls run at once either way.
+POSE_BATCH_MAX = 8
+POSE_BATCH_WAIT_MS = max(0.0, float(os.environ.get("POSE_BATCH_WAIT_MS", "0")))
+POSE_WORKERS = max(1, min(POSE_POOL_SIZE, os.cpu_count() or 1))
+
+# "thread": pose in this process (PosePool); "process": PoseProcessPool with
+# POSE_WORKERS worker processes, frames handed over through shared memory.
+POSE_EXECUTION = os.environ.get("POSE_EXECUTION", "thread").strip().lower()
+JPEG_QUALITY = 80
+
+# "landmarks" / "jpeg": record every session's processed frames to outputs/sessions/
+# (session_record.py) for replay_session.py; anything else = off.
+RECORD_SESSIONS = os.environ.get("RECORD_SESSIONS", "").strip().lower()
 
 
 # ----------------------------- UTIL -----------------------------
-def write_status(payload: Dict[str, Any]) -> None:
-    """Optional debug mirror like the golden standard file-based status."""
+def decode_jpeg_to_bgr(raw: bytes) -> Optional[np.ndarray]:
     try:
-        payload = dict(payload)
-        payload["timestamp"] = time.time()
-        STATUS_JSON.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        arr = np.frombuffer(raw, dtype=np.uint8)
+        return cv2.imdecode(arr, cv2.IMREAD_COLOR)
     except Exception:
-        pass
-
-
-def calculate_angle(a, b, c) -> float:
-    a = np.array(a, dtype=np.float32)
-    b = np.array(b, dtype=np.float32)
-    c = np.array(c, dtype=np.float32)
-    ba = a - b
-    bc = c - b
-    denom = (np.linalg.norm(ba) * np.linalg.norm(bc) + 1e-6)
-    cos_angle = float(np.dot(ba, bc) / denom)
-    cos_angle = float(np.clip(cos_angle, -1.0, 1.0))
-    return float(np.degrees(np.arccos(cos_angle)))
-
-
-def lm_xyv(landmarks, idx, w, h):
-    lm = landmarks[idx]
-    return (lm.x * w, lm.y * h, float(lm.visibility))
-
-
-def safe_div(a, b, eps=1e-6) -> float:
-    return float(a / (b + eps))
-
-
-def median_or(x, fallback: float) -> float:
-    x = [v for v in x if np.isfinite(v)]
-    return float(np.median(x)) if len(x) else float(fallback)
-
-
-def draw_skeleton_neutral(frame_bgr, pose_landmarks):
-    if pose_landmarks is None:
-        return
-    spec = mp_draw.DrawingSpec(color=NEUTRAL_COLOR, thickness=2, circle_radius=2)
-    mp_draw.draw_landmarks(
-        frame_bgr,
-        pose_landmarks,
-        mp_pose.POSE_CONNECTIONS,
-        landmark_drawing_spec=spec,
-        connection_drawing_spec=spec
-    )
-
-
-def draw_segment(frame_bgr, pose_landmarks, a, b, color, thickness=6):
-    if pose_landmarks is None:
-        return
-    lm = pose_landmarks.landmark
-    h, w = frame_bgr.shape[:2]
-    ax, ay = int(lm[a].x * w), int(lm[a].y * h)
-    bx, by = int(lm[b].x * w), int(lm[b].y * h)
-    cv2.line(frame_bgr, (ax, ay), (bx, by), color, thickness)
-
-
-def highlight_issues(frame_bgr, pose_landmarks, right_elbow_level: int, left_elbow_level: int):
-    if pose_landmarks is None:
-        return
-
-    if right_elbow_level > 0:
-        c = WARN_COLOR if right_elbow_level == 1 else BAD_COLOR
-        draw_segment(frame_bgr, pose_landmarks, mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_ELBOW, c)
-        draw_segment(frame_bgr, pose_landmarks, mp_pose.PoseLandmark.RIGHT_ELBOW, mp_pose.PoseLandmark.RIGHT_WRIST, c)
-
-    if left_elbow_level > 0:
-        c = WARN_COLOR if left_elbow_level == 1 else BAD_COLOR
-        draw_segment(frame_bgr, pose_landmarks, mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_ELBOW, c)
-        draw_segment(frame_bgr, pose_landmarks, mp_pose.PoseLandmark.LEFT_ELBOW, mp_pose.PoseLandmark.LEFT_WRIST, c)
+        return None
 
 
-def decode_dataurl_to_bgr(dataurl: str) -> Optional[np.ndarray]:
+def dataurl_to_jpeg(dataurl: str) -> Optional[bytes]:
     try:
         if dataurl.startswith("data:image"):
             b64 = dataurl.split(",", 1)[1]
         else:
             b64 = dataurl
-        raw = base64.b64decode(b64)
-        arr = np.frombuffer(raw, dtype=np.uint8)
-        img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-        return img
+        return base64.b64decode(b64)
     except Exception:
         return None
 
 
-def bgr_to_dataurl_jpeg(frame_bgr: np.ndarray, quality: int = 80) -> str:
+def decode_dataurl_to_bgr(dataurl: str) -> Optional[np.ndarray]:
+    raw = dataurl_to_jpeg(dataurl)
+    return None if raw is None else decode_jpeg_to_bgr(raw)
+
+
+def bgr_to_jpeg_bytes(frame_bgr: np.ndarray, quality: int = 80) -> bytes:
     ok, buf = cv2.imencode(".jpg", frame_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
     if not ok:
+        return b""
+    return buf.tobytes()
+
+
+def jpeg_to_dataurl(raw: bytes) -> str:
+    if not raw:
         return ""
-    b64 = base64.b64encode(buf.tobytes()).decode("utf-8")
+    b64 = base64.b64encode(raw).decode("utf-8")
     return "data:image/jpeg;base64," + b64
 
 
-# ----------------------------- FATIGUE -----------------------------
-def compute_fatigue_index(baseline, rom_med, dur_med, drift_med):
-    rom_ratio = safe_div(rom_med, baseline["rom"])
-    dur_ratio = safe_div(dur_med, baseline["duration"])
-    drift_delta = drift_med - baseline["drift"]
-
-    c_rom = np.clip((0.70 - rom_ratio) / 0.70, 0.0, 1.0)
-    c_dur = np.clip((dur_ratio - 1.25) / 1.25, 0.0, 1.0)
-    c_drift = np.clip(drift_delta / 0.25, 0.0, 1.0)
+def bgr_to_dataurl_jpeg(frame_bgr: np.ndarray, quality: int = 80) -> str:
+    return jpeg_to_dataurl(bgr_to_jpeg_bytes(frame_bgr, quality))
 
-    idx = (0.45 * c_rom + 0.25 * c_dur + 0.30 * c_drift) * 100.0
 
-    comps = {
-        "rom_ratio": float(rom_ratio),
-        "dur_ratio": float(dur_ratio),
-        "drift_delta": float(drift_delta),
-        "c_rom": float(c_rom),
-        "c_dur": float(c_dur),
-        "c_drift": float(c_drift),
-    }
-    return float(idx), comps
+# ----------------------------- POSE POOL -----------------------------
+class PosePool:
+    """
+    Bounded pool of mp_pose.Pose instances.
+    A session leases one slot on /start and keeps it until /finish, so
+    temporal smoothing never mixes landmarks from two trainees.
+    Each slot has its own lock, so different sessions run pose.process in parallel.
+    """
+    def __init__(self, size: int):
+        self.size = int(size)
+        self._poses: List[Optional[Any]] = [None] * self.size
+        self._locks = [threading.Lock() for _ in range(self.size)]
+        self._free = list(range(self.size))
+        self._guard = threading.Lock()
+
+    def acquire(self) -> Optional[int]:
+        with self._guard:
+            if not self._free:
+                return None
+            slot = self._free.pop(0)
+
+        with self._locks[slot]:
+            if self._poses[slot] is None:
+                self._poses[slot] = new_pose()
+            else:
+                # previous trainee's tracking state must not leak into this session
+                self._poses[slot].reset()
+        return slot
 
+    def release(self, slot: int) -> None:
+        if slot < 0 or slot >= self.size:
+            return
+        with self._guard:
+            if slot not in self._free:
+                self._free.append(slot)
 
-def top_set_issues(set_counts):
-    items = []
-    right_total = set_counts["elbow_bad_right"] + set_counts["elbow_warn_right"]
-    left_total  = set_counts["elbow_bad_left"] + set_counts["elbow_warn_left"]
+    def window(self, slot: int, w: int, h: int) -> Tuple[int, int, int, int]:
+        """Crop (x0, y0, x1, y1) of the slot's next w x h frame (pose_roi.RoiPose)."""
+        with self._locks[slot]:
+            return self._poses[slot].begin(w, h)
 
-    if right_total > 0:
-        items.append(("right elbow drift", right_total))
-    if left_total > 0:
-        items.append(("left elbow drift", left_total))
-    if set_counts["low_conf"] > 0:
-        items.append(("tracking low", set_counts["low_conf"]))
+    def process(self, slot: int, rgb: np.ndarray):
+        """rgb: the frame cropped to window()'s result; landmarks come back in full-frame coordinates."""
+        with self._locks[slot]:
+            return self._poses[slot].process_crop(rgb)
 
-    items.sort(key=lambda x: x[1], reverse=True)
-    return items[:2]
+    def in_use(self) -> int:
+        with self._guard:
+            return self.size - len(self._free)
 
 
-# ----------------------------- REP COUNTER -----------------------------
-class CurlRepCounter:
+class PoseBatcher:
     """
-    Golden standard + adds per-rep conf accumulation so we can report confidence_avg to DB.
+    Gathers pose.process requests from concurrent sessions into micro-batches.
+    process(slot, rgb) blocks the calling request thread until its frame's result
+    is ready. A dispatcher thread closes a batch (see POSE_BATCH_* in CONFIG) and
+    spreads it over `workers` threads; each frame still runs on its session's own
+    Pose slot, so tracking state never mixes between trainees.
+    MediaPipe's Pose graph takes one image per call, so a batch is a dispatch unit
+    (one wake-up, bounded parallelism), not a single batched tensor.
+    max_wait_ms = 0: pass-through, process() runs the frame on the calling thread
+    (at most `workers` at once) and no dispatcher is started.
     """
-    def __init__(self):
-        self.state = "down"
-        self.rep_count = 0
-        self.last_rep_t = 0.0
-        self.buf = deque(maxlen=SMOOTH_N)
-        self.reset_rep(time.time())
-
-    def reset_rep(self, t):
-        self.rep_start_t = t
-        self.angles = []
-        self.drift = []
-        self.confs = []
-
-        self.rep_tip_seen = False
-        self.rep_bad_seen = False
-        self.rep_tip_reason = ""
-        self.rep_bad_reason = ""
-
-    def mark_feedback(self, bad_list, tip_list):
-        if bad_list:
-            self.rep_bad_seen = True
-            if not self.rep_bad_reason:
-                self.rep_bad_reason = str(bad_list[0])
-        if tip_list:
-            self.rep_tip_seen = True
-            if not self.rep_tip_reason:
-                self.rep_tip_reason = str(tip_list[0])
-
-    def update(self, elbow_angle, elbow_drift_norm, conf_mean: float):
-        now = time.time()
-        self.buf.append(float(elbow_angle))
-        ang_s = float(np.median(self.buf))
-
-        self.angles.append(ang_s)
-        self.drift.append(float(elbow_drift_norm))
-        self.confs.append(float(conf_mean))
-
-        rep_done = False
-        rep_summary = None
-
-        if self.state == "down":
-            if ang_s <= TOP_THR:
-                self.state = "up"
-        else:
-            if ang_s >= BOT_THR:
-                if (now - self.last_rep_t) >= MIN_REP_TIME and len(self.angles) >= 6:
-                    self.rep_count += 1
-                    self.last_rep_t = now
-                    rep_done = True
-
-                    angles = np.array(self.angles, dtype=np.float32)
-                    drift  = np.array(self.drift, dtype=np.float32)
-                    confs  = np.array(self.confs, dtype=np.float32)
-
-                    rep_summary = {
-                        "rep": self.rep_count,
-                        "min_angle": float(angles.min()),
-                        "max_angle": float(angles.max()),
-                        "rom": float(angles.max() - angles.min()),
-                        "duration": float(now - self.rep_start_t),
-                        "elbow_drift_absmax": float(np.max(drift)),
-                        "confidence_avg": float(np.mean(confs)) if len(confs) else 0.0,
-
-                        "rep_tip_seen": bool(self.rep_tip_seen),
-                        "rep_bad_seen": bool(self.rep_bad_seen),
-                        "rep_tip_reason": str(self.rep_tip_reason),
-                        "rep_bad_reason": str(self.rep_bad_reason),
-                    }
-
-                self.state = "down"
-                self.reset_rep(now)
-
-        return ang_s, rep_done, rep_summary
-
-
-# ----------------------------- SESSION STATE -----------------------------
-@dataclass
-class BicepCurlSession:
-    session_token: str
-    user_id: int
-    log_id: int
-    exercise_type: str = "bicep_curl"
-
-    rep_counter: CurlRepCounter = field(default_factory=CurlRepCounter)
-
-    calib: list = field(default_factory=list)
-    baseline_ready: bool = False
-    baseline: Dict[str, Optional[float]] = field(default_factory=lambda: {"rom": None, "duration": None, "drift": None})
-    recent: deque = field(default_factory=lambda: deque(maxlen=FATIGUE_WINDOW))
-
-    set_counts: Dict[str, int] = field(default_factory=lambda: {
-        "elbow_warn_right": 0,
-        "elbow_bad_right": 0,
-        "elbow_warn_left": 0,
-        "elbow_bad_left": 0,
-        "low_conf": 0,
-    })
-
-    # ML
-    ml_low_streak: int = 0
-    score_hist: deque = field(default_factory=lambda: deque(maxlen=ML_SCORE_WINDOW))
-
-    # Fatigue
-    fatigue_stop_streak: int = 0
-    fatigue_index: float = 0.0
-    fatigue_since_rep: Optional[int] = None
-    fatigue_text: str = ""
-    fatigue_details: Dict[str, Any] = field(default_factory=dict)
-
-    # UI text
-    last_rep_text: str = "-"
-    last_rep_color: Tuple[int, int, int] = TEXT_COLOR
-
-    # Summary for /finish
-    reps: List[Dict[str, Any]] = field(default_factory=list)        # per rep metrics
-    feedback: List[Dict[str, Any]] = field(default_factory=list)    # feedback events
-    fatigue_flag: int = 0
-    stopped: bool = False
-
-    # last seen conf
-    conf_last: float = 0.0
-
-
-class BicepCurlPipeline:
-    def __init__(self):
-        bundle = joblib.load(MODEL_PKL)
-        self.scaler = bundle["scaler"]
-        self.model = bundle["model"]
-        self.feats = bundle["features"]
-        self.thr = float(bundle["threshold"])
-
-        self.pose = mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
-            enable_segmentation=False,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5,
-        )
-
-    def process(self, frame_bgr: np.ndarray, sess: BicepCurlSession) -> Tuple[np.ndarray, Dict[str, Any]]:
-        h, w = frame_bgr.shape[:2]
-        rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        res = self.pose.process(rgb)
-
-        feedback = "Tracking..."
-        fb_color = TEXT_COLOR
-
-        right_elbow_level = 0
-        left_elbow_level = 0
-
-        if res.pose_landmarks:
-            lm = res.pose_landmarks.landmark
-
-            LSH = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_SHOULDER,  w, h)
-            RSH = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_SHOULDER, w, h)
-            LEL = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_ELBOW,     w, h)
-            REL = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_ELBOW,    w, h)
-            LWR = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_WRIST,     w, h)
-            RWR = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_WRIST,    w, h)
-            LHP = lm_xyv(lm, mp_pose.PoseLandmark.LEFT_HIP,       w, h)
-            RHP = lm_xyv(lm, mp_pose.PoseLandmark.RIGHT_HIP,      w, h)
-
-            conf_mean = float(np.mean([LSH[2], RSH[2], LEL[2], REL[2], LWR[2], RWR[2], LHP[2], RHP[2]]))
-            sess.conf_last = conf_mean
-
-            draw_skeleton_neutral(frame_bgr, res.pose_landmarks)
-
-            if conf_mean >= MIN_CONF:
-                shoulder_width = abs(LSH[0] - RSH[0])
-                if shoulder_width < 2:
-                    shoulder_width = 2
-
-                right_angle = calculate_angle((RSH[0], RSH[1]), (REL[0], REL[1]), (RWR[0], RWR[1]))
-                left_angle  = calculate_angle((LSH[0], LSH[1]), (LEL[0], LEL[1]), (LWR[0], LWR[1]))
-
-                right_drift_norm = safe_div(abs(REL[0] - RSH[0]), shoulder_width)
-                left_drift_norm  = safe_div(abs(LEL[0] - LSH[0]), shoulder_width)
-
-                use_right_for_rep = (REL[2] >= LEL[2])
-                elbow_angle_for_rep = right_angle if use_right_for_rep else left_angle
-                elbow_drift_for_rep = right_drift_norm if use_right_for_rep else left_drift_norm
-
-                bad = []
-                tips = []
-
-                if right_drift_norm > ELBOW_DRIFT_BAD:
-                    right_elbow_level = 2
-                    sess.set_counts["elbow_bad_right"] += 1
-                elif right_drift_norm > ELBOW_DRIFT_WARN:
-                    right_elbow_level = 1
-                    sess.set_counts["elbow_warn_right"] += 1
-
-                if left_drift_norm > ELBOW_DRIFT_BAD:
-                    left_elbow_level = 2
-                    sess.set_counts["elbow_bad_left"] += 1
-                elif left_drift_norm > ELBOW_DRIFT_WARN:
-                    left_elbow_level = 1
-                    sess.set_counts["elbow_warn_left"] += 1
-
-                worst_elbow = max(right_elbow_level, left_elbow_level)
-                if worst_elbow == 2:
-                    if right_elbow_level == 2 and left_elbow_level == 2:
-                        bad.append("Elbow drifting a lot (both)")
-                    elif right_elbow_level == 2:
-                        bad.append("Elbow drifting a lot (right)")
-                    else:
-                        bad.append("Elbow drifting a lot (left)")
-                elif worst_elbow == 1:
-                    if right_elbow_level == 1 and left_elbow_level == 1:
-                        tips.append("Keep elbows steadier (both)")
-                    elif right_elbow_level == 1:
-                        tips.append("Keep elbow steadier (right)")
-                    else:
-                        tips.append("Keep elbow steadier (left)")
-
-                highlight_issues(frame_bgr, res.pose_landmarks, right_elbow_level, left_elbow_level)
-
-                if bad:
-                    feedback = "UNSAFE: " + bad[0]
-                    fb_color = BAD_COLOR
-                elif tips:
-                    feedback = "COACHING: " + tips[0]
-                    fb_color = WARN_COLOR
-                else:
-                    feedback = "STATUS: Stable"
-                    fb_color = GOOD_COLOR
-
-                # While "up", carry feedback into the rep summary (golden behavior)
-                if sess.rep_counter.state == "up":
-                    sess.rep_counter.mark_feedback(bad, tips)
-
-                elbow_s, rep_done, rep_sum = sess.rep_counter.update(
-                    elbow_angle_for_rep, elbow_drift_for_rep, conf_mean
-                )
-
-                if rep_done and rep_sum:
-                    # --- ML score ---
-                    drift_clip = min(rep_sum["elbow_drift_absmax"], 0.70)
-                    feat_map = {
-                        "rom": rep_sum["rom"],
-                        "duration": rep_sum["duration"],
-                        "elbow_drift_absmax": drift_clip,
-                    }
-                    if "trunk_absmax" in self.feats:
-                        feat_map["trunk_absmax"] = 0.0
-
-                    x = np.array([[feat_map[f] for f in self.feats]], dtype=np.float32)
-                    xs = self.scaler.transform(x)
-                    score = float(self.model.decision_function(xs)[0])
-
-                    sess.recent.append({
-                        "rom": rep_sum["rom"],
-                        "duration": rep_sum["duration"],
-                        "drift": drift_clip,
-                        "score": score
-                    })
-
-                    # --- Baseline ---
-                    if not sess.baseline_ready and not rep_sum["rep_bad_seen"]:
-                        sess.calib.append(sess.recent[-1])
-                        if len(sess.calib) >= CALIB_REPS:
-                            sess.baseline["rom"] = median_or([r["rom"] for r in sess.calib], 120.0)
-                            sess.baseline["duration"] = median_or([r["duration"] for r in sess.calib], 1.5)
-                            sess.baseline["drift"] = median_or([r["drift"] for r in sess.calib], 0.14)
-                            sess.baseline_ready = True
-
-                    # --- Fatigue ---
-                    sess.fatigue_text = ""
-                    sess.fatigue_details = {}
-                    if sess.baseline_ready and len(sess.recent) >= 4:
-                        last3 = list(sess.recent)[-3:]
-                        rom_med = median_or([r["rom"] for r in last3], sess.baseline["rom"])
-                        dur_med = median_or([r["duration"] for r in last3], sess.baseline["duration"])
-                        drift_med = median_or([r["drift"] for r in last3], sess.baseline["drift"])
-                        sess.fatigue_index, comps = compute_fatigue_index(sess.baseline, rom_med, dur_med, drift_med)
-                        sess.fatigue_details = comps
-
-                        if sess.fatigue_since_rep is None and sess.fatigue_index >= FATIGUE_WARN_INDEX:
-                            sess.fatigue_since_rep = int(rep_sum["rep"])
-
-                        if sess.fatigue_index >= FATIGUE_WARN_INDEX:
-                            sess.fatigue_text = f"FATIGUE WARNING: index {sess.fatigue_index:.0f}/100"
-
-                        if sess.fatigue_index >= FATIGUE_STOP_INDEX:
-                            sess.fatigue_stop_streak += 1
-                        else:
-                            sess.fatigue_stop_streak = 0
-
-                        if sess.fatigue_stop_streak >= FATIGUE_STOP_STREAK:
-                            sess.fatigue_flag = 1
-                            sess.stopped = True
-
-                            since = sess.fatigue_since_rep if sess.fatigue_since_rep is not None else int(rep_sum["rep"])
-                            issues = top_set_issues(sess.set_counts)
-                            issues_str = ", ".join([f"{n} x{c}" for n, c in issues]) if issues else "no dominant issue"
-                            msg = (
-                                f"Stop recommended. Strong fatigue detected since Rep {since}. "
-                                f"Top issues: {issues_str}. Please rest or reduce weight."
-                            )
-                            sess.feedback.append({
-                                "feedback_type": "fatigue",
-                                "severity": "warning",
-                                "feedback_text": msg,
-                                "meta": {"since_rep": int(since), "top_issues": issues, "fatigue_index": float(sess.fatigue_index)}
-                            })
-
-                    # --- ML softness (rolling baseline) ---
-                    sess.score_hist.append(float(score))
-                    use_relative = (len(sess.score_hist) >= ML_MIN_SCORES_FOR_REL)
-                    score_ref = float(np.median(sess.score_hist)) if use_relative else float(self.thr)
-
-                    ml_low_rel = use_relative and (score < (score_ref - ML_REL_DROP))
-                    ml_low_abs = (score < (self.thr - ML_MARGIN))
-                    ml_low = ml_low_rel if use_relative else ml_low_abs
-
-                    sess.ml_low_streak = sess.ml_low_streak + 1 if ml_low else 0
-                    ml_tip = (sess.ml_low_streak >= ML_LOW_STREAK_FOR_TIP)
-
-                    rep_tips = []
-                    if sess.fatigue_text:
-                        rep_tips.append("Fatigue trend - consider rest or lighter weight")
-                    if sess.baseline_ready:
-                        if rep_sum["rom"] < 0.55 * sess.baseline["rom"]:
-                            rep_tips.append("ROM is dropping - lighten weight or rest")
-                    else:
-                        if rep_sum["rom"] < 45:
-                            rep_tips.append("Try a fuller range of motion (if comfortable)")
-                    if sess.baseline_ready and rep_sum["duration"] > 1.8 * sess.baseline["duration"]:
-                        rep_tips.append("Tempo slowing - stay controlled")
-                    if ml_tip:
-                        rep_tips.append("Consistency drifting (ML)")
-
-                    rep_bad_reason = rep_sum.get("rep_bad_reason", "")
-                    rep_tip_reason = rep_sum.get("rep_tip_reason", "")
-
-                    rep_n = int(rep_sum["rep"])
-                    reasons: List[str] = []
-                    if rep_sum.get("rep_bad_seen", False):
-                        reasons.append(rep_bad_reason or "unsafe form")
-                    if rep_sum.get("rep_tip_seen", False) and rep_tip_reason:
-                        reasons.append(rep_tip_reason)
-                    for t in rep_tips[:2]:
-                        reasons.append(t)
-
-                    # last_rep_text (golden style)
-                    if rep_sum.get("rep_bad_seen", False):
-                        sess.last_rep_text = f"Rep {rep_n}: UNSAFE - {rep_bad_reason or 'adjust form'}"
-                        sess.last_rep_color = BAD_COLOR
-                    else:
-                        any_tip = rep_sum.get("rep_tip_seen", False) or ml_tip
-                        if any_tip:
-                            reason = rep_tip_reason if rep_tip_reason else (rep_tips[0] if rep_tips else "small adjustment")
-                            sess.last_rep_text = f"Rep {rep_n}: COACHING - {reason}"
-                            sess.last_rep_color = WARN_COLOR
-                        else:
-                            msg = random.choice(PRAISE_LINES)
-                            if random.random() < 0.40:
-                                msg += " " + random.choice(GENERAL_TIPS)
-                            sess.last_rep_text = f"Rep {rep_n}: {msg}"
-                            sess.last_rep_color = GOOD_COLOR
-
-                    # ---- Rep label rules ----
-                    # bad (unsafe) overrides everything
-                    rep_bad = bool(rep_sum.get("rep_bad_seen", False))
-
-                    # warning = not bad, but any tip happened DURING rep OR ML tip OR any rep_tips (tempo/ROM/fatigue)
-                    rep_warn = (not rep_bad) and (
-                        bool(rep_sum.get("rep_tip_seen", False)) or
-                        bool(ml_tip) or
-                        (len(rep_tips) > 0)
-                    )
-
-                    # ---- Rep label rules (DB-safe) ----
-                    rep_bad = bool(rep_sum.get("rep_bad_seen", False))
-                    rep_warn = (not rep_bad) and (
-                        bool(rep_sum.get("rep_tip_seen", False)) or
-                        bool(ml_tip) or
-                        (len(rep_tips) > 0)
-                    )
-
-                    # DB stays binary: good/bad
-                    form_label_db = "bad" if rep_bad else "good"
-
-                    # UI-friendly label lives in meta (good/warning/bad)
-                    label_ui = "bad" if rep_bad else ("warning" if rep_warn else "good")
-
-                    # "anomaly_score" in your DB schema can store the OCSVM decision_function
-                    anomaly_score = float(score)
-
-                    sess.reps.append({
-                        "rep_index": rep_n,
-                        "duration_ms": int(round(rep_sum["duration"] * 1000)),
-                        "rom_score": float(rep_sum["rom"]),
-                        "trunk_sway": 0.0,  # bicep curl uses elbow drift; trunk placeholder
-                        "confidence_avg": float(rep_sum.get("confidence_avg", 0.0)),
-                        "form_label": form_label_db,
-                        "anomaly_score": anomaly_score,
-                        "meta": {
-                            "label_ui": label_ui,           # <-- NEW (use this in your results table)
-                            "is_warning": bool(rep_warn),    # <-- NEW
-                            "elbow_drift_absmax": float(drift_clip),
-                            "rep_tip_seen": bool(rep_sum.get("rep_tip_seen", False)),
-                            "rep_bad_seen": bool(rep_sum.get("rep_bad_seen", False)),
-                            "reasons": reasons[:4],
-                            "fatigue_index": float(sess.fatigue_index),
-                        }
-
-                    })
-
-                    # feedback table rows (optional)
-                    if rep_sum.get("rep_bad_seen", False):
-                        sess.feedback.append({
-                            "feedback_type": "posture",
-                            "severity": "danger",
-                            "feedback_text": rep_bad_reason or "Unsafe form detected",
-                            "meta": {"rep": rep_n}
-                        })
-                    elif reasons:
-                        # coaching/info
-                        sess.feedback.append({
-                            "feedback_type": "posture",
-                            "severity": "warning" if ("COACHING" in sess.last_rep_text) else "info",
-                            "feedback_text": reasons[0],
-                            "meta": {"rep": rep_n, "all": reasons[:4]}
-                        })
-
-                    # optional debug status mirror
-                    issues = top_set_issues(sess.set_counts)
-                    issues_str = ", ".join([f"{n} x{c}" for n, c in issues]) if issues else "no major issues"
-                    write_status({
-                        "state": "stop" if sess.stopped else "running",
-                        "exercise": "bicep_curl",
-                        "rep_now": rep_n,
-                        "last_rep_text": sess.last_rep_text,
-                        "last_rep_reasons": reasons[:4],
-                        "score": float(score),
-                        "threshold": float(self.thr),
-                        "fatigue_index": float(sess.fatigue_index),
-                        "fatigue_warning": bool(sess.fatigue_text),
-                        "message": "Active",
-                        "baseline_ready": bool(sess.baseline_ready),
-                        "set_summary": sess.set_counts,
-                        "set_top_issues": issues,
-                        "set_top_issues_text": issues_str,
-                        "recent_reps": [],  # you can add if you want
-                        "fatigue_details": sess.fatigue_details,
-                    })
+    def __init__(self, pool: PosePool, workers: int, max_batch: int, max_wait_ms: float):
+        self.pool = pool
+        self.workers = max(1, int(workers))
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._pending: List[Tuple[int, Any, Future, float]] = []
+        self._cond = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._direct = threading.BoundedSemaphore(self.workers) if self.max_wait_s <= 0 else None
+
+        self.batches = 0
+        self.frames = 0
+
+    def start(self) -> None:
+        if self._direct is not None:
+            return
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stop = False
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pose-worker")
+            self._thread = threading.Thread(target=self._dispatch_loop, name="pose-batcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stop = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def process(self, slot: int, rgb: np.ndarray):
+        if self._direct is not None:
+            t_in = time.perf_counter()
+            with self._direct:
+                t0 = time.perf_counter()
+                METRICS.observe("stage", "pose_queue", t0 - t_in)
+                res = self.pool.process(slot, rgb)
+                METRICS.observe("stage", "pose_call", time.perf_counter() - t0)
+            with self._cond:
+                self.batches += 1
+                self.frames += 1
+            return res
+        if self._thread is None:
+            self.start()
+        fut: Future = Future()
+        with self._cond:
+            self._pending.append((slot, rgb, fut, time.perf_counter()))
+            self._cond.notify_all()
+        return fut.result()
+
+    def mean_batch(self) -> float:
+        return self.frames / self.batches if self.batches else 0.0
+
+    def _take_batch(self) -> List[Tuple[int, Any, Future, float]]:
+        with self._cond:
+            while not self._pending and not self._stop:
+                self._cond.wait()
+            if not self._pending:
+                return []
+            deadline = time.monotonic() + self.max_wait_s
+            while not self._stop:
+                # every live session already has a frame in: nobody else to wait for
+                full = min(self.max_batch, max(1, self.pool.in_use()))
+                left = deadline - time.monotonic()
+                if len(self._pending) >= full or left <= 0:
+                    break
+                self._cond.wait(left)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+        return batch
+
+    def _run(self, items: List[Tuple[int, Any, Future, float]]) -> None:
+        for slot, rgb, fut, t_in in items:
+            t0 = time.perf_counter()
+            METRICS.observe("stage", "pose_queue", t0 - t_in)
+            try:
+                fut.set_result(self.pool.process(slot, rgb))
+                METRICS.observe("stage", "pose_call", time.perf_counter() - t0)
+            except BaseException as e:
+                fut.set_exception(e)
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            self.batches += 1
+            self.frames += len(batch)
+            # round-robin the batch over the workers
+            n = min(self.workers, len(batch))
+            for i in range(n):
+                self._executor.submit(self._run, batch[i::n])
+
+
+class FrameInbox:
+    """
+    Single-slot, latest-frame-wins inbox for one session.
+    submit(work) runs work() once nothing else is processing for the session.
+    A frame still waiting when a newer one arrives is dropped: its submit()
+    returns (False, None) right away instead of queueing behind the backlog.
+    After close() every frame is dropped.
+    """
+    def __init__(self, sess: ExerciseSession):
+        self.sess = sess
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._waiting: Optional[Dict[str, bool]] = None
+
+    def submit(self, work) -> Tuple[bool, Any]:
+        ticket = {"dropped": False}
+        with self._cond:
+            if self._closed:
+                return False, None
+            if self._waiting is not None:
+                self._waiting["dropped"] = True
+                self.sess.frames_dropped += 1
+                METRICS.inc("frames_dropped")
+            self._waiting = ticket
+            self._cond.notify_all()
+
+            while self._busy and not ticket["dropped"]:
+                self._cond.wait()
+            if ticket["dropped"]:
+                return False, None
+
+            self._waiting = None
+            self._busy = True
+
+        try:
+            return True, work()
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        """Stop taking frames: drop the waiting one and wait until the one in progress is done."""
+        with self._cond:
+            self._closed = True
+            if self._waiting is not None:
+                self._waiting["dropped"] = True
+                self._waiting = None
+            self._cond.notify_all()
+            while self._busy:
+                self._cond.wait()
+
+
+# ----------------------------- SESSIONS -----------------------------
+class SessionStore:
+    """
+    Live sessions in LRU order (least recently seen first) + summaries of
+    sessions that were finalized without a /finish call.
+    Closing a session always releases its PosePool slot, once its in-flight
+    frame (if any) is through: a new session may reset the slot's Pose right away.
+    """
+    def __init__(self, max_sessions: int, pose_pool: "PosePool"):
+        self.max_sessions = int(max_sessions)
+        self.pose_pool = pose_pool
+        self._live: "OrderedDict[str, ExerciseSession]" = OrderedDict()
+        self._finished: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted_total = 0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._live
+
+    def get(self, token: str) -> Optional[ExerciseSession]:
+        """Look up a live session and mark it as just used."""
+        with self._lock:
+            sess = self._live.get(token)
+            if sess is not None:
+                sess.last_seen = time.time()
+                self._live.move_to_end(token)
+            return sess
+
+    def live(self) -> List[ExerciseSession]:
+        with self._lock:
+            return list(self._live.values())
+
+    def peek(self, token: str) -> Optional[ExerciseSession]:
+        """Look up a live session without counting it as activity."""
+        with self._lock:
+            return self._live.get(token)
+
+    def add(self, sess: ExerciseSession) -> None:
+        with self._lock:
+            self._live[sess.session_token] = sess
+
+    def make_room(self) -> bool:
+        """At capacity: evict the least recently used session if it has gone quiet."""
+        with self._lock:
+            if len(self._live) < self.max_sessions:
+                return True
+            token, sess = next(iter(self._live.items()))
+            if time.time() - sess.last_seen < LRU_MIN_IDLE_S:
+                return False
+            self._live.pop(token)
+        self._finalize_evicted(sess, "lru")
+        return True
+
+    def finish(self, token: str) -> Optional[Dict[str, Any]]:
+        """/finish: finalize a live session, or hand back an already-evicted summary."""
+        with self._lock:
+            sess = self._live.pop(token, None)
+            if sess is None:
+                return self._finished.pop(token, None)
+        self._close(sess)
+        self.pose_pool.release(sess.pose_slot)
+        METRICS.forget(token)
+        payload = session_summary(sess)
+        if sess.recorder is not None:
+            sess.recorder.finish(payload)
+        return payload
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [t for t, s in self._live.items() if now - s.last_seen > SESSION_IDLE_TTL_S]
+            evicted = [self._live.pop(t) for t in stale]
+        for sess in evicted:
+            self._finalize_evicted(sess, "idle")
+        return len(evicted)
+
+    @staticmethod
+    def _close(sess: ExerciseSession) -> None:
+        if sess.inbox is not None:
+            sess.inbox.close()
+
+    def _finalize_evicted(self, sess: ExerciseSession, reason: str) -> None:
+        self._close(sess)
+        self.pose_pool.release(sess.pose_slot)
+        METRICS.forget(sess.session_token)
+        payload = session_summary(sess)
+        if sess.recorder is not None:
+            sess.recorder.finish(payload)
+        with self._lock:
+            self._finished[sess.session_token] = payload
+            while len(self._finished) > FINISHED_KEEP:
+                self._finished.popitem(last=False)
+            self.evicted_total += 1
+
+        try:
+            EVICTED_DIR.mkdir(parents=True, exist_ok=True)
+            dump = dict(payload)
+            dump.update({
+                "session_token": sess.session_token,
+                "log_id": sess.log_id,
+                "user_id": sess.user_id,
+                "exercise_type": sess.exercise_type,
+                "evicted_reason": reason,
+                "evicted_at": time.time(),
+            })
+            (EVICTED_DIR / f"{sess.log_id}_{sess.session_token}.json").write_text(json.dumps(dump), encoding="utf-8")
+        except Exception:
+            pass
+
+        PIPELINES[sess.exercise_type].write_status(sess, {
+            "state": "finished", "exercise": sess.exercise_type,
+            "message": f"Session evicted ({reason})", "reps_total": payload["reps_total"]
+        })
+
+
+def sweeper_loop(stop: threading.Event) -> None:
+    while not stop.wait(SWEEP_INTERVAL_S):
+        SESSIONS.sweep()
+
+
+# Spawned pose workers (POSE_EXECUTION=process) re-import this module as __mp_main__ when
+# the server runs as a script. They only need pose_workers, so the bundles, the shared-memory
+# frame ring and the pools are built in the server process only.
+if __name__ != "__mp_main__":
+    PIPELINES: Dict[str, ExercisePipeline] = {
+        "bicep_curl": BicepCurlPipeline(),
+        "shoulder_press": ShoulderPressPipeline(),
+        "lateral_raise": LateralRaisePipeline(),
+    }
+    if POSE_EXECUTION == "process":
+        # one shared-memory frame slot per possible in-flight frame (one per live session);
+        # thread mode has no other process to share frames with
+        POSE_POOL = PoseProcessPool(POSE_POOL_SIZE, POSE_WORKERS, FrameRing(POSE_POOL_SIZE))
+    else:
+        POSE_POOL = PosePool(POSE_POOL_SIZE)
+    POSE_BATCHER = PoseBatcher(POSE_POOL, POSE_WORKERS, POSE_BATCH_MAX, POSE_BATCH_WAIT_MS)
+    SESSIONS = SessionStore(MAX_SESSIONS, POSE_POOL)
+
+
+def run_pipeline(img: np.ndarray, sess: ExerciseSession, draw: bool = True,
+                 ts: Optional[float] = None) -> Tuple[np.ndarray, Dict[str, Any], Dict[str, Any]]:
+    x0, y0, x1, y1 = POSE_POOL.window(sess.pose_slot, img.shape[1], img.shape[0])
+    with METRICS.time("cvtcolor"):
+        rgb = cv2.cvtColor(img[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+    with METRICS.time("pose"):
+        res = POSE_BATCHER.process(sess.pose_slot, rgb)
+    return PIPELINES[sess.exercise_type].process(img, res, sess, draw=draw, ts=ts)
+
+
+def run_jpeg(raw: bytes, sess: ExerciseSession, draw: bool = True,
+             ts: Optional[float] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], bytes]]:
+    """
+    One JPEG frame through pose + the session's pipeline, in this process or in its pose worker.
+    Returns (status, overlay, annotated JPEG or b"" when draw=False), or None if it doesn't decode.
+    """
+    pipe = PIPELINES[sess.exercise_type]
+    if POSE_EXECUTION == "process":
+        with METRICS.time("worker_frame"):
+            pf = POSE_BATCHER.process(sess.pose_slot, raw)
+        for stage, dt in pf.timings.items():
+            METRICS.observe("stage", stage, dt)
+        if not pf.ok:
+            return None
+        status, overlay, marks = pipe.track(pf.lms, pf.w, pf.h, sess, ts=ts, F=pf.F)
+        METRICS.frame_done(sess.session_token)
+        if sess.recorder is not None:
+            sess.recorder.jpeg(sess.frame_t, raw)
+        if not draw:
+            return status, overlay, b""
+        with METRICS.time("worker_render"):
+            return status, overlay, POSE_POOL.render(sess.pose_slot, marks, JPEG_QUALITY)
+
+    with METRICS.time("imdecode"):
+        img = decode_jpeg_to_bgr(raw)
+    if img is None:
+        return None
+    out_img, status, overlay = run_pipeline(img, sess, draw=draw, ts=ts)
+    METRICS.frame_done(sess.session_token)
+    if sess.recorder is not None:
+        sess.recorder.jpeg(sess.frame_t, raw)
+    if not draw:
+        return status, overlay, b""
+    with METRICS.time("jpeg_encode"):
+        return status, overlay, bgr_to_jpeg_bytes(out_img, quality=JPEG_QUALITY)
 
-            else:
-                sess.set_counts["low_conf"] += 1
-                feedback = f"Tracking quality low ({conf_mean:.2f})"
-                fb_color = WARN_COLOR
-        else:
-            # no landmarks
-            sess.set_counts["low_conf"] += 1
-            feedback = "No pose detected"
-            fb_color = WARN_COLOR
-
-        # overlays (match golden style positions)
-        if DRAW_TEXT_OVERLAY:
-            cv2.putText(frame_bgr, feedback, (10, h - 110),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, fb_color, 2)
-            if sess.fatigue_text:
-                cv2.putText(frame_bgr, sess.fatigue_text, (10, h - 75),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, WARN_COLOR, 2)
-            cv2.putText(frame_bgr, sess.last_rep_text, (10, h - 35),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, sess.last_rep_color, 2)
-
-        issues = top_set_issues(sess.set_counts)
-        issues_str = ", ".join([f"{n} x{c}" for n, c in issues]) if issues else "no major issues"
-
-        status = {
-            "state": "stop" if sess.stopped else "running",
-            "exercise": "bicep_curl",
-            "rep_now": int(sess.rep_counter.rep_count),
-            "last_rep_text": sess.last_rep_text,
-            "fatigue_index": float(sess.fatigue_index),
-            "fatigue_warning": bool(sess.fatigue_text),
-            "baseline_ready": bool(sess.baseline_ready),
-            "set_top_issues_text": issues_str,
-            "conf": float(sess.conf_last),
-        }
 
-        return frame_bgr, status
+def ms_to_s(ts_ms: Optional[float]) -> Optional[float]:
+    return None if ts_ms is None else float(ts_ms) / 1000.0
 
 
-PIPE = BicepCurlPipeline()
-SESSIONS: Dict[str, BicepCurlSession] = {}
+# ----------------------------- FASTAPI CONTRACT -----------------------------
+RESPONSE_MODES = ("annotated", "landmarks")
 
 
-# ----------------------------- FASTAPI CONTRACT -----------------------------
 class StartReq(BaseModel):
     exercise_type: str
     log_id: int
     user_id: int
+    response_mode: str = "annotated"
 
 
 class FrameReq(BaseModel):
     session_token: str
     frame_dataurl: str
+    capture_ts_ms: Optional[float] = None  # client capture time (ms); rep timing uses it when present
 
 
 class FinishReq(BaseModel):
     session_token: str
 
 
-app = FastAPI(title="LiftRight Realtime Server", version=VERSION)
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    stop = threading.Event()
+    sweeper = threading.Thread(target=sweeper_loop, args=(stop,), name="session-sweeper", daemon=True)
+    sweeper.start()
+    if isinstance(POSE_POOL, PoseProcessPool):
+        await run_in_threadpool(POSE_POOL.start)
+    POSE_BATCHER.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        POSE_BATCHER.stop()
+        if isinstance(POSE_POOL, PoseProcessPool):
+            POSE_POOL.close()
+        STATUS_MIRROR.flush()
+
+
+app = FastAPI(title="LiftRight Realtime Server", version=VERSION, lifespan=lifespan)
 
 # dev-safe CORS (PHP calls this server via curl, but browser calls PHP; still safe to allow)
 app.add_middleware(
@@ -750,77 +603,246 @@ app.add_middleware(
 
 @app.get("/health")
 def health():
-    return {"ok": True, "version": VERSION}
+    return {
+        "ok": True,
+        "version": VERSION,
+        "sessions": len(SESSIONS),
+        "sessions_evicted": SESSIONS.evicted_total,
+        "status_mirror": {"writes": STATUS_MIRROR.writes, "coalesced": STATUS_MIRROR.coalesced},
+        "pose_pool": {"size": POSE_POOL.size, "in_use": POSE_POOL.in_use(), "execution": POSE_EXECUTION},
+        "pose_batches": {"batches": POSE_BATCHER.batches, "frames": POSE_BATCHER.frames,
+                         "mean_size": round(POSE_BATCHER.mean_batch(), 2), "workers": POSE_BATCHER.workers},
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint."""
+    live = SESSIONS.live()
+    gauges = [
+        ("live_sessions", "Live sessions", {}, len(live)),
+        ("sessions_evicted", "Sessions auto-finalized (idle / LRU) since start", {}, SESSIONS.evicted_total),
+        ("pose_slots_in_use", "Pose slots leased", {}, POSE_POOL.in_use()),
+        ("pose_batch_mean_size", "Mean frames per pose micro-batch", {}, POSE_BATCHER.mean_batch()),
+    ]
+    gauges += [("session_fps", "Processed frames per second (last frames)",
+                {"session": s.session_token, "exercise": s.exercise_type}, METRICS.fps(s.session_token)) for s in live]
+    gauges += [("session_frames_dropped", "Frames dropped (latest-wins) in the session",
+                {"session": s.session_token, "exercise": s.exercise_type}, s.frames_dropped) for s in live]
+    gauges += [("session_frames_processed", "Frames processed in the session",
+                {"session": s.session_token, "exercise": s.exercise_type}, s.frames_processed) for s in live]
+    return PlainTextResponse(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/start")
+@timed("/start")
 def start(req: StartReq):
     ex = (req.exercise_type or "").strip().lower()
-    if ex != "bicep_curl":
-        return {"ok": False, "error": "This server build supports bicep_curl only."}
+    pipe = PIPELINES.get(ex)
+    if pipe is None:
+        return {"ok": False, "error": f"Unsupported exercise_type. Expected one of {list(PIPELINES)}."}
+
+    mode = (req.response_mode or "annotated").strip().lower()
+    if mode not in RESPONSE_MODES:
+        return {"ok": False, "error": f"response_mode must be one of {list(RESPONSE_MODES)}."}
+
+    if not SESSIONS.make_room():
+        return {"ok": False, "error": f"Server at capacity ({SESSIONS.max_sessions} live sessions)."}
+
+    slot = POSE_POOL.acquire()
+    if slot is None:
+        return {"ok": False, "error": f"Server at capacity ({POSE_POOL.size} live sessions)."}
 
     token = uuid.uuid4().hex
-    sess = BicepCurlSession(
+    sess = pipe.new_session(
         session_token=token,
         user_id=int(req.user_id),
         log_id=int(req.log_id),
-        exercise_type="bicep_curl",
+        pose_slot=slot,
+        response_mode=mode,
     )
-    SESSIONS[token] = sess
+    sess.inbox = FrameInbox(sess)
+    sess.recorder = open_recorder(sess, RECORD_SESSIONS)
+    SESSIONS.add(sess)
 
-    write_status({"state": "running", "exercise": "bicep_curl", "message": "Session started", "log_id": sess.log_id})
+    pipe.write_status(sess, {"state": "running", "exercise": ex, "message": "Session started", "log_id": sess.log_id})
     return {"session_token": token}
 
 
+def dropped_reply(sess: ExerciseSession) -> Dict[str, Any]:
+    """Reply for a frame superseded by a newer one before it was processed."""
+    status = dict(sess.status_last or {"state": "running", "exercise": sess.exercise_type})
+    status["frames_processed"] = int(sess.frames_processed)
+    status["frames_dropped"] = int(sess.frames_dropped)
+    return {"dropped": True, "status": status}
+
+
 @app.post("/frame")
+@timed("/frame")
 def frame(req: FrameReq):
     token = (req.session_token or "").strip()
     sess = SESSIONS.get(token)
     if not sess:
         return {"ok": False, "error": "Invalid session_token."}
 
-    img = decode_dataurl_to_bgr(req.frame_dataurl)
-    if img is None:
-        return {"ok": False, "error": "Could not decode frame_dataurl."}
+    def work():
+        with METRICS.time("b64_decode"):
+            raw = dataurl_to_jpeg(req.frame_dataurl)
+        draw = sess.response_mode != "landmarks"
+        out = run_jpeg(raw, sess, draw=draw, ts=ms_to_s(req.capture_ts_ms)) if raw else None
+        if out is None:
+            return {"ok": False, "error": "Could not decode frame_dataurl."}
+        status, overlay, jpeg = out
+
+        if not draw:
+            return {
+                "landmarks": overlay["landmarks"],
+                "highlights": overlay["highlights"],
+                "status": status
+            }
+
+        with METRICS.time("b64_encode"):
+            out = jpeg_to_dataurl(jpeg)
+        return {
+            "annotated_frame_dataurl": out,
+            "status": status
+        }
 
-    annotated, status = PIPE.process(img, sess)
-    out = bgr_to_dataurl_jpeg(annotated, quality=80)
+    done, reply = sess.inbox.submit(work)
+    return reply if done else dropped_reply(sess)
 
-    return {
-        "annotated_frame_dataurl": out,
-        "status": status
-    }
 
+WS_TS_HEADER = struct.Struct("<d")  # optional per-message prefix: capture time, float64 ms
 
-@app.post("/finish")
-def finish(req: FinishReq):
-    token = (req.session_token or "").strip()
-    sess = SESSIONS.pop(token, None)
+
+def process_ws_frame(raw: bytes, sess: ExerciseSession, annotated: bool, with_ts: bool = False) -> Tuple[Dict[str, Any], bytes]:
+    ts = None
+    if with_ts:
+        if len(raw) <= WS_TS_HEADER.size:
+            return {"ok": False, "error": "Frame too short for capture timestamp header."}, b""
+        ts = ms_to_s(WS_TS_HEADER.unpack_from(raw)[0])
+        raw = raw[WS_TS_HEADER.size:]
+
+    out = run_jpeg(raw, sess, draw=annotated, ts=ts)
+    if out is None:
+        return {"ok": False, "error": "Could not decode JPEG frame."}, b""
+
+    status, overlay, jpeg = out
+    if not annotated:
+        return {"ok": True, "status": status, "annotated": False, **overlay}, b""
+    return {"ok": True, "status": status, "annotated": bool(jpeg)}, jpeg
+
+
+@app.websocket("/ws/{session_token}")
+async def ws_frames(websocket: WebSocket, session_token: str):
+    """
+    Binary streaming mode: the client sends raw JPEG bytes per message.
+    Each processed frame gets a JSON status message back. In annotated mode the
+    annotated JPEG follows as a separate binary message; otherwise the JSON
+    carries landmarks + highlights. Defaults to the session's response_mode,
+    ?annotated=0/1 overrides it.
+    Frames that arrive while one is being processed are not queued: only the
+    newest is kept, older ones are counted in status.frames_dropped.
+    """
+    token = (session_token or "").strip()
+
+    await websocket.accept()
+    sess = SESSIONS.get(token)
     if not sess:
-        return {"ok": False, "error": "Invalid session_token."}
+        await websocket.send_json({"ok": False, "error": "Invalid session_token."})
+        await websocket.close(code=1008)
+        return
+
+    default = "1" if sess.response_mode == "annotated" else "0"
+    annotated = websocket.query_params.get("annotated", default) not in ("0", "false", "no")
+    with_ts = websocket.query_params.get("ts", "0") not in ("0", "false", "no")
+
+    latest: Dict[str, Any] = {"raw": None, "closed": False}
+    ready = asyncio.Event()
+    send_lock = asyncio.Lock()
+
+    async def reader():
+        try:
+            while True:
+                msg = await websocket.receive()
+                if msg.get("type") == "websocket.disconnect":
+                    break
+                raw = msg.get("bytes")
+                if not raw:
+                    async with send_lock:
+                        await websocket.send_json({"ok": False, "error": "Expected binary JPEG frame."})
+                    continue
+                if latest["raw"] is not None:
+                    sess.frames_dropped += 1
+                    METRICS.inc("frames_dropped")
+                latest["raw"] = raw
+                ready.set()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            latest["closed"] = True
+            ready.set()
+
+    reader_task = asyncio.create_task(reader())
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            raw, latest["raw"] = latest["raw"], None
+            if latest["closed"]:
+                break
+            if raw is None:
+                continue
+
+            live = SESSIONS.get(token)
+            if not live:
+                # /finish was called while the socket was still open
+                async with send_lock:
+                    await websocket.send_json({"ok": False, "error": "Session finished."})
+                    await websocket.close(code=1000)
+                break
+
+            t0 = time.perf_counter()
+            done, out = await run_in_threadpool(
+                live.inbox.submit, lambda: process_ws_frame(raw, live, annotated, with_ts)
+            )
+            METRICS.observe("request", "ws_frame", time.perf_counter() - t0)
+            reply, jpeg = out if done else (dropped_reply(live), b"")
+            async with send_lock:
+                await websocket.send_json(reply)
+                if jpeg:
+                    await websocket.send_bytes(jpeg)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        reader_task.cancel()
 
-    reps_total = len(sess.reps)
-    reps_bad = sum(1 for r in sess.reps if (r.get("form_label") == "bad"))
-    reps_warn = sum(1 for r in sess.reps if bool((r.get("meta") or {}).get("is_warning")))
-    # warnings count as "good" (not unsafe)
-    reps_good = reps_total - reps_bad
 
-    # form_error_count: count posture feedback "danger" entries
-    form_error_count = sum(1 for f in sess.feedback if f.get("severity") == "danger")
+@app.get("/status/{session_token}")
+def session_status(session_token: str):
+    """In-memory status for a live session (no disk round-trip, doesn't refresh its idle timer)."""
+    sess = SESSIONS.peek((session_token or "").strip())
+    if not sess:
+        return {"ok": False, "error": "Invalid session_token."}
+    return {"ok": True, "status": sess.status_last, "last_update": sess.mirror_last}
 
-    payload = {
-    "reps_total": int(reps_total),
-    "reps_good": int(reps_good),
-    "reps_bad": int(reps_bad),
-    "reps_warn": int(reps_warn),
-    "form_error_count": int(form_error_count),
-    "fatigue_flag": int(sess.fatigue_flag),
-    "reps": sess.reps,
-    "feedback": sess.feedback,
-    }   
 
+@app.post("/finish")
+@timed("/finish")
+def finish(req: FinishReq):
+    token = (req.session_token or "").strip()
+    sess = SESSIONS.get(token)
+    payload = SESSIONS.finish(token)
+    if payload is None:
+        return {"ok": False, "error": "Invalid session_token."}
+    if sess is None:
+        # already auto-finalized by the sweeper / LRU eviction
+        return payload
 
-    write_status({"state": "finished", "exercise": "bicep_curl", "message": "Session finished", "reps_total": reps_total})
+    PIPELINES[sess.exercise_type].write_status(sess, {
+        "state": "finished", "exercise": sess.exercise_type, "message": "Session finished",
+        "reps_total": payload["reps_total"]
+    })
     return payload
 
 
@@ -0,0 +1,392 @@
+# liftright/ml/scripts/realtime_shoulder_press.py
+# Shoulder press pipeline for realtime_server.py — ported from golden standard 04_live_shoulder_press.py
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from realtime_common import (
+    MODELS_DIR,
+    GOOD_COLOR, WARN_COLOR, BAD_COLOR,
+    ExerciseSession, ExercisePipeline, mp_pose,
+    safe_div, segment, arm_segments, mark_feedback,
+)
+from rep_engine import REP_CONFIGS, RepSegmenter, RepStats, START, END, SKIP
+
+
+# ---------------- PATHS ----------------
+MODEL_PKL = MODELS_DIR / "shoulder_press_ocsvm.pkl"
+
+# ---------------- REP DETECTION ----------------
+# smoothing, baseline calibration (~1 sec), thresholds, min frames / time:
+# rep_engine.REP_CONFIGS (same reps as 02_build_reps_shoulder_press.py)
+REP_CONFIG = REP_CONFIGS["shoulder_press"]
+
+# ---------------- COACHING THRESHOLDS ----------------
+TRUNK_WARN = 0.13
+TRUNK_BAD  = 0.22
+
+ASYM_WARN  = 0.22
+ASYM_BAD   = 0.34
+
+# Wrist stacked over elbow (2D proxy)
+STACK_WARN = 0.25
+STACK_BAD  = 0.38
+
+ML_MARGIN = 0.050
+ML_LOW_STREAK_FOR_TIP = 4
+
+GENERAL_TIPS = [
+    "Brace your core before pressing.",
+    "Keep wrists stacked over elbows.",
+    "Control the way down (eccentric).",
+    "Keep ribs down; avoid over-arching.",
+    "Press evenly with both arms.",
+]
+
+
+# ----------------------------- FATIGUE -----------------------------
+def compute_fatigue_index(baseline, range_med, dur_med, stack_med):
+    """
+    Similar structure to bicep:
+      - range drop
+      - duration increase
+      - compensation increase (stack gets worse)
+    """
+    range_ratio = safe_div(range_med, baseline["range"])
+    dur_ratio = safe_div(dur_med, baseline["duration"])
+    stack_delta = stack_med - baseline["stack"]
+
+    c_range = np.clip((0.70 - range_ratio) / 0.70, 0.0, 1.0)
+    c_dur   = np.clip((dur_ratio - 1.25) / 1.25, 0.0, 1.0)
+    c_stack = np.clip(stack_delta / 0.20, 0.0, 1.0)
+
+    idx = (0.45 * c_range + 0.25 * c_dur + 0.30 * c_stack) * 100.0
+    comps = {
+        "range_ratio": float(range_ratio),
+        "dur_ratio": float(dur_ratio),
+        "stack_delta": float(stack_delta),
+        "c_range": float(c_range),
+        "c_dur": float(c_dur),
+        "c_stack": float(c_stack),
+    }
+    return float(idx), comps
+
+
+def top_set_issues(set_counts):
+    items = []
+    if set_counts["stack_bad_right"] + set_counts["stack_warn_right"] > 0:
+        items.append(("right wrist stack", set_counts["stack_bad_right"] + set_counts["stack_warn_right"]))
+    if set_counts["stack_bad_left"] + set_counts["stack_warn_left"] > 0:
+        items.append(("left wrist stack", set_counts["stack_bad_left"] + set_counts["stack_warn_left"]))
+    if set_counts["asym_bad"] + set_counts["asym_warn"] > 0:
+        items.append(("arm asymmetry", set_counts["asym_bad"] + set_counts["asym_warn"]))
+    if set_counts["trunk_bad"] + set_counts["trunk_warn"] > 0:
+        items.append(("trunk lean/arch", set_counts["trunk_bad"] + set_counts["trunk_warn"]))
+    if set_counts["low_conf"] > 0:
+        items.append(("tracking low", set_counts["low_conf"]))
+
+    items.sort(key=lambda x: x[1], reverse=True)
+    return items[:2]
+
+
+# ----------------------------- REP COUNTER -----------------------------
+class PressRepCounter:
+    """
+    Golden standard (04_live_shoulder_press.py):
+      - baseline from first ~1 sec
+      - count rep after down -> up -> down
+      - arm locked at rep start
+    + per-rep conf accumulation so we can report confidence_avg to DB.
+    """
+    __slots__ = ("seg", "vals", "trunk", "stack", "confs", "rep_start_t", "rep_tip_seen",
+                 "rep_bad_seen", "rep_tip_reason", "rep_bad_reason", "rep_arm")
+
+    def __init__(self):
+        self.seg = RepSegmenter(REP_CONFIG)
+        self.vals = RepStats()
+        self.trunk = RepStats()
+        self.stack = RepStats()
+        self.confs = RepStats()
+        self.rep_arm = None  # "R" or "L", locked during rep
+        self.reset_rep(None)
+
+    @property
+    def state(self):
+        return self.seg.state
+
+    @property
+    def rep_count(self):
+        return self.seg.rep_count
+
+    # thresholds: defaults until the engine has calibrated on the first frames
+    @property
+    def baseline(self):
+        return self.seg.baseline
+
+    @property
+    def down_thr(self):
+        return self.seg.down_thr
+
+    @property
+    def up_thr(self):
+        return self.seg.up_thr
+
+    def reset_rep(self, t):
+        self.rep_start_t = t
+        self.vals.reset()
+        self.trunk.reset()
+        self.stack.reset()
+        self.confs.reset()
+
+        self.rep_tip_seen = False
+        self.rep_bad_seen = False
+        self.rep_tip_reason = ""
+        self.rep_bad_reason = ""
+
+        self.rep_arm = None
+
+    def mark_feedback(self, bad_list, tip_list):
+        mark_feedback(self, bad_list, tip_list)
+
+    def _collect(self, y_s, trunk_offset_norm, wrist_stack_norm, conf_mean):
+        self.vals.push(y_s)
+        self.trunk.push(float(trunk_offset_norm))
+        self.stack.push(float(wrist_stack_norm))
+        self.confs.push(float(conf_mean))
+
+    def update(self, wrist_rel_y, trunk_offset_norm, wrist_stack_norm, arm_label, conf_mean: float = 0.0, t: Optional[float] = None):
+        # t: frame capture time in seconds (client timestamp / video PTS); wall clock if absent
+        now = time.time() if t is None else float(t)
+
+        # state == "up": collect only if matching locked arm (only those frames count toward min frames)
+        same_arm = self.rep_arm is None or arm_label == self.rep_arm
+
+        # smoothing, baseline calibration, start / end / stuck reset: rep_engine
+        ev = self.seg.push(wrist_rel_y, now, counted=same_arm)
+        y_s = self.seg.smoothed
+
+        if ev == START:
+            self.reset_rep(now)
+            self.rep_arm = arm_label  # lock at rep start
+        if same_arm and (self.seg.state == "up" or ev in (END, SKIP)):
+            self._collect(y_s, trunk_offset_norm, wrist_stack_norm, conf_mean)
+
+        rep_done = False
+        rep_summary = None
+
+        if ev == END:
+            rep_done = True
+
+            rep_summary = {
+                "rep": int(self.rep_count),
+                "min_wrist_rel_y": self.vals.min,
+                "max_wrist_rel_y": self.vals.max,
+                "wrist_rel_range": self.vals.range(),
+                "duration": float(now - self.rep_start_t),
+                "trunk_absmax": self.trunk.absmax if len(self.trunk) else 0.0,
+
+                # IMPORTANT: keep key name consistent with 03 FEATURES
+                # "wrist_drift_absmax" means "wrist stack absmax"
+                "wrist_drift_absmax": self.stack.max if len(self.stack) else 0.0,
+                "confidence_avg": self.confs.mean(),
+
+                "baseline": float(self.baseline),
+                "down_thr": float(self.down_thr),
+                "up_thr": float(self.up_thr),
+                "arm": str(self.rep_arm) if self.rep_arm else str(arm_label),
+
+                "rep_tip_seen": bool(self.rep_tip_seen),
+                "rep_bad_seen": bool(self.rep_bad_seen),
+                "rep_tip_reason": str(self.rep_tip_reason),
+                "rep_bad_reason": str(self.rep_bad_reason),
+                "n_frames": len(self.vals),
+            }
+
+        if ev not in (None, START):
+            self.reset_rep(now)
+
+        return y_s, rep_done, rep_summary
+
+
+# ----------------------------- SESSION STATE -----------------------------
+@dataclass
+class ShoulderPressSession(ExerciseSession):
+    exercise_type: str = "shoulder_press"
+
+    rep_counter: PressRepCounter = field(default_factory=PressRepCounter)
+
+    baseline: Dict[str, Any] = field(default_factory=lambda: {"range": None, "duration": None, "stack": None})
+
+    set_counts: Dict[str, int] = field(default_factory=lambda: {
+        "stack_warn_right": 0, "stack_bad_right": 0,
+        "stack_warn_left": 0, "stack_bad_left": 0,
+        "asym_warn": 0, "asym_bad": 0,
+        "trunk_warn": 0, "trunk_bad": 0,
+        "low_conf": 0,
+    })
+
+
+class ShoulderPressPipeline(ExercisePipeline):
+    exercise = "shoulder_press"
+    model_pkl = MODEL_PKL
+
+    baseline_keys = ("range", "duration", "stack")
+    calib_fallbacks = {"range": 0.35, "duration": 1.6, "stack": 0.16}
+
+    ml_margin = ML_MARGIN
+    ml_low_streak_for_tip = ML_LOW_STREAK_FOR_TIP
+    general_tips = GENERAL_TIPS
+
+    def new_session(self, session_token: str, user_id: int, log_id: int, **kw) -> ShoulderPressSession:
+        return ShoulderPressSession(session_token=session_token, user_id=user_id, log_id=log_id, **kw)
+
+    def compute_fatigue_index(self, baseline, *meds):
+        return compute_fatigue_index(baseline, *meds)
+
+    def top_set_issues(self, set_counts):
+        return top_set_issues(set_counts)
+
+    def analyze(self, F, conf_mean: float, sess: ShoulderPressSession):
+        counts = sess.set_counts
+
+        # trunk offset
+        trunk_offset_norm = F["trunk_offset_norm"]
+
+        # wrist relative heights
+        yR = F["R_wrist_rel_y"]
+        yL = F["L_wrist_rel_y"]
+
+        # wrist stacked over elbow
+        stackR = F["R_wrist_stack"]
+        stackL = F["L_wrist_stack"]
+
+        # choose arm by wrist visibility
+        use_right = (F["R_wr_vis"] >= F["L_wr_vis"])
+        arm_label = "R" if use_right else "L"
+        wrist_rel_y = yR if use_right else yL
+        wrist_stack = stackR if use_right else stackL
+
+        bad = []
+        tips = []
+        right_stack_level = 0
+        left_stack_level = 0
+        trunk_level = 0
+        asym_level = 0
+
+        # trunk rules
+        if abs(trunk_offset_norm) > TRUNK_BAD:
+            trunk_level = 2
+            counts["trunk_bad"] += 1
+            bad.append("Avoid leaning / back arch")
+        elif abs(trunk_offset_norm) > TRUNK_WARN:
+            trunk_level = 1
+            counts["trunk_warn"] += 1
+            tips.append("Brace core; reduce lean")
+
+        # asym rules
+        asym = abs(yR - yL)
+        if asym > ASYM_BAD:
+            asym_level = 2
+            counts["asym_bad"] += 1
+            bad.append("Keep arms even")
+        elif asym > ASYM_WARN:
+            asym_level = 1
+            counts["asym_warn"] += 1
+            tips.append("Press more evenly")
+
+        # stack rules per side (for highlights + stats)
+        if stackR > STACK_BAD:
+            right_stack_level = 2
+            counts["stack_bad_right"] += 1
+        elif stackR > STACK_WARN:
+            right_stack_level = 1
+            counts["stack_warn_right"] += 1
+
+        if stackL > STACK_BAD:
+            left_stack_level = 2
+            counts["stack_bad_left"] += 1
+        elif stackL > STACK_WARN:
+            left_stack_level = 1
+            counts["stack_warn_left"] += 1
+
+        worst_stack = max(right_stack_level, left_stack_level)
+        if worst_stack == 2:
+            if right_stack_level == 2 and left_stack_level == 2:
+                bad.append("Wrists not stacked (both)")
+            elif right_stack_level == 2:
+                bad.append("Wrist not stacked (right)")
+            else:
+                bad.append("Wrist not stacked (left)")
+        elif worst_stack == 1:
+            if right_stack_level == 1 and left_stack_level == 1:
+                tips.append("Stack wrists over elbows (both)")
+            elif right_stack_level == 1:
+                tips.append("Stack wrist over elbow (right)")
+            else:
+                tips.append("Stack wrist over elbow (left)")
+
+        segments = arm_segments("R", right_stack_level) + arm_segments("L", left_stack_level)
+        if trunk_level > 0:
+            segments.append(segment(mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_HIP, trunk_level, 5))
+            segments.append(segment(mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_HIP, trunk_level, 5))
+        if asym_level > 0:
+            segments.append(segment(mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.LEFT_WRIST, asym_level, 4))
+            segments.append(segment(mp_pose.PoseLandmark.RIGHT_SHOULDER, mp_pose.PoseLandmark.RIGHT_WRIST, asym_level, 4))
+
+        if bad:
+            feedback = "UNSAFE: " + bad[0]
+            fb_color = BAD_COLOR
+        elif tips:
+            feedback = "COACHING: " + tips[0]
+            fb_color = WARN_COLOR
+        else:
+            feedback = "STATUS: Stable"
+            fb_color = GOOD_COLOR
+
+        # remember issues during rep
+        if sess.rep_counter.state == "up":
+            sess.rep_counter.mark_feedback(bad, tips)
+
+        _, rep_done, rep_sum = sess.rep_counter.update(
+            wrist_rel_y=wrist_rel_y,
+            trunk_offset_norm=trunk_offset_norm,
+            wrist_stack_norm=wrist_stack,
+            arm_label=arm_label,
+            conf_mean=conf_mean,
+            t=sess.frame_t,
+        )
+
+        return feedback, fb_color, segments, (rep_sum if rep_done else None)
+
+    def rep_features(self, rep_sum):
+        trunk_clip = min(rep_sum["trunk_absmax"], 0.55)
+        stack_clip = min(rep_sum["wrist_drift_absmax"], 0.60)
+        feat_map = {
+            "wrist_rel_range": rep_sum["wrist_rel_range"],
+            "duration": rep_sum["duration"],
+            "trunk_absmax": trunk_clip,
+            "wrist_drift_absmax": stack_clip,
+        }
+        entry = {
+            "range": rep_sum["wrist_rel_range"],
+            "duration": rep_sum["duration"],
+            "stack": stack_clip,
+        }
+        return feat_map, entry
+
+    def rep_tips(self, sess, rep_sum) -> List[str]:
+        tips = []
+        if sess.baseline_ready and rep_sum["wrist_rel_range"] < 0.55 * sess.baseline["range"]:
+            tips.append("Range dropping - lighten weight or rest")
+        if sess.baseline_ready and rep_sum["duration"] > 1.8 * sess.baseline["duration"]:
+            tips.append("Tempo slowing - stay controlled")
+        return tips
+
+    def rep_row(self, rep_sum, entry):
+        return rep_sum["wrist_rel_range"], min(rep_sum["trunk_absmax"], 0.55), {
+            "wrist_stack_absmax": float(entry["stack"]),
+            "arm": rep_sum.get("arm", "?"),
+        }
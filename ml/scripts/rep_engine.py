@@ -0,0 +1,339 @@
+# liftright/ml/scripts/rep_engine.py
+# One rep segmentation engine for every exercise. The offline builders
+# (02_build_reps_*.py), the realtime pipelines and the 04_live_*.py scripts all
+# count reps with it, so the models are trained on reps cut by the same state machine
+# the live counters run (calibration differs for two exercises, see below).
+#
+# A RepSegmenter follows one signal (elbow angle, wrist height):
+#   push(x, t) -> one frame at a time (live); returns the frame's event
+#   run(x, t)  -> a whole (confidence-filtered) column at once (offline), vectorized
+#                 via rep_signal.segment_reps
+#
+# Per frame:
+#   - median-smooth over smooth_n frames
+#   - calibration: the first baseline_frames smoothed values set the thresholds
+#     (exercises with fixed thresholds skip this)
+#   - RESET if the rep has run longer than max_rep_time (rep dropped, smoothing
+#     restarts); with idle_reset also after max_rep_time in "down" without any event
+#   - "down": START when the smoothed signal reaches the top threshold
+#   - "up":   on the bottom threshold END (counted) or SKIP (fewer than min_rep_frames
+#             counted frames / within min_rep_time of the last rep)
+#
+# Calibration is NOT shared between the two paths for shoulder press and lateral raise
+# (RepConfig.offline_matches_live is False): offline the whole clip is known, so run()
+# calibrates with offline_calibrate on the raw values of the first
+# offline_baseline_frames frames (the rack / arms-down position is usually only reached
+# a few seconds in, after the live 1-3 s causal window) and segments from the first
+# frame, without the idle reset. Live counting cannot wait ~13 s for its thresholds, so
+# push() keeps the causal calibrate window. Training reps and served counts can
+# therefore differ on the same clip for those two exercises; smoothing, START / END /
+# SKIP and the stuck reset are the same code. Without offline_calibrate and idle_reset
+# (bicep curl) run() reports exactly the reps push() would.
+#
+# RepStats is the counters' per-rep accumulator: running min / max / absmax / sum of
+# one channel over a preallocated float32 ring, so a rep summary is O(1) and a long
+# session allocates nothing per frame.
+
+import math
+from array import array
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rep_signal import SlidingMedian, rolling_median, segment_reps
+
+# RepStats ring capacity (frames): max_rep_time at 60 fps fits
+REP_BUF_FRAMES = 512
+
+# push() events
+START = "start"
+END = "end"
+SKIP = "skip"
+RESET = "reset"
+
+
+@dataclass(frozen=True)
+class RepConfig:
+    rising: bool           # True: the rep raises the signal (wrist height); False: lowers it (elbow angle)
+    up_thr: float          # rep top: START when reached
+    down_thr: float        # rep bottom: END when back here
+    baseline: float = 0.0
+    # smoothed calibration samples -> (baseline, down_thr, up_thr); None = fixed thresholds
+    calibrate: Optional[Callable[[np.ndarray], Tuple[float, float, float]]] = None
+    baseline_frames: int = 0
+    smooth_n: int = 7
+    min_rep_frames: int = 6
+    min_rep_time: float = 0.35
+    max_rep_time: float = 8.0
+    idle_reset: bool = False       # push(): stuck reset also in "down" (max_rep_time since the last event)
+    # run(): raw samples of the clip's first offline_baseline_frames frames -> (baseline, down_thr, up_thr)
+    offline_calibrate: Optional[Callable[[np.ndarray], Tuple[float, float, float]]] = None
+    offline_baseline_frames: int = 0
+
+    @property
+    def offline_matches_live(self) -> bool:
+        """run() reports exactly the reps push() would (see the module header)."""
+        return self.offline_calibrate is None and not self.idle_reset
+
+
+# ---------------- SHOULDER PRESS ----------------
+PRESS_BASELINE_FRAMES = 30   # ~1 sec
+PRESS_DOWN_MIN = 0.15
+PRESS_UP_OFFSET = 0.25
+
+def press_thresholds(samples: np.ndarray) -> Tuple[float, float, float]:
+    """Rack position: median of the first second, or the upper half if that looks like arms-down."""
+    s = np.asarray(samples, dtype=np.float32)
+    s = s[np.isfinite(s)]
+
+    base_med = float(np.median(s))
+    s_sorted = np.sort(s)
+    upper_half = s_sorted[len(s_sorted)//2:]
+    rack_guess = float(np.median(upper_half)) if len(upper_half) else base_med
+
+    if base_med < 0.15 and rack_guess > base_med + 0.10:
+        baseline = rack_guess
+    else:
+        baseline = base_med
+
+    down_thr = max(PRESS_DOWN_MIN, baseline + 0.02)
+    return float(baseline), float(down_thr), float(down_thr + PRESS_UP_OFFSET)
+
+
+# offline (02_build_reps_shoulder_press.py): whole-clip rack baseline
+PRESS_OFFLINE_FRAMES = 400   # ~13 sec at ~30 fps, includes the "get into rack" phase
+PRESS_OFFLINE_MIN_Y = 0.10   # ignore arms-down / near-zero
+PRESS_OFFLINE_PCT = 25       # rack-ish percentile (tends to land near the "down/rack" cluster)
+PRESS_OFFLINE_DOWN_MIN = 0.05
+PRESS_OFFLINE_UP_OFFSET = 0.35
+
+def press_offline_thresholds(samples: np.ndarray) -> Tuple[float, float, float]:
+    """Rack position: low percentile of the clip's first frames above arms-down height."""
+    s = np.asarray(samples, dtype=np.float64)
+    s = s[np.isfinite(s)]
+    s = s[s > PRESS_OFFLINE_MIN_Y]
+    baseline = float(np.percentile(s, PRESS_OFFLINE_PCT)) if len(s) else 0.10
+
+    down_thr = max(PRESS_OFFLINE_DOWN_MIN, baseline + 0.02)
+    return baseline, float(down_thr), float(down_thr + PRESS_OFFLINE_UP_OFFSET)
+
+
+# ---------------- LATERAL RAISE ----------------
+LATERAL_BASELINE_FRAMES = 90   # ~3 sec calibration (more stable)
+LATERAL_BASELINE_PCT = 25      # down-position cluster
+LATERAL_BASELINE_CLAMP_LO = -0.35
+LATERAL_BASELINE_CLAMP_HI = 0.10
+LATERAL_DOWN_OFFSET = 0.04     # higher bottom threshold so you don't need to dead-hang
+LATERAL_UP_OFFSET = 0.25       # start of raise
+
+def lateral_thresholds(samples: np.ndarray) -> Tuple[float, float, float]:
+    """Arms-down position: clamped low percentile of the calibration window."""
+    s = np.asarray(samples, dtype=np.float32)
+    s = s[np.isfinite(s)]
+    base = float(np.percentile(s, LATERAL_BASELINE_PCT)) if len(s) else -0.10
+    base = float(np.clip(base, LATERAL_BASELINE_CLAMP_LO, LATERAL_BASELINE_CLAMP_HI))
+
+    down_thr = float(base + LATERAL_DOWN_OFFSET)
+    return base, down_thr, float(down_thr + LATERAL_UP_OFFSET)
+
+
+# offline (02_build_reps_lateral_raise.py): whole-clip arms-down baseline
+LATERAL_OFFLINE_FRAMES = 400       # ~13 sec at ~30 fps
+LATERAL_OFFLINE_DOWN_OFFSET = 0.02
+
+def lateral_offline_thresholds(samples: np.ndarray) -> Tuple[float, float, float]:
+    """Arms-down position: low percentile of the clip's first frames (wrist below shoulder can be negative)."""
+    s = np.asarray(samples, dtype=np.float64)
+    s = s[np.isfinite(s)]
+    base = float(np.percentile(s, LATERAL_BASELINE_PCT)) if len(s) else -0.10
+
+    down_thr = base + LATERAL_OFFLINE_DOWN_OFFSET
+    return base, float(down_thr), float(down_thr + LATERAL_UP_OFFSET)
+
+
+REP_CONFIGS: Dict[str, RepConfig] = {
+    # elbow angle (deg): curl up past 75, back down past 155
+    "bicep_curl": RepConfig(rising=False, up_thr=75.0, down_thr=155.0, min_rep_frames=8),
+    # wrist height over shoulder / shoulder width
+    "shoulder_press": RepConfig(rising=True, up_thr=0.45, down_thr=0.15, baseline=0.10,
+                                calibrate=press_thresholds, baseline_frames=PRESS_BASELINE_FRAMES,
+                                idle_reset=True, offline_calibrate=press_offline_thresholds,
+                                offline_baseline_frames=PRESS_OFFLINE_FRAMES),
+    "lateral_raise": RepConfig(rising=True, up_thr=0.19, down_thr=-0.06, baseline=-0.10,
+                               calibrate=lateral_thresholds, baseline_frames=LATERAL_BASELINE_FRAMES,
+                               idle_reset=True, offline_calibrate=lateral_offline_thresholds,
+                               offline_baseline_frames=LATERAL_OFFLINE_FRAMES),
+}
+
+
+class RepStats:
+    """
+    One per-rep channel (angle, drift, conf, ...). Values are rounded to float32 like the
+    np.array(..., dtype=np.float32) summaries this replaces; min / max / absmax / range are
+    exact, mean is a float64 running sum. The ring keeps the last `capacity` values.
+    """
+    __slots__ = ("buf", "cap", "n", "min", "max", "absmax", "sum")
+
+    def __init__(self, capacity: int = REP_BUF_FRAMES):
+        # array("f"): a C float32 buffer with cheap per-item Python access (numpy scalars are ~4x slower here)
+        self.cap = int(capacity)
+        self.buf = array("f", bytes(4 * self.cap))
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.absmax = 0.0
+        self.sum = 0.0
+
+    def __len__(self):
+        return self.n
+
+    def push(self, x: float):
+        i = self.n % self.cap
+        self.buf[i] = x
+        f = self.buf[i]   # float32-rounded
+        self.n += 1
+        self.sum += f
+        if f != f:
+            self.min = self.max = self.absmax = f   # NaN sticks, like np.min / np.max
+        else:
+            if f < self.min:
+                self.min = f
+            if f > self.max:
+                self.max = f
+            if abs(f) > self.absmax:
+                self.absmax = abs(f)
+
+    def range(self) -> float:
+        """max - min in float32 arithmetic (np.ptp of the float32 array)."""
+        return float(np.float32(self.max) - np.float32(self.min))
+
+    def mean(self) -> float:
+        return self.sum / self.n if self.n else 0.0
+
+    def values(self) -> np.ndarray:
+        """The last min(n, capacity) values, oldest first (a copy)."""
+        buf = np.frombuffer(self.buf, dtype=np.float32)
+        if self.n <= self.cap:
+            return buf[:self.n].copy()
+        i = self.n % self.cap
+        return np.concatenate([buf[i:], buf[:i]])
+
+
+class RepSegmenter:
+    """Rep state machine over one signal; see the module header for the per-frame rules."""
+    __slots__ = ("cfg", "buf", "smoothed", "state", "rep_count", "last_rep_t", "rep_start_t", "rep_frames",
+                 "baseline", "down_thr", "up_thr", "baseline_samples", "baseline_ready")
+
+    def __init__(self, cfg: RepConfig):
+        self.cfg = cfg
+        self.buf = SlidingMedian(cfg.smooth_n)
+        self.smoothed = math.nan
+
+        self.state = "down"
+        self.rep_count = 0
+        self.last_rep_t = -math.inf
+        self.rep_start_t = None   # start of the current rep; in "down": of the idle stretch (last event)
+        self.rep_frames = 0
+
+        self.baseline = cfg.baseline
+        self.down_thr = cfg.down_thr
+        self.up_thr = cfg.up_thr
+        self.baseline_samples: List[float] = []
+        self.baseline_ready = cfg.calibrate is None or cfg.baseline_frames <= 0
+
+    def _calibrate(self, samples):
+        self.baseline, self.down_thr, self.up_thr = self.cfg.calibrate(samples)
+        self.baseline_ready = True
+
+    def is_top(self, s):
+        return s >= self.up_thr if self.cfg.rising else s <= self.up_thr
+
+    def is_bottom(self, s):
+        return s <= self.down_thr if self.cfg.rising else s >= self.down_thr
+
+    def push(self, x: float, t: float, counted: bool = True) -> Optional[str]:
+        """
+        Feed one frame (raw signal, time in seconds). Returns START / END / SKIP / RESET or None.
+        counted=False: the frame does not count toward min_rep_frames (arm-locked counters
+        pass it for frames of the other arm).
+        """
+        cfg = self.cfg
+        s = self.smoothed = self.buf.push(x)
+        if self.rep_start_t is None:
+            self.rep_start_t = t
+
+        if not self.baseline_ready:
+            self.baseline_samples.append(s)
+            if len(self.baseline_samples) >= cfg.baseline_frames:
+                self._calibrate(self.baseline_samples)
+
+        # safety reset: avoid giant stuck reps
+        if (self.state == "up" or cfg.idle_reset) and (t - self.rep_start_t) > cfg.max_rep_time:
+            self.state = "down"
+            self.rep_start_t = t
+            self.buf.clear()
+            return RESET
+
+        if not self.baseline_ready:
+            return None
+
+        if self.state == "down":
+            if self.is_top(s):
+                self.state = "up"
+                self.rep_start_t = t
+                self.rep_frames = 1
+                return START
+            return None
+
+        self.rep_frames += counted
+
+        if self.is_bottom(s):
+            self.state = "down"
+            self.rep_start_t = t
+            if self.rep_frames >= cfg.min_rep_frames and (t - self.last_rep_t) >= cfg.min_rep_time:
+                self.rep_count += 1
+                self.last_rep_t = t
+                return END
+            return SKIP
+
+        return None
+
+    def run(self, x: np.ndarray, t: np.ndarray, calib_n: Optional[int] = None) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+        """
+        Whole signal at once on a fresh segmenter (offline; see the module header).
+        calib_n: how many leading values of x fall in the offline calibration window (the
+        builders drop low-confidence frames first); default offline_baseline_frames.
+        Returns (smoothed signal, [(first, last), ...] inclusive frame ranges of counted reps).
+        Thresholds / rep_count are updated; the per-frame state afterwards is not.
+        """
+        cfg = self.cfg
+        x = np.asarray(x, dtype=np.float64)
+        t = np.asarray(t, dtype=np.float64)
+
+        start_at = 0
+        if cfg.offline_calibrate is not None:
+            n_cal = cfg.offline_baseline_frames if calib_n is None else calib_n
+            self.baseline, self.down_thr, self.up_thr = cfg.offline_calibrate(x[:n_cal])
+            self.baseline_ready = True
+        elif not self.baseline_ready:
+            n_cal = cfg.baseline_frames
+            if len(x) < n_cal:
+                return rolling_median(x, cfg.smooth_n), []
+            self._calibrate(rolling_median(x[:n_cal], cfg.smooth_n).tolist())
+            start_at = n_cal - 1
+
+        sm, segs = segment_reps(x, t, self.is_top, self.is_bottom,
+                                smooth_n=cfg.smooth_n, max_rep_time=cfg.max_rep_time,
+                                start_at=start_at)
+
+        reps = []
+        for first, last in segs:
+            if last + 1 - first >= cfg.min_rep_frames and (t[last] - self.last_rep_t) >= cfg.min_rep_time:
+                self.rep_count += 1
+                self.last_rep_t = float(t[last])
+                reps.append((first, last))
+        return sm, reps
@@ -0,0 +1,149 @@
+# liftright/ml/scripts/rep_signal.py
+# Array version of rep_engine.RepSegmenter's per-frame state machine (its run() path,
+# used by 02_build_reps_*.py).
+#
+# Frame by frame, the signal goes into a deque(maxlen=smooth_n), gets median-smoothed
+# and drives an up/down state machine. Here the median is computed for the whole
+# column at once and the state machine only jumps from event to event (rep start,
+# rep end, stuck-rep reset), finding each one with array ops. Output is identical
+# to pushing the frames one at a time.
+#
+# SlidingMedian is the per-frame (push) side: the same median as np.median over a
+# deque(maxlen=n), without building and sorting an array every frame.
+
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Callable, List, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# first event search window (doubles until something is found)
+_SCAN_CHUNK = 64
+
+
+class SlidingMedian:
+    """
+    Median of the last n pushed values: a ring of the window in arrival order plus the
+    same values kept sorted (bisect insert / delete). NaNs are counted aside and make
+    the median NaN while in the window, like np.median.
+    """
+    __slots__ = ("n", "ring", "sorted", "nans")
+
+    def __init__(self, n: int):
+        self.n = int(n)
+        self.ring = deque()
+        self.sorted: List[float] = []
+        self.nans = 0
+
+    def __len__(self):
+        return len(self.ring)
+
+    def clear(self):
+        self.ring.clear()
+        self.sorted.clear()
+        self.nans = 0
+
+    def push(self, x: float) -> float:
+        """Add x (dropping the oldest value once full) and return the window median."""
+        x = float(x)
+        if len(self.ring) == self.n:
+            old = self.ring.popleft()
+            if old != old:
+                self.nans -= 1
+            else:
+                del self.sorted[bisect_left(self.sorted, old)]
+        self.ring.append(x)
+        if x != x:
+            self.nans += 1
+        else:
+            insort(self.sorted, x)
+        return self.median()
+
+    def median(self) -> float:
+        if self.nans or not self.ring:
+            return math.nan
+        s = self.sorted
+        k = len(s) // 2
+        if len(s) % 2:
+            return s[k]
+        return (s[k - 1] + s[k]) / 2
+
+
+def rolling_median(x: np.ndarray, n: int) -> np.ndarray:
+    """
+    out[i] = np.median(x[max(0, i - n + 1):i + 1]): what np.median(deque(maxlen=n))
+    returns after appending x[i] to an initially empty deque.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty_like(x)
+    head = min(n - 1, len(x))
+    win = SlidingMedian(n)
+    for i in range(head):
+        out[i] = win.push(x[i])
+    if len(x) >= n:
+        out[n - 1:] = np.median(sliding_window_view(x, n), axis=1)
+    return out
+
+
+def _first(pred: Callable[[int, int], np.ndarray], lo: int, n: int) -> int:
+    """First index >= lo where pred(a, b) (a bool array for [a, b)) is True, or -1."""
+    chunk = _SCAN_CHUNK
+    while lo < n:
+        hi = min(n, lo + chunk)
+        hit = np.flatnonzero(pred(lo, hi))
+        if len(hit):
+            return lo + int(hit[0])
+        lo = hi
+        chunk *= 2
+    return -1
+
+
+def segment_reps(x: np.ndarray, t: np.ndarray,
+                 is_start: Callable[[np.ndarray], np.ndarray],
+                 is_end: Callable[[np.ndarray], np.ndarray],
+                 smooth_n: int, max_rep_time: float,
+                 start_at: int = 0) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """
+    Run the rep state machine over one arm's (already confidence-filtered) frames.
+
+    x: raw signal, t: time_sec per frame.
+    is_start / is_end: vectorized thresholds on the smoothed signal.
+    A rep starts on the first smoothed frame passing is_start and ends (inclusive) on the
+    next frame passing is_end. If a rep runs longer than max_rep_time it is dropped and the
+    smoothing window restarts empty after that frame (the loop's buf.clear()).
+    start_at: first frame allowed to start a rep (earlier frames only fill the window).
+    Returns (smoothed signal, [(first, last), ...] frame index pairs of completed reps).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    t = np.asarray(t, dtype=np.float64)
+    n = len(x)
+
+    sm = rolling_median(x, smooth_n)
+    start = is_start(sm)
+    end = is_end(sm)
+
+    segs = []
+    i = start_at
+    while i < n:
+        j = _first(lambda a, b: start[a:b], i, n)
+        if j < 0:
+            break
+
+        t0 = t[j]
+        k = _first(lambda a, b: ((t[a:b] - t0) > max_rep_time) | end[a:b], j + 1, n)
+        if k < 0:
+            break   # rep still open when the video ends
+
+        if (t[k] - t0) > max_rep_time:
+            # stuck rep: only the next smooth_n - 1 medians see the cleared window
+            h = slice(k + 1, min(n, k + smooth_n))
+            sm[h] = rolling_median(x[h], smooth_n)
+            start[h] = is_start(sm[h])
+            end[h] = is_end(sm[h])
+        else:
+            segs.append((j, k))
+        i = k + 1
+
+    return sm, segs
@@ -0,0 +1,217 @@
+# liftright/ml/scripts/replay_session.py
+# Re-drives recorded sessions (realtime_server.py with RECORD_SESSIONS=landmarks|jpeg,
+# see session_record.py) through the same ExercisePipeline.track the server runs, as
+# fast as the CPU allows, and diffs the result against the session's recorded /finish
+# summary:
+#   totals     reps_total / good / bad / warn, form_error_count, fatigue_flag
+#   per rep    rep_index, duration_ms, form_label, label_ui / is_warning / bad / tip seen,
+#              anomaly_score (OC-SVM), rom_score, trunk_sway, confidence_avg, fatigue_index
+#   feedback   fatigue stop events (since_rep)
+# Landmark recordings replay without MediaPipe; JPEG recordings run a fresh server Pose.
+# Rep praise texts are random in the pipelines and are not compared.
+#
+#   python replay_session.py                                   # every outputs/sessions/*.lrrec
+#   python replay_session.py outputs/sessions/bicep_curl_12_<token>.lrrec --profile 25
+#
+# Exit code 1 if any replay differs from its recording.
+
+import argparse
+import cProfile
+import json
+import pstats
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from pose_features import landmarks_to_array
+from realtime_common import ExercisePipeline, new_pose, session_summary
+from realtime_bicep_curl import BicepCurlPipeline
+from realtime_shoulder_press import ShoulderPressPipeline
+from realtime_lateral_raise import LateralRaisePipeline
+from session_record import RECORD_DIR, JPEG, LANDMARKS, load_recording
+
+# ---------------- CONFIG ----------------
+PIPELINE_CLASSES = {
+    "bicep_curl": BicepCurlPipeline,
+    "shoulder_press": ShoulderPressPipeline,
+    "lateral_raise": LateralRaisePipeline,
+}
+
+TOTALS = ("reps_total", "reps_good", "reps_bad", "reps_warn", "form_error_count", "fatigue_flag")
+REP_FIELDS = ("rep_index", "duration_ms", "form_label")
+REP_FLOATS = ("anomaly_score", "rom_score", "trunk_sway", "confidence_avg")
+META_FIELDS = ("label_ui", "is_warning", "rep_bad_seen", "rep_tip_seen")
+META_FLOATS = ("fatigue_index",)
+FLOAT_TOL = 1e-6
+MAX_DIFF_LINES = 20
+
+
+_PIPELINES: Dict[str, ExercisePipeline] = {}
+
+
+def pipeline(exercise: str) -> ExercisePipeline:
+    """One pipeline per exercise (OC-SVM bundle loaded once), without the debug status mirror."""
+    pipe = _PIPELINES.get(exercise)
+    if pipe is None:
+        pipe = _PIPELINES[exercise] = PIPELINE_CLASSES[exercise]()
+        pipe.write_status = lambda sess, payload: None
+    return pipe
+
+
+# ----------------------------- REPLAY -----------------------------
+def replay(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a loaded recording through its pipeline; returns the replayed /finish summary."""
+    hdr = rec["header"]
+    pipe = pipeline(hdr["exercise"])
+    sess = pipe.new_session(session_token=f"replay-{hdr['session_token']}",
+                            user_id=int(hdr["user_id"]), log_id=int(hdr["log_id"]))
+    pose = new_pose() if hdr["mode"] == "jpeg" else None
+    try:
+        for t, w, h, kind, payload in rec["frames"]:
+            lms = payload if kind == LANDMARKS else None
+            if kind == JPEG:
+                img = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    continue
+                h, w = img.shape[:2]
+                res = pose.process(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+                lms = landmarks_to_array(res.pose_landmarks.landmark) if res.pose_landmarks else None
+            pipe.track(lms, w, h, sess, ts=t)
+    finally:
+        if pose is not None:
+            pose.close()
+    return session_summary(sess)
+
+
+def _close(a, b, tol: float) -> bool:
+    try:
+        return abs(float(a) - float(b)) <= tol
+    except (TypeError, ValueError):
+        return a == b
+
+
+def diff_summaries(live: Dict[str, Any], replayed: Dict[str, Any], tol: float = FLOAT_TOL) -> List[str]:
+    """Human-readable differences between the recorded and the replayed summary ([] = same)."""
+    out = []
+    for k in TOTALS:
+        if live.get(k) != replayed.get(k):
+            out.append(f"{k}: recorded {live.get(k)} replayed {replayed.get(k)}")
+
+    reps_a, reps_b = live.get("reps", []), replayed.get("reps", [])
+    for i in range(max(len(reps_a), len(reps_b))):
+        if i >= len(reps_a) or i >= len(reps_b):
+            out.append(f"rep {i + 1}: only in {'replay' if i >= len(reps_a) else 'recording'}")
+            continue
+        a, b = reps_a[i], reps_b[i]
+        ma, mb = a.get("meta") or {}, b.get("meta") or {}
+        for k in REP_FIELDS:
+            if a.get(k) != b.get(k):
+                out.append(f"rep {i + 1} {k}: recorded {a.get(k)} replayed {b.get(k)}")
+        for k in REP_FLOATS:
+            if not _close(a.get(k), b.get(k), tol):
+                out.append(f"rep {i + 1} {k}: recorded {a.get(k)} replayed {b.get(k)}")
+        for k in META_FIELDS:
+            if ma.get(k) != mb.get(k):
+                out.append(f"rep {i + 1} meta.{k}: recorded {ma.get(k)} replayed {mb.get(k)}")
+        for k in META_FLOATS:
+            if not _close(ma.get(k), mb.get(k), tol):
+                out.append(f"rep {i + 1} meta.{k}: recorded {ma.get(k)} replayed {mb.get(k)}")
+
+    def fatigue_events(s):
+        return [(f.get("meta") or {}).get("since_rep") for f in s.get("feedback", []) if f.get("feedback_type") == "fatigue"]
+
+    fa, fb = fatigue_events(live), fatigue_events(replayed)
+    if fa != fb:
+        out.append(f"fatigue stop events (since_rep): recorded {fa} replayed {fb}")
+    return out
+
+
+def replay_file(path: Path, tol: float, prof: Optional[cProfile.Profile] = None) -> Dict[str, Any]:
+    rec = load_recording(path)
+    pipeline(rec["header"]["exercise"])   # bundle load is not part of the replay time
+    frames = rec["frames"]
+    span = (frames[-1][0] - frames[0][0]) if len(frames) > 1 else 0.0
+
+    if prof is not None:
+        prof.enable()
+    t0 = time.perf_counter()
+    replayed = replay(rec)
+    wall = time.perf_counter() - t0
+    if prof is not None:
+        prof.disable()
+
+    diffs = None if rec["finish"] is None else diff_summaries(rec["finish"], replayed, tol)
+    return {
+        "file": str(path),
+        "exercise": rec["header"]["exercise"],
+        "mode": rec["header"]["mode"],
+        "frames": len(frames),
+        "recorded_s": round(span, 3),
+        "replay_s": round(wall, 4),
+        "fps": round(len(frames) / wall, 1) if wall > 0 else 0.0,
+        "x_realtime": round(span / wall, 1) if wall > 0 else 0.0,
+        "reps": replayed["reps_total"],
+        "diffs": diffs,
+        "replayed": replayed,
+    }
+
+
+def list_recordings(paths: List[Path]) -> List[Path]:
+    out = []
+    for p in paths:
+        out.extend(sorted(p.glob("*.lrrec")) if p.is_dir() else [p])
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Replay recorded realtime sessions and diff against their /finish")
+    ap.add_argument("paths", nargs="*", type=Path, default=[RECORD_DIR], help=".lrrec files or directories")
+    ap.add_argument("--tol", type=float, default=FLOAT_TOL, help="absolute tolerance for float fields")
+    ap.add_argument("--profile", type=int, default=0, metavar="N", help="cProfile the replays, print top N")
+    ap.add_argument("--out", type=Path, default=None, help="write the full report (incl. replayed summaries) as JSON")
+    args = ap.parse_args(argv)
+
+    files = list_recordings(args.paths)
+    if not files:
+        print("No recordings found in", ", ".join(str(p) for p in args.paths))
+        return 1
+
+    prof: Optional[cProfile.Profile] = cProfile.Profile() if args.profile else None
+    report, failed = [], 0
+    for path in files:
+        try:
+            r = replay_file(path, args.tol, prof)
+        except Exception as e:
+            print(f"!! {path.name}: {e}")
+            failed += 1
+            continue
+        report.append(r)
+
+        if r["diffs"] is None:
+            verdict = "no /finish recorded (nothing to diff)"
+        elif r["diffs"]:
+            verdict = f"DIFF ({len(r['diffs'])})"
+            failed += 1
+        else:
+            verdict = "OK"
+        print(f"{path.name}: {r['exercise']} [{r['mode']}] {r['frames']} frames, {r['reps']} reps, "
+              f"{r['recorded_s']:.1f}s recorded -> {r['replay_s']:.2f}s replay "
+              f"({r['fps']:.0f} fps, {r['x_realtime']:.0f}x realtime)  {verdict}")
+        for line in (r["diffs"] or [])[:MAX_DIFF_LINES]:
+            print("   ", line)
+
+    if prof is not None:
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(args.profile)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, indent=2))
+        print("Saved", args.out)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
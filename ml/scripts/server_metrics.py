@@ -0,0 +1,188 @@
+# liftright/ml/scripts/server_metrics.py
+# In-process latency / throughput metrics for realtime_server.py, served as Prometheus
+# text on GET /metrics.
+#
+# Every timed stage (base64 decode, imdecode, cvtColor, pose, features, rep logic,
+# OC-SVM score, drawing, JPEG encode, ...) and every endpoint keeps the last WINDOW
+# samples in a ring; a scrape reports p50 / p95 / p99 over that window plus all-time
+# _sum / _count (a Prometheus summary). Per-session FPS comes from the wall-clock times
+# of each session's last FPS_WINDOW processed frames.
+#
+#   with METRICS.time("pose"): ...              # stage timer
+#   METRICS.observe("request", "/frame", dt)    # any family / label, seconds
+#   METRICS.inc("frames_dropped")               # counter
+
+import functools
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ---------------- CONFIG ----------------
+WINDOW = 1024          # samples per (family, label) for the rolling quantiles
+QUANTILES = (0.5, 0.95, 0.99)
+FPS_WINDOW = 30        # frames per session for the FPS estimate
+PREFIX = "liftright"
+
+HELP = {
+    "stage": "Per-stage frame processing time in seconds (rolling-window quantiles)",
+    "request": "Endpoint handler time in seconds (rolling-window quantiles)",
+}
+LABEL = {"stage": "stage", "request": "endpoint"}
+
+
+class RollingSummary:
+    """Last `window` samples (ring) + all-time sum / count."""
+    __slots__ = ("ring", "window", "count", "sum")
+
+    def __init__(self, window: int = WINDOW):
+        self.window = int(window)
+        self.ring = array("d")
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, v: float) -> None:
+        if len(self.ring) < self.window:
+            self.ring.append(v)
+        else:
+            self.ring[self.count % self.window] = v
+        self.count += 1
+        self.sum += v
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> List[float]:
+        s = sorted(self.ring)
+        if not s:
+            return [0.0 for _ in qs]
+        return [s[min(len(s) - 1, int(q * len(s)))] for q in qs]
+
+
+class _Timer:
+    __slots__ = ("metrics", "family", "label", "t0")
+
+    def __init__(self, metrics: "Metrics", family: str, label: str):
+        self.metrics = metrics
+        self.family = family
+        self.label = label
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.family, self.label, time.perf_counter() - self.t0)
+        return False
+
+
+class Metrics:
+    def __init__(self, window: int = WINDOW):
+        self.window = int(window)
+        self._summaries: Dict[Tuple[str, str], RollingSummary] = {}
+        self._counters: Dict[str, float] = {}
+        self._frames: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    # ---- recording ----
+    def observe(self, family: str, label: str, seconds: float) -> None:
+        key = (family, label)
+        with self._lock:
+            s = self._summaries.get(key)
+            if s is None:
+                s = self._summaries[key] = RollingSummary(self.window)
+            s.observe(float(seconds))
+
+    def time(self, stage: str, family: str = "stage") -> _Timer:
+        return _Timer(self, family, stage)
+
+    def inc(self, name: str, v: float = 1.0) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0.0) + v
+
+    def frame_done(self, session_token: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            q = self._frames.get(session_token)
+            if q is None:
+                q = self._frames[session_token] = deque(maxlen=FPS_WINDOW)
+            q.append(now)
+
+    def forget(self, session_token: str) -> None:
+        with self._lock:
+            self._frames.pop(session_token, None)
+
+    # ---- reading ----
+    def fps(self, session_token: str) -> float:
+        with self._lock:
+            q = self._frames.get(session_token)
+            if not q or len(q) < 2 or q[-1] <= q[0]:
+                return 0.0
+            return (len(q) - 1) / (q[-1] - q[0])
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """{family: {label: {p50, p95, p99, count, sum}}} (JSON-friendly, e.g. for /health)."""
+        out: Dict[str, Dict[str, Dict[str, float]]] = {}
+        with self._lock:
+            items = [(k, s.quantiles(), s.count, s.sum) for k, s in self._summaries.items()]
+        for (family, label), qv, count, total in items:
+            row = {f"p{int(q * 100)}": v for q, v in zip(QUANTILES, qv)}
+            row.update({"count": count, "sum": total})
+            out.setdefault(family, {})[label] = row
+        return out
+
+    def render(self, gauges: Optional[List[Tuple[str, str, Dict[str, str], float]]] = None) -> str:
+        """
+        Prometheus text exposition. gauges: extra (name, help, labels, value) samples
+        computed by the caller at scrape time (live sessions, per-session FPS, ...).
+        """
+        lines: List[str] = []
+        snap = self.snapshot()
+        for family in sorted(snap):
+            name = f"{PREFIX}_{family}_seconds"
+            label = LABEL.get(family, "name")
+            lines.append(f"# HELP {name} {HELP.get(family, family)}")
+            lines.append(f"# TYPE {name} summary")
+            for lv in sorted(snap[family]):
+                row = snap[family][lv]
+                for q in QUANTILES:
+                    lines.append(f'{name}{{{label}="{_esc(lv)}",quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6g}')
+                lines.append(f'{name}_sum{{{label}="{_esc(lv)}"}} {row["sum"]:.6g}')
+                lines.append(f'{name}_count{{{label}="{_esc(lv)}"}} {row["count"]}')
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+        for cname, v in counters:
+            name = f"{PREFIX}_{cname}_total"
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {v:.6g}")
+
+        seen = set()
+        for gname, ghelp, labels, v in gauges or []:
+            name = f"{PREFIX}_{gname}"
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {ghelp}")
+                lines.append(f"# TYPE {name} gauge")
+            lab = ",".join(f'{k}="{_esc(str(x))}"' for k, x in labels.items())
+            lines.append(f"{name}{{{lab}}} {v:.6g}" if lab else f"{name} {v:.6g}")
+        return "\n".join(lines) + "\n"
+
+
+def timed(endpoint: str):
+    """Decorator: record a (sync) handler's time under family "request"."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            t0 = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                METRICS.observe("request", endpoint, time.perf_counter() - t0)
+        return inner
+    return wrap
+
+
+def _esc(s: str) -> str:
+    return s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
@@ -0,0 +1,144 @@
+# liftright/ml/scripts/session_record.py
+# Session input recordings for realtime_server.py (RECORD_SESSIONS=landmarks|jpeg) and
+# replay_session.py.
+#
+# One append-only file per session, outputs/sessions/<exercise>_<log_id>_<token>.lrrec:
+#   MAGIC, then one JSON header line {exercise, session_token, log_id, user_id, mode, ...}
+#   records: REC header (t, w, h, kind, n) + n payload bytes
+#     NO_POSE    processed frame without landmarks (no payload)
+#     LANDMARKS  (33, 4) float32 landmarks as given to ExercisePipeline.track (528 bytes)
+#     JPEG       the frame's JPEG as received (w = h = 0; replay runs Pose on it)
+#     FINISH     the /finish (or eviction) summary as JSON, written when the session closes
+# t is the frame's rep clock (sess.frame_t after frame_clock), so a replay feeding
+# track(..., ts=t) sees exactly the timeline the live session saw. Only processed
+# frames are recorded (latest-wins drops never reached the pipeline).
+
+import json
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from realtime_common import OUT_DIR
+
+# ---------------- CONFIG ----------------
+RECORD_DIR = OUT_DIR / "sessions"
+RECORD_MODES = ("landmarks", "jpeg")
+
+MAGIC = b"LRREC1\n"
+REC = struct.Struct("<dHHBI")   # t (s), w, h, kind, payload bytes
+NO_POSE, LANDMARKS, JPEG, FINISH = 0, 1, 2, 3
+LMS_SHAPE = (33, 4)
+
+
+class SessionRecorder:
+    """Appends one session's frames to its .lrrec file (see module header)."""
+    def __init__(self, path: Path, header: Dict[str, Any]):
+        self.path = Path(path)
+        self.mode = header["mode"]
+        self.frames = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "wb")
+        self._f.write(MAGIC)
+        self._f.write(json.dumps(header).encode("utf-8") + b"\n")
+
+    def _write(self, t: float, w: int, h: int, kind: int, payload: bytes) -> None:
+        with self._lock:
+            if self._f is None:
+                return
+            self._f.write(REC.pack(float(t), int(w), int(h), kind, len(payload)))
+            self._f.write(payload)
+            self.frames += kind != FINISH
+
+    def landmarks(self, t: float, lms: Optional[np.ndarray], w: int, h: int) -> None:
+        """Called by ExercisePipeline.track for every processed frame (landmarks mode)."""
+        if self.mode != "landmarks":
+            return
+        if lms is None:
+            self._write(t, w, h, NO_POSE, b"")
+        else:
+            self._write(t, w, h, LANDMARKS, np.ascontiguousarray(lms, dtype=np.float32).tobytes())
+
+    def jpeg(self, t: float, raw: bytes) -> None:
+        """Called by the server after a JPEG frame went through the pipeline (jpeg mode)."""
+        if self.mode == "jpeg":
+            self._write(t, 0, 0, JPEG, bytes(raw))
+
+    def finish(self, summary: Dict[str, Any]) -> None:
+        """Append the session's /finish summary and close the file."""
+        self._write(0.0, 0, 0, FINISH, json.dumps(summary).encode("utf-8"))
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+
+def open_recorder(sess, mode: str, record_dir: Path = RECORD_DIR) -> Optional[SessionRecorder]:
+    """Recorder for a new session, or None when recording is off (mode not in RECORD_MODES)."""
+    if mode not in RECORD_MODES:
+        return None
+    header = {
+        "exercise": sess.exercise_type,
+        "session_token": sess.session_token,
+        "log_id": sess.log_id,
+        "user_id": sess.user_id,
+        "response_mode": sess.response_mode,
+        "mode": mode,
+        "started_at": time.time(),
+    }
+    path = record_dir / f"{sess.exercise_type}_{sess.log_id}_{sess.session_token}.lrrec"
+    try:
+        return SessionRecorder(path, header)
+    except OSError:
+        return None
+
+
+# ----------------------------- READING -----------------------------
+def iter_records(path: Path) -> Iterator[Tuple[float, int, int, int, bytes]]:
+    """(t, w, h, kind, payload) for every record after the header (stops at a truncated tail)."""
+    with open(path, "rb") as f:
+        f.readline()
+        f.readline()
+        while True:
+            head = f.read(REC.size)
+            if len(head) < REC.size:
+                return
+            t, w, h, kind, n = REC.unpack(head)
+            payload = f.read(n)
+            if len(payload) < n:
+                return
+            yield t, w, h, kind, payload
+
+
+def read_header(path: Path) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        if f.readline() != MAGIC:
+            raise ValueError(f"{path}: not a session recording")
+        return json.loads(f.readline())
+
+
+def load_recording(path: Path) -> Dict[str, Any]:
+    """
+    Whole recording in memory:
+      {header, frames: [(t, w, h, kind, lms (33, 4) | JPEG bytes | None)], finish: summary or None}
+    """
+    header = read_header(path)
+    frames: List[Tuple[float, int, int, int, Any]] = []
+    finish = None
+    for t, w, h, kind, payload in iter_records(path):
+        if kind == FINISH:
+            finish = json.loads(payload)
+        elif kind == LANDMARKS:
+            frames.append((t, w, h, kind, np.frombuffer(payload, dtype=np.float32).reshape(LMS_SHAPE)))
+        elif kind == JPEG:
+            frames.append((t, w, h, kind, payload))
+        else:
+            frames.append((t, w, h, kind, None))
+    return {"header": header, "frames": frames, "finish": finish}
@@ -0,0 +1,89 @@
+# liftright/ml/scripts/status_mirror.py
+# Background writer for the debug status JSON files in outputs/.
+# Frame loops call publish() (dict copy + lock, no I/O). A single daemon thread
+# coalesces updates per file (latest payload wins), writes at most once per
+# MIN_INTERVAL_S per file, and replaces files atomically so readers never see
+# a half-written JSON.
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+MIN_INTERVAL_S = 0.5
+
+
+class StatusMirror:
+    def __init__(self, min_interval_s: float = MIN_INTERVAL_S):
+        self.min_interval_s = float(min_interval_s)
+        self._pending: Dict[Path, Dict[str, Any]] = {}
+        self._last_write: Dict[Path, float] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.writes = 0
+        self.coalesced = 0
+
+    def publish(self, path: Path, payload: Dict[str, Any]) -> None:
+        """Queue payload for path; replaces any not-yet-written payload for the same path."""
+        payload = dict(payload)
+        payload["timestamp"] = time.time()
+        with self._cond:
+            if path in self._pending:
+                self.coalesced += 1
+            self._pending[path] = payload
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="status-mirror", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self) -> None:
+        """Write everything pending now (process exit / tests)."""
+        with self._cond:
+            batch, self._pending = self._pending, {}
+        for path, payload in batch.items():
+            self._write(path, payload)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+
+                now = time.time()
+                due = {p: v for p, v in self._pending.items()
+                       if now - self._last_write.get(p, 0.0) >= self.min_interval_s}
+                if not due:
+                    wake = min(self._last_write[p] for p in self._pending) + self.min_interval_s
+                    self._cond.wait(timeout=max(0.0, wake - now))
+                    continue
+                for p in due:
+                    del self._pending[p]
+                    self._last_write[p] = now
+                if len(self._last_write) > 1024:
+                    self._last_write = {p: t for p, t in self._last_write.items()
+                                        if now - t < self.min_interval_s or p in self._pending}
+
+            for path, payload in due.items():
+                self._write(path, payload)
+
+    def _write(self, path: Path, payload: Dict[str, Any]) -> None:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+            os.replace(tmp, path)
+            self.writes += 1
+        except Exception:
+            pass
+
+
+STATUS_MIRROR = StatusMirror()
+atexit.register(STATUS_MIRROR.flush)
+
+
+def write_status(path: Path, payload: Dict[str, Any]) -> None:
+    """Non-blocking status mirror write (see StatusMirror)."""
+    STATUS_MIRROR.publish(path, payload)
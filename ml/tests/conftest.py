@@ -0,0 +1,6 @@
+# liftright/ml/tests/conftest.py
+# The ml scripts are flat modules run from ml/scripts; make them importable here.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
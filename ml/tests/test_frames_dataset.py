@@ -0,0 +1,54 @@
+# liftright/ml/tests/test_frames_dataset.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import frames_dataset
+from pose_features import FRAME_COLUMNS
+
+
+def video_frames(n: int = 5) -> pd.DataFrame:
+    df = pd.DataFrame({c: np.linspace(0.0, 1.0, n) for c in FRAME_COLUMNS})
+    df["participant_id"] = "007"
+    df["frame_idx"] = np.arange(n)
+    df["time_sec"] = df["frame_idx"] / 30.0
+    df["fps"] = 30.0
+    return df
+
+
+@pytest.fixture
+def dataset_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(frames_dataset, "PARQUET_DIR", tmp_path / "parquet")
+    monkeypatch.setattr(frames_dataset, "LEGACY_CSV", tmp_path / "missing.csv")
+    return tmp_path
+
+
+def test_zero_padded_video_ids_round_trip(dataset_dir):
+    for vid in ("001", "002", "010"):
+        frames_dataset.write_video_partition(video_frames(), "bicep_curl", vid)
+
+    df = frames_dataset.load_frames("bicep_curl", ["conf_mean"])
+    assert sorted(df["video_id"].unique()) == ["001", "002", "010"]
+    assert len(df) == 15
+
+    only = frames_dataset.load_frames("bicep_curl", ["conf_mean"], video_ids=["002"])
+    assert only["video_id"].unique().tolist() == ["002"]
+    assert only["frame_idx"].tolist() == list(range(5))
+
+    full = frames_dataset.load_frames("bicep_curl")
+    assert set(full["participant_id"]) == {"007"}
+
+
+def test_legacy_csv_keeps_zero_padded_ids(dataset_dir):
+    df = video_frames().assign(exercise="bicep_curl", video_id="001")
+    csv = dataset_dir / "frames.csv"
+    df.to_csv(csv, index=False)
+    frames_dataset.LEGACY_CSV = csv
+
+    legacy = frames_dataset.load_frames("bicep_curl", ["conf_mean"], video_ids=["001"])
+    assert legacy["video_id"].unique().tolist() == ["001"]
+
+    assert frames_dataset.convert_csv(csv) == 1
+    assert (frames_dataset.PARQUET_DIR / "exercise=bicep_curl" / "video_id=001").is_dir()
+    parquet = frames_dataset.load_frames("bicep_curl", ["conf_mean"], video_ids=["001"])
+    assert parquet["video_id"].unique().tolist() == ["001"]
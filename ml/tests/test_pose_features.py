@@ -0,0 +1,41 @@
+# liftright/ml/tests/test_pose_features.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from pose_features import FRAME_KEYS, compute_features, frame_features, landmarks_to_array
+
+W, H = 1280, 720
+
+
+def random_landmarks(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random((n, 33, 4)).astype(np.float32)
+
+
+@pytest.mark.parametrize("min_sw", [None, 2])
+def test_frame_features_matches_compute_features(min_sw):
+    A = random_landmarks(500)
+    C = compute_features(A, W, H, min_sw)
+    for t in range(len(A)):
+        F = frame_features(A[t], W, H, min_shoulder_width=min_sw)
+        assert tuple(F) == FRAME_KEYS
+        for k in FRAME_KEYS:
+            assert F[k] == C[k][t], (t, k)
+
+
+def test_frame_features_from_landmark_list():
+    A = random_landmarks(50, seed=1)
+    for arr in A:
+        lms = [SimpleNamespace(x=float(r[0]), y=float(r[1]), z=float(r[2]), visibility=float(r[3])) for r in arr]
+        assert np.array_equal(landmarks_to_array(lms), arr)
+        assert frame_features(lms, W, H, 2) == frame_features(arr, W, H, 2)
+
+
+def test_degenerate_pose_matches():
+    # shoulders on top of each other, and a collapsed arm (zero-length vectors)
+    arr = np.full((33, 4), 0.5, dtype=np.float32)
+    C = compute_features(arr, W, H, 2)
+    F = frame_features(arr, W, H, 2)
+    for k in FRAME_KEYS:
+        assert F[k] == C[k], k
@@ -0,0 +1,88 @@
+# liftright/ml/tests/test_pose_roi.py
+from types import SimpleNamespace
+
+import numpy as np
+
+from pose_roi import RoiPose
+
+W, H = 1280, 720
+BODY_W, BODY_H = 200, 400
+# fixed points on the body box standing in for the 33 landmarks
+GRID = [(u, v) for u in (0.0, 0.25, 0.5, 0.75, 1.0) for v in (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)]
+
+
+def body_box(i: int):
+    x0 = 480 + i          # walks slowly to the right
+    return x0, 160, x0 + BODY_W, 160 + BODY_H
+
+
+def frame(i: int) -> np.ndarray:
+    img = np.zeros((H, W, 3), np.uint8)
+    x0, y0, x1, y1 = body_box(i)
+    img[y0:y1, x0:x1] = 255
+    return img
+
+
+class SmoothingPose:
+    """Stand-in for MediaPipe Pose: finds the white box, and like MediaPipe smooths the
+    landmarks in its input image's coordinates, so stale state after a window change shows."""
+    def __init__(self):
+        self.prev = None
+        self.resets = 0
+
+    def reset(self):
+        self.prev = None
+        self.resets += 1
+
+    def process(self, rgb):
+        ys, xs = np.nonzero(rgb[..., 0] > 127)
+        h, w = rgb.shape[:2]
+        x0, x1, y0, y1 = xs.min(), xs.max() + 1, ys.min(), ys.max() + 1
+        pts = np.array([((x0 + u * (x1 - x0)) / w, (y0 + v * (y1 - y0)) / h) for u, v in GRID])
+        if self.prev is not None:
+            pts = 0.5 * self.prev + 0.5 * pts
+        self.prev = pts
+        lms = [SimpleNamespace(x=float(x), y=float(y), z=0.0, visibility=1.0) for x, y in pts]
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=lms))
+
+
+def truth(i: int) -> np.ndarray:
+    x0, y0, x1, y1 = body_box(i)
+    return np.array([((x0 + u * (x1 - x0)) / W, (y0 + v * (y1 - y0)) / H) for u, v in GRID])
+
+
+def test_landmarks_stay_continuous_across_redetect():
+    every = 10
+    fake = SmoothingPose()
+    pose = RoiPose(fake, enabled=True, redetect_every=every)
+    full = (0, 0, W, H)
+
+    windows, errs = [], []
+    for i in range(5 * every):
+        res = pose.process(frame(i))
+        windows.append(pose.window)
+        got = np.array([(lm.x, lm.y) for lm in res.pose_landmarks.landmark])
+        errs.append(np.abs(got - truth(i)).max())
+
+    # it did crop, and came back to the full frame for periodic re-detects in between
+    first_crop = next(k for k, w in enumerate(windows) if w != full)
+    redetects = [k for k, w in enumerate(windows) if w == full and k > first_crop]
+    assert pose.cropped > 0
+    assert len(redetects) >= 3
+    # within the smoothing lag of the slow walk (about a pixel), including the re-detect
+    # frame and the frame after it
+    for k in redetects:
+        assert errs[k] < 2.0 / W
+        assert errs[k + 1] < 2.0 / W
+    assert max(errs) < 2.0 / W
+    # the Pose is reset into and out of every re-detect frame
+    assert fake.resets >= 2 * len(redetects)
+
+
+def test_disabled_is_full_frame_without_resets():
+    fake = SmoothingPose()
+    pose = RoiPose(fake, enabled=False, redetect_every=10)
+    for i in range(30):
+        pose.process(frame(i))
+        assert pose.window == (0, 0, W, H)
+    assert pose.cropped == 0 and fake.resets == 0
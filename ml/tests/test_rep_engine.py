@@ -0,0 +1,74 @@
+# liftright/ml/tests/test_rep_engine.py
+import dataclasses
+
+import numpy as np
+import pytest
+
+from rep_engine import END, REP_CONFIGS, START, RepSegmenter
+
+FPS = 30.0
+
+
+def clip(exercise: str, n_reps: int = 8, lead_s: float = 2.0, seed: int = 0):
+    """Synthetic signal: lead_s at the rep bottom, then n_reps 2 s reps with 0.5 s rests."""
+    lo, hi, noise = {"bicep_curl": (165.0, 50.0, 1.0),
+                     "shoulder_press": (0.2, 0.95, 0.01),
+                     "lateral_raise": (-0.2, 0.35, 0.01)}[exercise]
+    parts = [np.full(int(lead_s * FPS), lo)]
+    for _ in range(n_reps):
+        ph = np.linspace(0.0, 2 * np.pi, int(2.0 * FPS))
+        parts += [lo + (hi - lo) * (1 - np.cos(ph)) / 2, np.full(int(0.5 * FPS), lo)]
+    x = np.concatenate(parts)
+    x = x + np.random.default_rng(seed).normal(0.0, noise, len(x))
+    return x, np.arange(len(x)) / FPS
+
+
+def push_reps(seg: RepSegmenter, x, t):
+    """(START frame, END frame) of each counted rep, and the smoothed values, via push()."""
+    reps, sm, start = [], [], None
+    for i, (xi, ti) in enumerate(zip(x, t)):
+        ev = seg.push(float(xi), float(ti))
+        sm.append(seg.smoothed)
+        if ev == START:
+            start = i
+        elif ev == END:
+            reps.append((start, i))
+    return reps, sm
+
+
+def test_offline_matches_live_flags():
+    assert REP_CONFIGS["bicep_curl"].offline_matches_live
+    assert not REP_CONFIGS["shoulder_press"].offline_matches_live
+    assert not REP_CONFIGS["lateral_raise"].offline_matches_live
+
+
+@pytest.mark.parametrize("exercise", sorted(REP_CONFIGS))
+def test_run_matches_push_with_shared_calibration(exercise):
+    cfg = dataclasses.replace(REP_CONFIGS[exercise], offline_calibrate=None, idle_reset=False)
+    assert cfg.offline_matches_live
+    x, t = clip(exercise)
+    _, offline = RepSegmenter(cfg).run(x, t)
+    live, _ = push_reps(RepSegmenter(cfg), x, t)
+    assert len(offline) == 8
+    assert offline == live
+
+
+@pytest.mark.parametrize("exercise", ["shoulder_press", "lateral_raise"])
+def test_run_and_push_calibrate_differently(exercise):
+    # documented divergence (rep_engine header): run() uses the whole-clip rule,
+    # push() the causal calibrate window
+    cfg = REP_CONFIGS[exercise]
+    x, t = clip(exercise)
+
+    off = RepSegmenter(cfg)
+    _, offline = off.run(x, t)
+    assert (off.baseline, off.down_thr, off.up_thr) == cfg.offline_calibrate(x[:cfg.offline_baseline_frames])
+
+    on = RepSegmenter(cfg)
+    live, sm = push_reps(on, x, t)
+    assert (on.baseline, on.down_thr, on.up_thr) == cfg.calibrate(sm[:cfg.baseline_frames])
+
+    assert (off.down_thr, off.up_thr) != (on.down_thr, on.up_thr)
+    # on a clean clip the counts agree, the rep boundaries do not
+    assert len(offline) == len(live) == 8
+    assert offline != live
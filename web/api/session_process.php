@@ -68,6 +68,10 @@ if ($action === 'start') {
   if (!$resp['ok'] || empty($resp['data']['session_token'])) {
     // cleanup DB log if python failed
     $mysqli->query("DELETE FROM training_logs WHERE log_id = {$log_id} AND user_id = {$user_id}");
+    if (!empty($resp['data']['error'])) {
+      // python is up but refused the session (e.g. "Server at capacity (4 live sessions).")
+      json_fail((string)$resp['data']['error'], 503);
+    }
     json_fail("Python service not reachable. Start it first.", 500);
   }
 
@@ -83,14 +87,18 @@ if ($action === 'frame') {
   $log_id = (int)($input['log_id'] ?? 0);
   $token  = (string)($input['session_token'] ?? '');
   $frame  = (string)($input['frame_dataurl'] ?? '');
+  $ts_ms  = $input['capture_ts_ms'] ?? null;
 
   if ($log_id <= 0 || $token === '' || $frame === '') json_fail("Missing frame payload.");
 
   // forward to python
-  $resp = http_post_json(PY_SERVER . "/frame", [
+  $payload = [
     'session_token' => $token,
     'frame_dataurl' => $frame
-  ]);
+  ];
+  if (is_numeric($ts_ms)) $payload['capture_ts_ms'] = (float)$ts_ms;
+
+  $resp = http_post_json(PY_SERVER . "/frame", $payload);
 
   if (!$resp['ok'] || !is_array($resp['data'])) {
     json_fail("Python frame processing failed.", 500);
@@ -228,13 +228,15 @@ require __DIR__ . '/../includes/head.php';
     inflight = true;
     try {
       // capture frame WITHOUT resizing canvases here
+      const captureTsMs = performance.timeOrigin + performance.now();
       capCtx.drawImage(video, 0, 0, captureCanvas.width, captureCanvas.height);
       const frameDataUrl = captureCanvas.toDataURL("image/jpeg", 0.6);
 
       const resp = await api("frame", {
         log_id: logId,
         session_token: sessionToken,
-        frame_dataurl: frameDataUrl
+        frame_dataurl: frameDataUrl,
+        capture_ts_ms: captureTsMs
       });
 
       const annotated = resp.annotated_frame_dataurl;